@@ -0,0 +1,356 @@
+import uuid
+from datetime import date, datetime
+from typing import Any, Awaitable, Callable, Dict, List, Literal, Optional
+from fastapi import APIRouter, HTTPException, Request, Response
+from fastapi.responses import ORJSONResponse
+from pydantic import Extra, ValidationError, validator
+from sqlmodel import SQLModel
+from database import aio, db
+from database import repository
+from models.line_item import DEFAULT_CURRENCY, DEFAULT_PORTFOLIO
+
+# Pages are capped so a single request cannot read the whole table into memory
+MAX_PAGE_SIZE = 1000
+# Distinguishes this run of the app in ETags, since versions restart from 0
+INSTANCE = uuid.uuid4().hex[:8]
+
+router = APIRouter(prefix="/api", default_response_class=ORJSONResponse)
+# Called with the portfolio after every write through the API, e.g. to refresh the UI
+change_handlers: List[Callable[[int], Any]] = []
+
+
+class LineItemIn(SQLModel):
+    """A line item as sent to the API, with the amount in cents."""
+
+    name: str
+    type: str
+    status: Literal["Asset", "Liability"]
+    amount: int
+    currency: str = DEFAULT_CURRENCY
+
+
+class LineItemValues(SQLModel):
+    """Some of the fields of a line item, as set by a bulk update."""
+
+    name: Optional[str]
+    type: Optional[str]
+    status: Optional[Literal["Asset", "Liability"]]
+    amount: Optional[int]
+    currency: Optional[str]
+
+    class Config:
+        extra = Extra.forbid
+
+    @validator("*", pre=True)
+    def not_null(cls, value: Any) -> Any:
+        if value is None:
+            raise ValueError("must not be null")
+        return value
+
+    @validator("currency")
+    def known_currency(cls, currency: str) -> str:
+        if currency not in {*db.get_fx_rates(), db.REPORTING_CURRENCY, DEFAULT_CURRENCY}:
+            raise ValueError(f"unknown currency {currency}")
+        return currency
+
+
+class BulkUpdate(SQLModel):
+    """The same new values for many line items."""
+
+    ids: List[int]
+    values: Dict[str, Any]
+
+
+class TransactionIn(SQLModel):
+    """An entry posted to the ledger of a line item, with the amount in cents."""
+
+    posted_on: date
+    kind: Literal["deposit", "payment", "valuation"]
+    amount: int
+    memo: str = ""
+
+
+class BulkDelete(SQLModel):
+    """The line items to delete."""
+
+    ids: List[int]
+
+
+# =============== Helpers ======================
+def current_etag(portfolio_id: int) -> str:
+    """
+    Returns an ETag for the current state of a portfolio's line items and the exchange
+    rates. It is built from in-memory version counters, so checking it never touches
+    SQLite.
+    """
+    version = repository.portfolio(portfolio_id).version
+    return f'"{INSTANCE}-{portfolio_id}-{version}-{db.fx_rates_version}"'
+
+
+async def cached_response(
+    request: Request, portfolio_id: int, load: Callable[[], Awaitable[Any]]
+) -> Response:
+    """
+    Answers a read with 304 Not Modified when the client's If-None-Match still matches
+    the current ETag of the portfolio, and otherwise loads and returns the data with
+    the ETag attached.
+    """
+    etag = current_etag(portfolio_id)
+    if request.headers.get("if-none-match") == etag:
+        return Response(status_code=304, headers={"ETag": etag})
+
+    return ORJSONResponse(await load(), headers={"ETag": etag})
+
+
+def notify_change(portfolio_id: int) -> None:
+    """
+    Tells the `change_handlers` that the line items of a portfolio changed.
+    """
+    for handler in change_handlers:
+        handler(portfolio_id)
+
+
+def parse_sort(sort: str) -> list:
+    """
+    Converts a comma separated sort such as "-amount,name" into (column, direction)
+    pairs for `db.get_items_page`. A leading "-" sorts in descending order.
+    """
+    return [
+        (column.lstrip("-"), "desc" if column.startswith("-") else "asc")
+        for column in sort.split(",")
+        if column
+    ]
+
+
+# =============== Reads ======================
+@router.get("/line_items")
+async def list_line_items(
+    request: Request,
+    offset: int = 0,
+    limit: int = 100,
+    sort: str = "",
+    search: str = "",
+    status: Optional[str] = None,
+    type: Optional[str] = None,
+    currency: Optional[str] = None,
+    portfolio_id: int = DEFAULT_PORTFOLIO,
+) -> Response:
+    """
+    Lists one page of line items, sorted, filtered and searched in SQL. `next_offset`
+    is the offset of the following page, or null on the last page.
+    """
+    limit = max(1, min(limit, MAX_PAGE_SIZE))
+    filters = [
+        (column, "equals", value)
+        for column, value in (("status", status), ("type", type), ("currency", currency))
+        if value is not None
+    ]
+
+    async def load() -> dict:
+        # One extra row tells whether there is another page, without a COUNT(*)
+        items = await aio.db.get_items_page(
+            offset=offset,
+            limit=limit + 1,
+            sort=parse_sort(sort),
+            filters=filters,
+            search=search,
+            portfolio_id=portfolio_id,
+        )
+        return {
+            "items": items[:limit],
+            "offset": offset,
+            "limit": limit,
+            "next_offset": offset + limit if len(items) > limit else None,
+        }
+
+    try:
+        return await cached_response(request, portfolio_id, load)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+@router.get("/line_items/{line_item_id}")
+async def get_line_item(
+    request: Request, line_item_id: int, portfolio_id: int = DEFAULT_PORTFOLIO
+) -> Response:
+    """
+    Returns a single line item.
+    """
+    try:
+        return await cached_response(
+            request,
+            portfolio_id,
+            lambda: aio.db.get_line_item(line_item_id, portfolio_id),
+        )
+    except KeyError:
+        raise HTTPException(status_code=404, detail=f"Line item {line_item_id} not found")
+
+
+@router.get("/totals")
+async def get_totals(request: Request, portfolio_id: int = DEFAULT_PORTFOLIO) -> Response:
+    """
+    Returns the asset, liability and net worth totals in cents of the reporting
+    currency, together with the total of every status and type and the currencies
+    left out of them for lack of an exchange rate.
+    """
+
+    async def load() -> dict:
+        return {
+            **await aio.portfolio(portfolio_id).get_totals(),
+            "currency": db.REPORTING_CURRENCY,
+            "types": await aio.db.get_type_totals(portfolio_id),
+            "unconverted": await aio.db.get_unconverted_currencies(portfolio_id),
+        }
+
+    return await cached_response(request, portfolio_id, load)
+
+
+@router.get("/history/line_items")
+async def get_line_items_at(at: datetime, portfolio_id: int = DEFAULT_PORTFOLIO) -> list:
+    """
+    Returns the line items as they were at a past local time, e.g.
+    `?at=2024-01-31T18:00`, rebuilt from the change journal.
+    """
+    try:
+        return await aio.db.get_items_at(at, portfolio_id)
+    except ValueError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+
+
+@router.get("/line_items/{line_item_id}/statement")
+async def get_statement(
+    line_item_id: int, start: date, end: date, portfolio_id: int = DEFAULT_PORTFOLIO
+) -> dict:
+    """
+    Returns the ledger entries of a line item between two days, each with the balance
+    after it, e.g. `?start=2024-01-01&end=2024-01-31`.
+    """
+    try:
+        return await aio.db.get_statement(line_item_id, start, end, portfolio_id)
+    except KeyError:
+        raise HTTPException(status_code=404, detail=f"Line item {line_item_id} not found")
+
+
+@router.get("/line_items/{line_item_id}/balance")
+async def get_balance_at(
+    line_item_id: int, on: date, portfolio_id: int = DEFAULT_PORTFOLIO
+) -> dict:
+    """
+    Returns the balance of a line item at the end of a day, from its ledger, or null if
+    it has no ledger.
+    """
+    try:
+        balance = await aio.db.get_balance_at(line_item_id, on, portfolio_id)
+    except KeyError:
+        raise HTTPException(status_code=404, detail=f"Line item {line_item_id} not found")
+
+    return {"on": on, "balance": balance}
+
+
+# =============== Writes ======================
+@router.post("/line_items", status_code=201)
+async def create_line_item(item: LineItemIn, portfolio_id: int = DEFAULT_PORTFOLIO) -> dict:
+    """
+    Creates a line item.
+    """
+    created = await aio.portfolio(portfolio_id).create_line_item(**item.dict())
+    notify_change(portfolio_id)
+    return created
+
+
+@router.put("/line_items/{line_item_id}")
+async def update_line_item(
+    line_item_id: int, item: LineItemIn, portfolio_id: int = DEFAULT_PORTFOLIO
+) -> dict:
+    """
+    Replaces every field of a line item.
+    """
+    try:
+        updated = await aio.portfolio(portfolio_id).update_line_item(
+            id=line_item_id, **item.dict()
+        )
+    except KeyError:
+        raise HTTPException(status_code=404, detail=f"Line item {line_item_id} not found")
+
+    notify_change(portfolio_id)
+    return updated
+
+
+@router.delete("/line_items/{line_item_id}")
+async def delete_line_item(line_item_id: int, portfolio_id: int = DEFAULT_PORTFOLIO) -> dict:
+    """
+    Deletes a line item and returns it.
+    """
+    try:
+        deleted = await aio.portfolio(portfolio_id).delete_line_item(line_item_id)
+    except KeyError:
+        raise HTTPException(status_code=404, detail=f"Line item {line_item_id} not found")
+
+    notify_change(portfolio_id)
+    return deleted
+
+
+@router.post("/line_items/{line_item_id}/transactions", status_code=201)
+async def add_transaction(
+    line_item_id: int, transaction: TransactionIn, portfolio_id: int = DEFAULT_PORTFOLIO
+) -> dict:
+    """
+    Posts a deposit, payment or valuation to the ledger of a line item and returns the
+    line item with its new balance.
+    """
+    try:
+        updated = await aio.portfolio(portfolio_id).add_transaction(
+            line_item_id, **transaction.dict()
+        )
+    except KeyError:
+        raise HTTPException(status_code=404, detail=f"Line item {line_item_id} not found")
+
+    notify_change(portfolio_id)
+    return updated
+
+
+@router.post("/line_items/bulk_upsert")
+async def bulk_upsert_line_items(
+    items: List[LineItemIn], portfolio_id: int = DEFAULT_PORTFOLIO
+) -> dict:
+    """
+    Inserts or updates many line items, matched by name and type, in one transaction.
+    """
+    counts = await aio.db.bulk_upsert_line_items(
+        [item.dict() for item in items], portfolio_id=portfolio_id
+    )
+    # The upsert bypasses the repository, so its cache is rebuilt on the next read
+    repository.portfolio(portfolio_id).invalidate()
+    notify_change(portfolio_id)
+    return counts
+
+
+@router.post("/line_items/bulk_update")
+async def bulk_update_line_items(
+    bulk_update: BulkUpdate, portfolio_id: int = DEFAULT_PORTFOLIO
+) -> dict:
+    """
+    Sets the same values on many line items in one transaction. The values are checked
+    before anything is written, and a single bad value rejects the whole update.
+    """
+    try:
+        values = LineItemValues.parse_obj(bulk_update.values).dict(exclude_unset=True)
+    except ValidationError as e:
+        raise HTTPException(status_code=400, detail=e.errors())
+
+    updated = await aio.portfolio(portfolio_id).update_line_items(bulk_update.ids, values)
+
+    notify_change(portfolio_id)
+    return {"updated": len(updated)}
+
+
+@router.post("/line_items/bulk_delete")
+async def bulk_delete_line_items(
+    bulk_delete: BulkDelete, portfolio_id: int = DEFAULT_PORTFOLIO
+) -> dict:
+    """
+    Deletes many line items in one transaction.
+    """
+    deleted = await aio.portfolio(portfolio_id).delete_line_items(bulk_delete.ids)
+    notify_change(portfolio_id)
+    return {"deleted": len(deleted)}
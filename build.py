@@ -1,8 +1,14 @@
 import os
 import subprocess
+import sys
 from pathlib import Path
 import nicegui
 
+# `python build.py --fast-startup` builds a folder instead of a single executable.
+# A --onefile bundle unpacks everything to a temporary directory on every launch,
+# which is most of its cold start time.
+fast_startup = "--fast-startup" in sys.argv
+
 cmd = [
     "C:\\Users\\Owner\\src\\networthapp\\venv\\Scripts\\python.exe",
     "-m",
@@ -12,7 +18,7 @@ cmd = [
     "C:\\Users\\Owner\\src\\networthapp\\assets\\asset.ico",
     "--name",
     "NetWorthCalculator",  # name of your app
-    "--onefile",
+    "--onedir" if fast_startup else "--onefile",
     "--windowed",  # prevent console appearing, only use with ui.run(native=True, ...)
     "--add-data",
     f"{Path(nicegui.__file__).parent}{os.pathsep}nicegui",
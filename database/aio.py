@@ -0,0 +1,71 @@
+import asyncio
+import contextvars
+import functools
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable
+from database import db as sync_db
+from database import repository
+
+# SQLite only runs one writer at a time, so a few threads are enough to keep
+# reads flowing while a long write such as an import is in progress
+DB_EXECUTOR = ThreadPoolExecutor(max_workers=4, thread_name_prefix="networth-db")
+
+
+async def run(function: Callable[..., Any], *args: Any, **kwargs: Any) -> Any:
+    """
+    Runs a blocking database call on `DB_EXECUTOR` and waits for it without blocking
+    the event loop. The call sees the caller's context variables, so for example its
+    queries count towards the caller's `metrics.action`.
+
+    Args:
+        function (Callable[..., Any]): The blocking function to call.
+        *args (Any): Positional arguments for the function.
+        **kwargs (Any): Keyword arguments for the function.
+
+    Returns:
+        Any: Whatever the function returned.
+    """
+    loop = asyncio.get_running_loop()
+    context = contextvars.copy_context()
+    return await loop.run_in_executor(
+        DB_EXECUTOR, functools.partial(context.run, function, *args, **kwargs)
+    )
+
+
+class AsyncProxy:
+    """
+    Exposes the functions of a module, or the methods of an object, as coroutines
+    that run on `DB_EXECUTOR`, e.g. `await aio.db.get_totals()`. Attributes are looked
+    up on every access, so the proxy always calls the target's current functions.
+    """
+
+    def __init__(self, target: Any) -> None:
+        self._target = target
+
+    def __getattr__(self, name: str) -> Any:
+        attribute = getattr(self._target, name)
+        if not callable(attribute):
+            return attribute
+
+        @functools.wraps(attribute)
+        async def call(*args: Any, **kwargs: Any) -> Any:
+            return await run(attribute, *args, **kwargs)
+
+        return call
+
+
+db = AsyncProxy(sync_db)
+line_items = AsyncProxy(repository.line_items)
+
+
+def portfolio(portfolio_id: int) -> AsyncProxy:
+    """
+    Returns an `AsyncProxy` of the repository of a portfolio.
+
+    Args:
+        portfolio_id (int): The portfolio whose line items to proxy.
+
+    Returns:
+        AsyncProxy: The proxied `repository.portfolio(portfolio_id)`.
+    """
+    return AsyncProxy(repository.portfolio(portfolio_id))
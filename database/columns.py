@@ -0,0 +1,155 @@
+from typing import TYPE_CHECKING, Dict, Iterable, Sequence, Tuple
+from database import db
+
+if TYPE_CHECKING:
+    import numpy as np
+
+# The text columns stored as codes into their distinct values, in the order they are
+# selected before the amount
+ENCODED_COLUMNS = ("name", "type", "status", "currency")
+
+
+class LineItemColumns:
+    """
+    Compact, read-only copy of the line items of a portfolio for the reports.
+
+    Amounts are held as one int64 array of cents. Each text column is dictionary
+    encoded: an array of small integer codes, one per line item, into a tuple of its
+    distinct values, numbered in the order they first appear. A million line items
+    of a handful of types then take a few bytes each instead of a dictionary of Python
+    objects, and totals and sums per name are computed with vectorized NumPy calls.
+    """
+
+    def __init__(
+        self,
+        amounts: "np.ndarray",
+        codes: Dict[str, "np.ndarray"],
+        values: Dict[str, Tuple[str, ...]],
+    ) -> None:
+        self.amounts = amounts
+        self.codes = codes
+        self.values = values
+
+    @classmethod
+    def from_rows(cls, batches: Iterable[Sequence[tuple]], count: int) -> "LineItemColumns":
+        """
+        Builds the arrays from batches of (name, type, status, currency, amount) rows as
+        they are fetched, so no more than one batch of rows exists as Python objects at a
+        time.
+
+        Args:
+            batches (Iterable[Sequence[tuple]]): The rows, a batch at a time.
+            count (int): The number of rows, which sizes the arrays up front.
+
+        Returns:
+            LineItemColumns: The encoded line items.
+        """
+        import numpy as np
+
+        amounts = np.empty(count, dtype=np.int64)
+        codes = {column: np.empty(count, dtype=np.int32) for column in ENCODED_COLUMNS}
+        lookups = {column: _Codes() for column in ENCODED_COLUMNS}
+
+        end = 0
+        for rows in batches:
+            start, end = end, end + len(rows)
+            *texts, batch_amounts = zip(*rows)
+            amounts[start:end] = batch_amounts
+            for column, column_texts in zip(ENCODED_COLUMNS, texts):
+                codes[column][start:end] = np.fromiter(
+                    map(lookups[column].__getitem__, column_texts),
+                    dtype=np.int32,
+                    count=len(column_texts),
+                )
+
+        # Columns with few distinct values, like status and type, fit in a byte per item
+        for column, lookup in lookups.items():
+            codes[column] = codes[column][:end].astype(
+                np.min_scalar_type(max(len(lookup) - 1, 0))
+            )
+        return cls(
+            amounts[:end],
+            codes,
+            {column: tuple(lookup) for column, lookup in lookups.items()},
+        )
+
+    def __len__(self) -> int:
+        return len(self.amounts)
+
+    @property
+    def nbytes(self) -> int:
+        """
+        The size of the arrays, not counting the distinct values they are coded into.
+        """
+        return self.amounts.nbytes + sum(codes.nbytes for codes in self.codes.values())
+
+    def totals(self, rates: Dict[str, float]) -> Dict[str, int]:
+        """
+        Sums the assets and liabilities per currency and converts each sum into the
+        reporting currency, rounding like `db.convert_cents`, so the totals equal the
+        repository's running totals. Currencies without a rate are left out, like in
+        `db.rate_for`.
+
+        Args:
+            rates (Dict[str, float]): The exchange rate of each currency.
+
+        Returns:
+            Dict[str, int]: The "assets", "liabilities" and "net_worth" totals, in cents
+                            of the reporting currency.
+        """
+        currencies = self.values["currency"]
+        # One group per status and currency, summed exactly in int64
+        groups = self.codes["status"].astype("int64") * len(currencies) + self.codes["currency"]
+
+        converted = {"Asset": 0, "Liability": 0}
+        for status_code, status in enumerate(self.values["status"]):
+            for currency_code, currency in enumerate(currencies):
+                group = status_code * len(currencies) + currency_code
+                cents = int(self.amounts[groups == group].sum())
+                converted[status] = converted.get(status, 0) + db.convert_cents(
+                    cents, db.rate_for(rates, currency)
+                )
+
+        return {
+            "assets": converted["Asset"],
+            "liabilities": converted["Liability"],
+            "net_worth": converted["Asset"] - converted["Liability"],
+        }
+
+    def sums_by(
+        self, column: str, rates: Dict[str, float]
+    ) -> Tuple[Tuple[str, ...], "np.ndarray"]:
+        """
+        Converts every amount into the reporting currency, rounding each like
+        `db.convert_cents`, and sums them per distinct value of a text column.
+
+        Args:
+            column (str): One of `ENCODED_COLUMNS`, e.g. "name".
+            rates (Dict[str, float]): The exchange rate of each currency.
+
+        Returns:
+            Tuple[Tuple[str, ...], np.ndarray]: The distinct values and the int64 sum of
+                                                each, in cents of the reporting currency.
+        """
+        import numpy as np
+
+        item_rates = np.array(
+            [db.rate_for(rates, currency) for currency in self.values["currency"]],
+            dtype=np.float64,
+        )[self.codes["currency"]]
+        converted = self.amounts * item_rates
+        converted = np.where(
+            converted >= 0, np.floor(converted + 0.5), -np.floor(-converted + 0.5)
+        )
+
+        values = self.values[column]
+        sums = np.bincount(self.codes[column], weights=converted, minlength=len(values))
+        return values, np.rint(sums).astype(np.int64)
+
+
+class _Codes(dict):
+    """Numbers values in the order they are first looked up."""
+
+    def __missing__(self, value: str) -> int:
+        code = self[value] = len(self)
+        return code
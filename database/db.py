@@ -1,14 +1,333 @@
-from typing import List
-import pandas as pd
-from models.line_item import LineItem
+import csv
+import json
+import os
+import re
+import sqlite3
+import zlib
+from collections import defaultdict
+from contextlib import contextmanager
+from datetime import date, datetime, timedelta
+from functools import lru_cache
+from itertools import islice
+from typing import (
+    TYPE_CHECKING,
+    Any,
+    Callable,
+    Dict,
+    Iterable,
+    Iterator,
+    List,
+    Optional,
+    Sequence,
+    Set,
+    Tuple,
+)
+from database import metrics
+from models.change import Change, ChangeSet
+from models.checkpoint import Checkpoint
+from models.fx_rate import FxRate
+from models.line_item import DEFAULT_CURRENCY, DEFAULT_PORTFOLIO, LineItem
+from models.net_worth_snapshot import NetWorthSnapshot
+from models.projection_assumption import ProjectionAssumption
+from models.transaction import TRANSACTION_KINDS, Transaction
+from models.type_total import TypeTotal
+from sqlalchemy import (
+    Date,
+    Integer,
+    case,
+    bindparam,
+    cast,
+    column,
+    delete,
+    event,
+    exists,
+    func,
+    insert,
+    literal,
+    literal_column,
+    not_,
+    table,
+    text,
+    update,
+)
+from sqlalchemy.engine import Engine
+from sqlalchemy.pool import QueuePool
 from sqlmodel import SQLModel, Session, create_engine, select
 
-sqlite_file_name = "networth.db"
-sqlite_url = f"sqlite:///{sqlite_file_name}"
+if TYPE_CHECKING:
+    import pandas as pd
+    from database.columns import LineItemColumns
 
-engine = create_engine(sqlite_url, echo=False)
+# Applied to every new SQLite connection. WAL lets readers keep reading while a
+# write is in progress, and NORMAL sync is durable in WAL mode except on power loss.
+SQLITE_PRAGMAS = {
+    "journal_mode": "WAL",
+    "synchronous": "NORMAL",
+    "busy_timeout": 5000,
+    "cache_size": -64_000,  # Negative values are in KiB, so 64 MB per connection
+    "mmap_size": 256 * 1024 * 1024,
+    "temp_store": "MEMORY",
+}
 
-session = Session(engine)
+
+def create_sqlite_engine(database_path: str) -> Engine:
+    """
+    Creates a pooled engine for a SQLite database file with `SQLITE_PRAGMAS` applied
+    to each connection.
+
+    Connections are pooled rather than opened per operation, and may be used from the
+    thread pool as well as the event loop thread, so the SQLite thread check is off.
+    Each operation still uses its own `Session`, so no connection is shared at once.
+
+    Args:
+        database_path (str): The path of the database file.
+
+    Returns:
+        Engine: The configured engine.
+    """
+    new_engine = create_engine(
+        f"sqlite:///{database_path}",
+        echo=False,
+        poolclass=QueuePool,
+        pool_size=5,
+        max_overflow=10,
+        connect_args={"check_same_thread": False},
+    )
+
+    @event.listens_for(new_engine, "connect")
+    def apply_pragmas(dbapi_connection, connection_record) -> None:
+        cursor = dbapi_connection.cursor()
+        for pragma, value in SQLITE_PRAGMAS.items():
+            cursor.execute(f"PRAGMA {pragma} = {value}")
+        cursor.close()
+
+    if metrics.ENABLED:
+        event.listen(new_engine, "before_cursor_execute", metrics.count_query)
+
+    return new_engine
+
+
+def configure_database(database_path: str) -> None:
+    """
+    Points the module at a different database file, disposing of the current pool.
+
+    Args:
+        database_path (str): The path of the database file.
+    """
+    global engine, sqlite_file_name, fx_rates_version
+
+    engine.dispose()
+    sqlite_file_name = database_path
+    engine = create_sqlite_engine(database_path)
+    # The rates are stored in the database, so any cached copy is now stale
+    fx_rates_version += 1
+
+
+# The database file can be moved with the NETWORTH_DB environment variable
+sqlite_file_name = os.environ.get("NETWORTH_DB", "networth.db")
+
+engine = create_sqlite_engine(sqlite_file_name)
+
+# Totals are reported in this currency, converted with the rates in `fx_rates_file`,
+# a local CSV file with "currency" and "rate" columns
+REPORTING_CURRENCY = os.environ.get("NETWORTH_CURRENCY", DEFAULT_CURRENCY)
+fx_rates_file = os.environ.get("NETWORTH_FX_RATES", "fx_rates.csv")
+# Changes whenever the rates may have changed, so converted values can be memoized
+fx_rates_version = 0
+
+# A type total converted into cents of the reporting currency. Currencies without a
+# rate are left out, like in `rate_for`, and listed by `get_unconverted_currencies`.
+CONVERTED_TYPE_TOTAL = cast(
+    func.round(
+        TypeTotal.amount
+        * func.coalesce(
+            FxRate.rate, case((TypeTotal.currency == REPORTING_CURRENCY, 1.0), else_=0.0)
+        )
+    ),
+    Integer,
+)
+
+# Keep `typetotal` in step with every change to `lineitem`, so per type rollups and
+# totals are read from a handful of rows instead of scanning every line item
+_ADD_NEW_TO_TYPE_TOTAL = (
+    "INSERT INTO typetotal (portfolio_id, status, type, currency, amount, item_count) "
+    "VALUES (NEW.portfolio_id, NEW.status, NEW.type, NEW.currency, NEW.amount, 1) "
+    "ON CONFLICT (portfolio_id, status, type, currency) DO UPDATE SET "
+    "amount = amount + excluded.amount, item_count = item_count + 1;"
+)
+_MATCHES_OLD_TYPE_TOTAL = (
+    "WHERE portfolio_id = OLD.portfolio_id AND status = OLD.status AND type = OLD.type "
+    "AND currency = OLD.currency"
+)
+_REMOVE_OLD_FROM_TYPE_TOTAL = (
+    "UPDATE typetotal SET amount = amount - OLD.amount, item_count = item_count - 1 "
+    f"{_MATCHES_OLD_TYPE_TOTAL}; "
+    f"DELETE FROM typetotal {_MATCHES_OLD_TYPE_TOTAL} AND item_count = 0;"
+)
+TYPE_TOTAL_TRIGGERS = {
+    "lineitem_type_total_insert": f"AFTER INSERT ON lineitem BEGIN {_ADD_NEW_TO_TYPE_TOTAL} END",
+    "lineitem_type_total_delete": f"AFTER DELETE ON lineitem BEGIN {_REMOVE_OLD_FROM_TYPE_TOTAL} END",
+    "lineitem_type_total_update": (
+        "AFTER UPDATE OF portfolio_id, status, type, currency, amount ON lineitem "
+        f"BEGIN {_REMOVE_OLD_FROM_TYPE_TOTAL} {_ADD_NEW_TO_TYPE_TOTAL} END"
+    ),
+}
+
+# An external content FTS5 index over the name and type of every line item. It stores
+# only the index, reading the text back from `lineitem`, and keeps prefix indexes for
+# the short prefixes a search box sends while the user is still typing
+SEARCH_TABLE = (
+    "CREATE VIRTUAL TABLE lineitem_search USING fts5("
+    "name, type, content='lineitem', content_rowid='id', prefix='2 3')"
+)
+# Matches in the name count for more than matches in the type
+SEARCH_RANK = "bm25(10.0, 1.0)"
+_ADD_NEW_TO_SEARCH = (
+    "INSERT INTO lineitem_search (rowid, name, type) VALUES (NEW.id, NEW.name, NEW.type);"
+)
+_REMOVE_OLD_FROM_SEARCH = (
+    "INSERT INTO lineitem_search (lineitem_search, rowid, name, type) "
+    "VALUES ('delete', OLD.id, OLD.name, OLD.type);"
+)
+SEARCH_TRIGGERS = {
+    "lineitem_search_insert": f"AFTER INSERT ON lineitem BEGIN {_ADD_NEW_TO_SEARCH} END",
+    "lineitem_search_delete": f"AFTER DELETE ON lineitem BEGIN {_REMOVE_OLD_FROM_SEARCH} END",
+    "lineitem_search_update": (
+        "AFTER UPDATE OF name, type ON lineitem "
+        f"BEGIN {_REMOVE_OLD_FROM_SEARCH} {_ADD_NEW_TO_SEARCH} END"
+    ),
+}
+SEARCH_TERM = re.compile(r"\w+")
+search_table = table("lineitem_search", column("rowid"), column("rank"))
+
+# Every write to `lineitem` appends the delta it made to the `change` journal, filed
+# under the change set the writing function opened in the same transaction, see
+# `_changeset`. Updates only record the columns they changed.
+JOURNAL_COLUMNS = ("name", "type", "status", "amount", "currency", "portfolio_id")
+_CURRENT_CHANGESET = "(SELECT COALESCE(MAX(id), 0) FROM changeset)"
+
+
+def _journal_values(row: str) -> str:
+    pairs = ", ".join(f"'{name}', {row}.{name}" for name in JOURNAL_COLUMNS)
+    return f"json_object({pairs})"
+
+
+_CHANGED_COLUMNS = " UNION ALL ".join(
+    f"SELECT '{name}' AS name, OLD.{name} AS old_value, NEW.{name} AS new_value "
+    f"WHERE OLD.{name} IS NOT NEW.{name}"
+    for name in JOURNAL_COLUMNS
+)
+JOURNAL_TRIGGERS = {
+    "lineitem_journal_insert": (
+        "AFTER INSERT ON lineitem BEGIN "
+        "INSERT INTO change (changeset_id, line_item_id, new_values) "
+        f"VALUES ({_CURRENT_CHANGESET}, NEW.id, {_journal_values('NEW')}); END"
+    ),
+    "lineitem_journal_delete": (
+        "AFTER DELETE ON lineitem BEGIN "
+        "INSERT INTO change (changeset_id, line_item_id, old_values) "
+        f"VALUES ({_CURRENT_CHANGESET}, OLD.id, {_journal_values('OLD')}); END"
+    ),
+    "lineitem_journal_update": (
+        "AFTER UPDATE ON lineitem WHEN "
+        + " OR ".join(f"OLD.{name} IS NOT NEW.{name}" for name in JOURNAL_COLUMNS)
+        + " BEGIN INSERT INTO change (changeset_id, line_item_id, old_values, new_values) "
+        f"SELECT {_CURRENT_CHANGESET}, NEW.id, json_group_object(name, old_value), "
+        f"json_group_object(name, new_value) FROM ({_CHANGED_COLUMNS}); END"
+    ),
+}
+# The change set `undo` reverts in a portfolio: the latest edit, or redo, that was not
+# undone yet. The portfolio's change sets are scanned newest first through its index,
+# so this stops at the first match. Postings to the ledger cannot be undone, and
+# reverting an earlier edit would overwrite the balances they set, so nothing before
+# the latest posting can be undone either.
+_UNDOABLE = text(
+    "SELECT id FROM (SELECT id, kind FROM changeset AS target "
+    "WHERE portfolio_id = :portfolio_id AND kind IN ('edit', 'redo', 'ledger') "
+    "AND NOT EXISTS (SELECT 1 FROM changeset WHERE reverts = target.id) "
+    "ORDER BY id DESC LIMIT 1) WHERE kind != 'ledger'"
+)
+# The change set `redo` reverts in a portfolio: the latest undo that was not redone
+# yet, as long as no new edit or posting was made since
+_REDOABLE = text(
+    "SELECT id FROM changeset AS target "
+    "WHERE portfolio_id = :portfolio_id AND kind = 'undo' "
+    "AND NOT EXISTS (SELECT 1 FROM changeset WHERE reverts = target.id) "
+    "AND id > COALESCE((SELECT id FROM changeset WHERE portfolio_id = :portfolio_id "
+    "AND kind IN ('edit', 'ledger') ORDER BY id DESC LIMIT 1), 0) "
+    "ORDER BY id DESC LIMIT 1"
+)
+
+# Posting to the ledger keeps the line item's amount at its balance: a deposit or a
+# payment is added to or taken off the amount, and a valuation replaces it, plus
+# whatever was posted after the valuation's day. Entries dated before a later valuation
+# leave the balance alone. Entries are ordered by day and then by id, and every lookup
+# is a range of one line item's entries in the (line_item_id, posted_on) index, so the
+# ledger is never summed as a whole.
+_LEDGER_DELTA = "CASE kind WHEN 'deposit' THEN amount WHEN 'payment' THEN -amount ELSE 0 END"
+_LATER_ENTRIES = (
+    "FROM lineitemtransaction "
+    "WHERE line_item_id = NEW.line_item_id AND posted_on > NEW.posted_on"
+)
+LEDGER_TRIGGERS = {
+    "lineitemtransaction_balance_insert": (
+        "AFTER INSERT ON lineitemtransaction "
+        f"WHEN NOT EXISTS (SELECT 1 {_LATER_ENTRIES} AND kind = 'valuation') "
+        "BEGIN UPDATE lineitem SET amount = CASE NEW.kind "
+        f"WHEN 'valuation' THEN NEW.amount + "
+        f"(SELECT COALESCE(SUM({_LEDGER_DELTA}), 0) {_LATER_ENTRIES}) "
+        "WHEN 'deposit' THEN amount + NEW.amount ELSE amount - NEW.amount END "
+        "WHERE id = NEW.line_item_id; END"
+    ),
+}
+# The balance of a line item at the end of a day: its latest valuation up to that day
+# plus the deposits and payments posted after it
+_BALANCE_AT = text(
+    "SELECT valuation.amount + COALESCE(("
+    f"SELECT SUM({_LEDGER_DELTA}) FROM lineitemtransaction "
+    "WHERE line_item_id = :line_item_id "
+    "AND posted_on BETWEEN valuation.posted_on AND :day "
+    "AND (posted_on > valuation.posted_on OR id > valuation.id)), 0) "
+    "FROM lineitemtransaction AS valuation "
+    "WHERE line_item_id = :line_item_id AND kind = 'valuation' AND posted_on <= :day "
+    "ORDER BY posted_on DESC, id DESC LIMIT 1"
+).bindparams(bindparam("day", type_=Date))
+# An amount edited on a line item with a ledger is posted as a valuation instead of
+# being written over the balance. It is dated today, or on the day of the latest entry
+# if that is later, so it is the last entry and the amount becomes exactly the one
+# entered. Line items whose amount did not change get no entry.
+_EDITED_VALUATION = text(
+    "INSERT INTO lineitemtransaction (line_item_id, posted_on, kind, amount, memo) "
+    "SELECT id, MAX(:today, (SELECT MAX(posted_on) FROM lineitemtransaction "
+    "WHERE line_item_id = lineitem.id)), 'valuation', :amount, 'Edited' "
+    "FROM lineitem WHERE id = :line_item_id AND amount != :amount"
+).bindparams(bindparam("today", type_=Date))
+# A checkpoint is recorded once this many changes were journaled since the last one,
+# which bounds how many changes rebuilding a past state has to replay
+CHECKPOINT_INTERVAL = 10_000
+
+# The online backup copies this many pages (4 KiB each by default) per step and
+# releases its read lock in between, so writers are never held up by a whole copy
+BACKUP_PAGES_PER_STEP = 1024
+# Rows fetched from the cursor at a time by `iter_batches`
+BATCH_SIZE = 50_000
+
+# Keeps `IN (...)` lists well below SQLite's limit on bound parameters
+MAX_IDS_PER_STATEMENT = 500
+
+# Operators accepted by `get_items_page` filters, keyed by their AG Grid names
+FILTER_OPERATORS = {
+    "equals": lambda column, value: column == value,
+    "notEqual": lambda column, value: column != value,
+    "contains": lambda column, value: column.contains(value, autoescape=True),
+    "notContains": lambda column, value: not_(column.contains(value, autoescape=True)),
+    "startsWith": lambda column, value: column.startswith(value, autoescape=True),
+    "endsWith": lambda column, value: column.endswith(value, autoescape=True),
+    "lessThan": lambda column, value: column < value,
+    "lessThanOrEqual": lambda column, value: column <= value,
+    "greaterThan": lambda column, value: column > value,
+    "greaterThanOrEqual": lambda column, value: column >= value,
+}
 
 
 def initialize_database() -> None:
@@ -21,27 +340,312 @@ def initialize_database() -> None:
     performed to ensure that the database is properly set up.
     """
     SQLModel.metadata.create_all(engine)
+    create_triggers()
+    create_search_index()
+    create_journal()
+    create_ledger()
+
+
+def migrate_database() -> None:
+    """
+    Brings an existing database file up to date with the current models.
+
+    Databases created before amounts were stored as integer cents have a text
+    `amount` column. SQLite cannot change the type of a column in place, so the
+    table is rebuilt inside a single transaction and every amount is converted
+    from its dollar string into cents. Databases created before line items had a
+    currency get the column with every amount in `DEFAULT_CURRENCY`, and their type
+    totals, which are derived data, are rebuilt per currency. Likewise, databases
+    created before there were several portfolios have every line item, snapshot and
+    change set moved into `DEFAULT_PORTFOLIO`. Databases created before line item ids
+    were AUTOINCREMENT have the table rebuilt the same way, and the ids of deleted line
+    items that are still referenced by ledgers or the journal are kept from being reused.
+    Missing tables and indexes are then created. Calling this on an up to date database
+    is a no-op.
+    """
+    SQLModel.metadata.create_all(engine)
+
+    with engine.begin() as connection:
+        # The sqlite3 module only opens a transaction before DML, so without this a
+        # failing rebuild would leave a renamed table behind
+        connection.exec_driver_sql("BEGIN")
+        columns = connection.execute(text("PRAGMA table_info(lineitem)")).fetchall()
+        column_types = {column[1]: column[2].upper() for column in columns}
+
+        if "currency" not in column_types:
+            connection.execute(
+                text(
+                    "ALTER TABLE lineitem ADD COLUMN currency VARCHAR NOT NULL "
+                    f"DEFAULT '{DEFAULT_CURRENCY}'"
+                )
+            )
+
+        for table_name in ("lineitem", "changeset"):
+            if "portfolio_id" not in _column_names(connection, table_name):
+                connection.execute(
+                    text(
+                        f"ALTER TABLE {table_name} ADD COLUMN portfolio_id INTEGER NOT NULL "
+                        f"DEFAULT {DEFAULT_PORTFOLIO}"
+                    )
+                )
+
+        if not {"currency", "portfolio_id"} <= _column_names(connection, "typetotal"):
+            for name in TYPE_TOTAL_TRIGGERS:
+                connection.execute(text(f"DROP TRIGGER IF EXISTS {name}"))
+            connection.execute(text("DROP TABLE typetotal"))
+            TypeTotal.__table__.create(connection)
+
+        if "portfolio_id" not in _column_names(connection, "networthsnapshot"):
+            connection.execute(
+                text("ALTER TABLE networthsnapshot RENAME TO networthsnapshot_old")
+            )
+            for index in NetWorthSnapshot.__table__.indexes:
+                connection.execute(text(f"DROP INDEX IF EXISTS {index.name}"))
+            NetWorthSnapshot.__table__.create(connection)
+            connection.execute(
+                text(
+                    "INSERT INTO networthsnapshot (taken_on, portfolio_id, status, type, amount) "
+                    f"SELECT taken_on, {DEFAULT_PORTFOLIO}, status, type, amount "
+                    "FROM networthsnapshot_old"
+                )
+            )
+            connection.execute(text("DROP TABLE networthsnapshot_old"))
+
+        amount_in_cents = column_types.get("amount", "INTEGER") == "INTEGER"
+        table_sql = connection.execute(
+            text("SELECT sql FROM sqlite_master WHERE type = 'table' AND name = 'lineitem'")
+        ).scalar()
+        if not amount_in_cents or "AUTOINCREMENT" not in table_sql.upper():
+            amount = (
+                "amount"
+                if amount_in_cents
+                else "CAST(ROUND(CAST(amount AS REAL) * 100) AS INTEGER)"
+            )
+            # Renaming would point the ledger trigger at the old table, so it is dropped
+            # first, like the triggers dropped with the old table it is created again
+            for name in LEDGER_TRIGGERS:
+                connection.execute(text(f"DROP TRIGGER IF EXISTS {name}"))
+            connection.execute(text("ALTER TABLE lineitem RENAME TO lineitem_old"))
+            for index in LineItem.__table__.indexes:
+                connection.execute(text(f"DROP INDEX IF EXISTS {index.name}"))
+            LineItem.__table__.create(connection)
+            connection.execute(
+                text(
+                    "INSERT INTO lineitem "
+                    "(id, name, type, status, amount, currency, portfolio_id) "
+                    f"SELECT id, name, type, status, {amount}, currency, portfolio_id "
+                    "FROM lineitem_old"
+                )
+            )
+            connection.execute(text("DROP TABLE lineitem_old"))
+            connection.execute(text("DELETE FROM sqlite_sequence WHERE name = 'lineitem'"))
+            connection.execute(
+                text(
+                    "INSERT INTO sqlite_sequence (name, seq) SELECT 'lineitem', MAX(("
+                    "SELECT COALESCE(MAX(id), 0) FROM lineitem), ("
+                    "SELECT COALESCE(MAX(line_item_id), 0) FROM lineitemtransaction), ("
+                    "SELECT COALESCE(MAX(line_item_id), 0) FROM change))"
+                )
+            )
+
+    create_indexes()
+    create_triggers()
+    create_search_index()
+    create_journal()
+    create_ledger()
 
 
-def get_all_items() -> List[dict]:
+def _column_names(connection: Any, table_name: str) -> set:
+    rows = connection.execute(text(f"PRAGMA table_info({table_name})")).fetchall()
+    return {row[1] for row in rows}
+
+
+def _table_names(connection: Any) -> set:
+    rows = connection.execute(text("SELECT name FROM sqlite_master WHERE type = 'table'"))
+    return {row[0] for row in rows}
+
+
+def _create_triggers(connection: Any, triggers: Dict[str, str]) -> bool:
+    """
+    Creates every trigger in `triggers` that is missing, or was defined differently by
+    an older version of the app, and returns whether any was (re)created.
+    """
+    existing = dict(
+        connection.execute(
+            text("SELECT name, sql FROM sqlite_master WHERE type = 'trigger'")
+        ).fetchall()
+    )
+
+    created = False
+    for name, definition in triggers.items():
+        statement = f"CREATE TRIGGER {name} {definition}"
+        if existing.get(name) != statement:
+            connection.execute(text(f"DROP TRIGGER IF EXISTS {name}"))
+            connection.execute(text(statement))
+            created = True
+    return created
+
+
+def create_triggers() -> None:
+    """
+    Creates the triggers that keep `TypeTotal` current. When any of them was missing or
+    outdated, the totals may have drifted, so they are rebuilt from the line items.
+    """
+    with engine.begin() as connection:
+        if _create_triggers(connection, TYPE_TOTAL_TRIGGERS):
+            connection.execute(text("DELETE FROM typetotal"))
+            connection.execute(
+                text(
+                    "INSERT INTO typetotal "
+                    "(portfolio_id, status, type, currency, amount, item_count) "
+                    "SELECT portfolio_id, status, type, currency, SUM(amount), COUNT(*) "
+                    "FROM lineitem GROUP BY portfolio_id, status, type, currency"
+                )
+            )
+
+
+def create_search_index() -> None:
+    """
+    Creates the `lineitem_search` full-text index and the triggers that keep it in step
+    with the line items. When the index or any trigger was missing or outdated, the
+    index is rebuilt from the line items.
+    """
+    with engine.begin() as connection:
+        rebuild = "lineitem_search" not in _table_names(connection)
+        if rebuild:
+            connection.execute(text(SEARCH_TABLE))
+            connection.execute(
+                text("INSERT INTO lineitem_search (lineitem_search, rank) VALUES ('rank', :rank)"),
+                {"rank": SEARCH_RANK},
+            )
+
+        if _create_triggers(connection, SEARCH_TRIGGERS) or rebuild:
+            connection.execute(
+                text("INSERT INTO lineitem_search (lineitem_search) VALUES ('rebuild')")
+            )
+
+
+def create_journal() -> None:
+    """
+    Creates the triggers that append every change to the line items to the `change`
+    journal. When any of them was missing or outdated, changes may have gone unrecorded,
+    so a checkpoint of the current line items is recorded for past states to be rebuilt
+    from.
+    """
+    with engine.begin() as connection:
+        if _create_triggers(connection, JOURNAL_TRIGGERS):
+            _write_checkpoint(connection)
+
+
+def create_ledger() -> None:
+    """
+    Creates the trigger that keeps the amount of every line item with a ledger at the
+    balance of its entries as they are posted.
+    """
+    with engine.begin() as connection:
+        _create_triggers(connection, LEDGER_TRIGGERS)
+
+
+def create_indexes() -> None:
+    """
+    Creates any index declared on the models that is missing from the database, and
+    drops line item indexes that are no longer declared.
+
+    `create_all` only adds indexes together with new tables, so databases created
+    before an index was declared pick it up here. Line items used to be indexed by
+    single columns, which every write still had to maintain after they were replaced
+    by indexes per portfolio.
+    """
+    with engine.begin() as connection:
+        for model in (LineItem, ChangeSet):
+            for index in model.__table__.indexes:
+                index.create(connection, checkfirst=True)
+
+        declared = {index.name for index in LineItem.__table__.indexes}
+        existing = connection.execute(
+            text(
+                "SELECT name FROM sqlite_master "
+                "WHERE type = 'index' AND tbl_name = 'lineitem' AND name LIKE 'ix_%'"
+            )
+        )
+        for (name,) in existing.fetchall():
+            if name not in declared:
+                connection.execute(text(f"DROP INDEX {name}"))
+
+
+@metrics.timed
+def get_all_items(portfolio_id: int = DEFAULT_PORTFOLIO) -> List[dict]:
     """
-    Retrieves all line items from the database and returns them as a list of dictionaries.
+    Retrieves all line items of a portfolio from the database and returns them as a list
+    of dictionaries.
 
     This function uses a `select` statement to retrieve all rows from the `LineItem` table
     in the database. It then converts each row to a dictionary and returns a list of all
     dictionaries.
 
+    Args:
+        portfolio_id (int): The portfolio to retrieve the line items of.
 
     Returns:
         List[dict]: A list of dictionaries, where each dictionary represents a line item
                     in the database.
     """
-    with session:
-        line_items = session.exec(select(LineItem)).all()
-        return [dict(item) for item in line_items]
+    with Session(engine) as session:
+        line_items = session.exec(
+            select(LineItem)
+            .where(LineItem.portfolio_id == portfolio_id)
+            .order_by(LineItem.id)
+        ).all()
+        return [item.dict() for item in line_items]
+
+
+@metrics.timed
+def get_line_item_columns(portfolio_id: int = DEFAULT_PORTFOLIO) -> "LineItemColumns":
+    """This function reads the line items of a portfolio straight from the cursor into
+    the compact arrays of a `LineItemColumns`, `BATCH_SIZE` rows at a time, without
+    creating a model or a dictionary per line item.
+
+    The count and the rows are read in one transaction, so they always agree.
+
+    Args:
+        portfolio_id (int): The portfolio to read the line items of.
+
+    Returns:
+        LineItemColumns: The amounts, names, types, statuses and currencies of the line
+                         items, in the order they were created.
+    """
+    from database.columns import LineItemColumns
 
+    # The statements run through the engine, so they are counted like every other
+    # query, but the rows are fetched from the sqlite3 cursor as plain tuples, skipping
+    # SQLAlchemy's row objects, which would cost as much as reading them. SQLite only
+    # starts a transaction for writes on its own, so the read one is begun explicitly.
+    with engine.connect() as connection:
+        connection.exec_driver_sql("BEGIN")
+        try:
+            count = connection.exec_driver_sql(
+                "SELECT COUNT(*) FROM lineitem WHERE portfolio_id = ?", (portfolio_id,)
+            ).scalar()
+            result = connection.exec_driver_sql(
+                "SELECT name, type, status, currency, amount FROM lineitem "
+                "WHERE portfolio_id = ? ORDER BY id",
+                (portfolio_id,),
+            )
+            batches = iter(lambda: result.cursor.fetchmany(BATCH_SIZE), [])
+            return LineItemColumns.from_rows(batches, count)
+        finally:
+            connection.exec_driver_sql("COMMIT")
 
-def create_line_item(name: str, type: str, status: str, amount: str) -> dict:
+
+@metrics.timed
+def create_line_item(
+    name: str,
+    type: str,
+    status: str,
+    amount: int,
+    currency: str = DEFAULT_CURRENCY,
+    portfolio_id: int = DEFAULT_PORTFOLIO,
+) -> dict:
     """Creates a new line item in the database and returns it as a dictionary.
 
     This function creates a new `LineItem` object with the specified `name`,
@@ -52,90 +656,1241 @@ def create_line_item(name: str, type: str, status: str, amount: str) -> dict:
     Args:
         name (str): The name of the line item to be created.
         type (str): The type of the line item to be created.
-        amount (str): The amount of the line item to be created.
+        status (str): Whether the line item is an "Asset" or a "Liability".
+        amount (int): The amount of the line item to be created, in cents.
+        currency (str): The currency of the amount, e.g. "EUR".
+        portfolio_id (int): The portfolio to create the line item in.
 
     Returns:
         dict: A dictionary representation of the newly created line item.
     """
-    with session:
-        new_item = LineItem(name=name, type=type, status=status, amount=amount)
+    with Session(engine) as session:
+        new_item = LineItem(
+            name=name,
+            type=type,
+            status=status,
+            amount=amount,
+            currency=currency,
+            portfolio_id=portfolio_id,
+        )
 
-        session.add(new_item)
+        with _changeset(session, portfolio_id):
+            session.add(new_item)
+            session.flush()
         session.commit()
         session.refresh(new_item)
-        return dict(new_item)
+        return new_item.dict()
 
 
-def get_line_item(line_item_id: int) -> dict:
-    """This function retrieves a line item from the database based on the
-    provided name, type, and amount.
+@metrics.timed
+def get_line_item(line_item_id: int, portfolio_id: int = DEFAULT_PORTFOLIO) -> dict:
+    """This function retrieves a line item from the database by its id.
 
     Args:
-        name (str): The name of the line item to retrieve.
-        type (str): The type of the line item to retrieve.
-        amount (str): The amount of the line item to retrieve.
+        line_item_id (int): The ID of the line item to retrieve.
+        portfolio_id (int): The portfolio the line item belongs to.
+
+    Raises:
+        KeyError: If there is no line item with that id in the portfolio.
 
     Returns:
         dict: A dictionary representation of the retrieved line item.
     """
-    with session:
+    with Session(engine) as session:
         line_item = session.exec(
-            select(LineItem).where(LineItem.id == line_item_id)
+            select(LineItem)
+            .where(LineItem.id == line_item_id)
+            .where(LineItem.portfolio_id == portfolio_id)
         ).first()
+        if line_item is None:
+            raise KeyError(line_item_id)
 
-        return dict(line_item)
+        return line_item.dict()
 
 
+@metrics.timed
 def update_line_item(
     id: int,
     name: str,
     status: str,
     type: str,
-    amount: str,
-) -> None:
+    amount: int,
+    currency: str = DEFAULT_CURRENCY,
+    portfolio_id: int = DEFAULT_PORTFOLIO,
+) -> dict:
     """This function updates a line item in the database based on the provided name,
     type, and amount. The line item is updated with the new values for name, type,
-    and amount.
+    and amount. If the line item has a ledger, a new amount is posted to it as a
+    valuation, see `_EDITED_VALUATION`.
 
     Args:
         id (int): integer representation of the record id
         name (str): The name of the line item to update.
         type (str): The type of the line item to update.
-        amount (str): The amount of the line item to update.
+        status (str): Whether the line item is an "Asset" or a "Liability".
+        amount (int): The amount of the line item to update, in cents.
+        currency (str): The currency of the amount, e.g. "EUR".
+        portfolio_id (int): The portfolio the line item belongs to.
+
+    Raises:
+        KeyError: If there is no line item with that id in the portfolio.
+
+    Returns:
+        dict: The line item as stored.
     """
-    with session:
-        line_item = session.exec(select(LineItem).where(LineItem.id == id)).first()
+    with Session(engine) as session:
+        line_item = session.exec(
+            select(LineItem)
+            .where(LineItem.id == id)
+            .where(LineItem.portfolio_id == portfolio_id)
+        ).first()
+        if line_item is None:
+            raise KeyError(id)
 
         line_item.name = name
         line_item.type = type
         line_item.status = status
-        line_item.amount = amount
+        if not _ledgered_ids(session, [id], portfolio_id):
+            line_item.amount = amount
+        line_item.currency = currency
 
-        session.add(line_item)
+        with _changeset(session, portfolio_id):
+            session.add(line_item)
+            session.flush()
+        _post_edited_amounts(session, portfolio_id, {id: amount})
         session.commit()
         session.refresh(line_item)
+        return line_item.dict()
 
 
-def delete_line_item(line_item_id: int) -> None:
+@metrics.timed
+def delete_line_item(line_item_id: int, portfolio_id: int = DEFAULT_PORTFOLIO) -> None:
     """This function deletes a line item from the database based on the provided line item ID.
 
     Args:
         line_item_id (int): The ID of the line item to delete.
+        portfolio_id (int): The portfolio the line item belongs to.
+    """
+    delete_line_items([line_item_id], portfolio_id)
+
+
+def _id_chunks(line_item_ids: Sequence[int]) -> Iterable[List[int]]:
+    ids = iter(line_item_ids)
+    while chunk := list(islice(ids, MAX_IDS_PER_STATEMENT)):
+        yield chunk
+
+
+def _ledgered_ids(
+    connection: Any, line_item_ids: Sequence[int], portfolio_id: int
+) -> Set[int]:
+    """
+    Returns which of at most `MAX_IDS_PER_STATEMENT` line items are in the portfolio
+    and have a ledger.
+    """
+    return set(
+        connection.execute(
+            select(LineItem.id)
+            .where(LineItem.id.in_(line_item_ids))
+            .where(LineItem.portfolio_id == portfolio_id)
+            .where(exists().where(Transaction.line_item_id == LineItem.id))
+        ).scalars()
+    )
+
+
+def _post_edited_amounts(
+    connection: Any, portfolio_id: int, amounts: Dict[int, int]
+) -> None:
+    """
+    Posts the edited amounts of line items with a ledger, keyed by line item id, as
+    valuations in a change set of their own, like any other posting. The line items
+    must have been checked to be in the portfolio and to have a ledger.
+    """
+    if not amounts:
+        return
+
+    with _changeset(connection, portfolio_id, kind="ledger"):
+        connection.execute(
+            _EDITED_VALUATION,
+            [
+                {"line_item_id": line_item_id, "amount": amount, "today": date.today()}
+                for line_item_id, amount in amounts.items()
+            ],
+        )
+
+
+@contextmanager
+def _changeset(
+    connection: Any, portfolio_id: int, kind: str = "edit", reverts: Optional[int] = None
+) -> Iterator[int]:
+    """
+    Opens a change set of a portfolio in the connection's or session's transaction,
+    which the journal triggers file every change to the line items made within the
+    block under. A change set that ends up without changes is dropped again, so undo
+    never lands on a no-op.
+    """
+    changeset_id = connection.execute(
+        insert(ChangeSet).values(
+            made_at=datetime.now(), portfolio_id=portfolio_id, kind=kind, reverts=reverts
+        )
+    ).inserted_primary_key[0]
+
+    yield changeset_id
+
+    connection.execute(
+        delete(ChangeSet)
+        .where(ChangeSet.id == changeset_id)
+        .where(~exists().where(Change.changeset_id == changeset_id))
+        .execution_options(synchronize_session=False)
+    )
+
+
+@metrics.timed
+def delete_line_items(
+    line_item_ids: Sequence[int], portfolio_id: int = DEFAULT_PORTFOLIO
+) -> int:
+    """This function deletes many line items in one transaction with
+    `DELETE ... WHERE id IN (...)`, without loading them first. IDs of line items in
+    other portfolios are ignored.
+
+    Args:
+        line_item_ids (Sequence[int]): The IDs of the line items to delete.
+        portfolio_id (int): The portfolio the line items belong to.
+
+    Returns:
+        int: The number of line items deleted.
+    """
+    deleted = 0
+
+    with Session(engine) as session:
+        with _changeset(session, portfolio_id):
+            for chunk in _id_chunks(line_item_ids):
+                result = session.execute(
+                    delete(LineItem)
+                    .where(LineItem.id.in_(chunk))
+                    .where(LineItem.portfolio_id == portfolio_id)
+                    .execution_options(synchronize_session=False)
+                )
+                deleted += result.rowcount
+        session.commit()
+
+    return deleted
+
+
+@metrics.timed
+def update_line_items(
+    line_item_ids: Sequence[int],
+    values: Dict[str, Any],
+    portfolio_id: int = DEFAULT_PORTFOLIO,
+) -> int:
+    """This function sets the same values on many line items in one transaction with
+    `UPDATE ... WHERE id IN (...)`, leaving the columns not in `values` unchanged. IDs of
+    line items in other portfolios are ignored. A new amount is posted to the ledgers
+    of the line items that have one as a valuation, see `_EDITED_VALUATION`.
+
+    Args:
+        line_item_ids (Sequence[int]): The IDs of the line items to update.
+        values (Dict[str, Any]): The new "name", "type", "status", "amount" (in cents)
+            and/or "currency".
+        portfolio_id (int): The portfolio the line items belong to.
+
+    Raises:
+        ValueError: If `values` names a column that cannot be bulk updated.
+
+    Returns:
+        int: The number of line items updated.
     """
-    with session:
+    unknown = set(values) - {"name", "type", "status", "amount", "currency"}
+    if unknown:
+        raise ValueError(f"Cannot update columns: {', '.join(sorted(unknown))}")
+    if not values:
+        return 0
+
+    updated = 0
+    # Line items with a ledger get every value but the amount, which is posted instead
+    edited_amounts: Dict[int, int] = {}
+    other_values = {name: value for name, value in values.items() if name != "amount"}
+
+    with Session(engine) as session:
+        with _changeset(session, portfolio_id):
+            for chunk in _id_chunks(line_item_ids):
+                ledgered = set()
+                if "amount" in values:
+                    ledgered = _ledgered_ids(session, chunk, portfolio_id)
+                unledgered = [
+                    line_item_id for line_item_id in chunk if line_item_id not in ledgered
+                ]
+                if unledgered:
+                    result = session.execute(
+                        update(LineItem)
+                        .where(LineItem.id.in_(unledgered))
+                        .where(LineItem.portfolio_id == portfolio_id)
+                        .values(**values)
+                        .execution_options(synchronize_session=False)
+                    )
+                    updated += result.rowcount
+                if ledgered and other_values:
+                    session.execute(
+                        update(LineItem)
+                        .where(LineItem.id.in_(ledgered))
+                        .values(**other_values)
+                        .execution_options(synchronize_session=False)
+                    )
+                updated += len(ledgered)
+                edited_amounts.update(dict.fromkeys(ledgered, values.get("amount")))
+        _post_edited_amounts(session, portfolio_id, edited_amounts)
+        session.commit()
+
+    return updated
+
+
+@metrics.timed
+def bulk_upsert_line_items(
+    rows: Iterable[dict], batch_size: int = 5000, portfolio_id: int = DEFAULT_PORTFOLIO
+) -> Dict[str, int]:
+    """This function inserts or updates many line items of a portfolio in a single
+    transaction, using their name and type as the natural key.
+
+    Rows are consumed lazily in batches of `batch_size` and written with `executemany`
+    into a temporary staging table, where a later row replaces an earlier one with the
+    same key. The staging table is then merged into `LineItem` with one UPDATE for
+    existing items and one INSERT for new ones. A new amount of an existing line item
+    with a ledger is posted to it as a valuation, see `_EDITED_VALUATION`.
+
+    Args:
+        rows (Iterable[dict]): Validated rows with "name", "type", "status", "amount"
+            (in cents) and optionally "currency", which defaults to `DEFAULT_CURRENCY`.
+        batch_size (int): How many rows to send to SQLite at a time.
+        portfolio_id (int): The portfolio to insert or update the line items in.
+
+    Returns:
+        Dict[str, int]: The number of "inserted" and "updated" line items.
+    """
+    matches_staged = (
+        "FROM import_staging AS staged "
+        "WHERE staged.name = lineitem.name AND staged.type = lineitem.type"
+    )
+    has_ledger = (
+        "EXISTS (SELECT 1 FROM lineitemtransaction WHERE line_item_id = lineitem.id)"
+    )
+
+    with engine.begin() as connection:
+        connection.execute(
+            text(
+                "CREATE TEMP TABLE IF NOT EXISTS import_staging ("
+                "name TEXT NOT NULL, type TEXT NOT NULL, status TEXT NOT NULL, "
+                "amount INTEGER NOT NULL, currency TEXT NOT NULL, PRIMARY KEY (name, type))"
+            )
+        )
+        connection.execute(text("DELETE FROM import_staging"))
+
+        rows = iter(rows)
+        while batch := list(islice(rows, batch_size)):
+            connection.execute(
+                text(
+                    "INSERT OR REPLACE INTO import_staging "
+                    "(name, type, status, amount, currency) "
+                    "VALUES (:name, :type, :status, :amount, :currency)"
+                ),
+                [{"currency": DEFAULT_CURRENCY, **row} for row in batch],
+            )
+
+        with _changeset(connection, portfolio_id):
+            updated = connection.execute(
+                text(
+                    "UPDATE lineitem SET "
+                    f"status = (SELECT staged.status {matches_staged}), "
+                    f"amount = CASE WHEN {has_ledger} THEN amount "
+                    f"ELSE (SELECT staged.amount {matches_staged}) END, "
+                    f"currency = (SELECT staged.currency {matches_staged}) "
+                    "WHERE portfolio_id = :portfolio_id "
+                    f"AND EXISTS (SELECT 1 {matches_staged})"
+                ),
+                {"portfolio_id": portfolio_id},
+            ).rowcount
+            inserted = connection.execute(
+                text(
+                    "INSERT INTO lineitem (name, type, status, amount, currency, portfolio_id) "
+                    "SELECT name, type, status, amount, currency, :portfolio_id "
+                    "FROM import_staging AS staged "
+                    "WHERE NOT EXISTS (SELECT 1 FROM lineitem "
+                    "WHERE lineitem.name = staged.name AND lineitem.type = staged.type "
+                    "AND lineitem.portfolio_id = :portfolio_id)"
+                ),
+                {"portfolio_id": portfolio_id},
+            ).rowcount
+
+        edited_amounts = connection.execute(
+            text(
+                # Starts from the few line items with a ledger rather than all of them
+                "SELECT lineitem.id, staged.amount "
+                "FROM (SELECT DISTINCT line_item_id FROM lineitemtransaction) AS ledgered "
+                "CROSS JOIN lineitem ON lineitem.id = ledgered.line_item_id "
+                "JOIN import_staging AS staged "
+                "ON staged.name = lineitem.name AND staged.type = lineitem.type "
+                "WHERE lineitem.portfolio_id = :portfolio_id"
+            ),
+            {"portfolio_id": portfolio_id},
+        ).fetchall()
+        _post_edited_amounts(connection, portfolio_id, dict(edited_amounts))
+
+        connection.execute(text("DROP TABLE import_staging"))
+
+    return {"inserted": inserted, "updated": updated}
+
+
+@metrics.timed
+def undo(portfolio_id: int = DEFAULT_PORTFOLIO) -> Optional[Dict[int, Optional[dict]]]:
+    """This function reverts the latest change set of a portfolio that was not undone yet,
+    such as an edit, a bulk delete or an import, by applying the old values journaled for
+    it. The revert is itself journaled as an "undo" change set, so it can be redone and
+    history is never rewritten.
+
+    Args:
+        portfolio_id (int): The portfolio to undo the latest change of.
+
+    Returns:
+        Optional[Dict[int, Optional[dict]]]: The line items the undo changed, keyed by
+            id, with None for those it deleted, or None if there was nothing to undo.
+    """
+    return _revert(_UNDOABLE, "undo", portfolio_id)
+
+
+@metrics.timed
+def redo(portfolio_id: int = DEFAULT_PORTFOLIO) -> Optional[Dict[int, Optional[dict]]]:
+    """This function reverts the latest undo in a portfolio, as long as no other edit was
+    made there since.
+
+    Args:
+        portfolio_id (int): The portfolio to redo the latest undo of.
+
+    Returns:
+        Optional[Dict[int, Optional[dict]]]: The line items the redo changed, keyed by
+            id, with None for those it deleted, or None if there was nothing to redo.
+    """
+    return _revert(_REDOABLE, "redo", portfolio_id)
+
+
+def _revert(target: Any, kind: str, portfolio_id: int) -> Optional[Dict[int, Optional[dict]]]:
+    with engine.begin() as connection:
+        reverts = connection.execute(target, {"portfolio_id": portfolio_id}).scalar()
+        if reverts is None:
+            return None
+
+        changes = connection.execute(
+            select(Change.line_item_id, Change.old_values, Change.new_values).where(
+                Change.changeset_id == reverts
+            )
+        ).fetchall()
+
+        # Each line item changes at most once per change set, so the inverse of every
+        # change can be applied in one statement per kind of change
+        removed = [line_item_id for line_item_id, old, _ in changes if old is None]
+        restored = [
+            {"id": line_item_id, **json.loads(old)}
+            for line_item_id, old, new in changes
+            if new is None
+        ]
+        updates = defaultdict(list)
+        for line_item_id, old, new in changes:
+            if old is not None and new is not None:
+                values = json.loads(old)
+                updates[tuple(sorted(values))].append({"line_item_id": line_item_id, **values})
+
+        with _changeset(connection, portfolio_id, kind, reverts):
+            for chunk in _id_chunks(removed):
+                connection.execute(delete(LineItem).where(LineItem.id.in_(chunk)))
+            if restored:
+                connection.execute(insert(LineItem), restored)
+            for columns, rows in updates.items():
+                connection.execute(
+                    update(LineItem)
+                    .where(LineItem.id == bindparam("line_item_id"))
+                    .values({name: bindparam(name) for name in columns}),
+                    rows,
+                )
+
+        ids = [line_item_id for line_item_id, _, _ in changes]
+        reverted: Dict[int, Optional[dict]] = dict.fromkeys(ids)
+        for chunk in _id_chunks(ids):
+            for row in connection.execute(select(LineItem).where(LineItem.id.in_(chunk))):
+                reverted[row.id] = dict(row._mapping)
+        return reverted
+
+
+@metrics.timed
+def record_checkpoint(min_changes: int = CHECKPOINT_INTERVAL) -> bool:
+    """This function records a checkpoint of every line item, if at least `min_changes`
+    changes were journaled since the last one. Called periodically, so rebuilding a
+    past state only replays the changes made after the checkpoint before it.
+
+    Args:
+        min_changes (int): How many changes make a new checkpoint worthwhile.
+
+    Returns:
+        bool: Whether a checkpoint was recorded.
+    """
+    with engine.begin() as connection:
+        last = connection.execute(text("SELECT MAX(change_id) FROM checkpoint")).scalar()
+        latest = connection.execute(text("SELECT COALESCE(MAX(id), 0) FROM change")).scalar()
+        if last is not None and latest - last < max(min_changes, 1):
+            return False
+
+        _write_checkpoint(connection)
+        return True
+
+
+def _write_checkpoint(connection: Any) -> None:
+    latest = connection.execute(text("SELECT COALESCE(MAX(id), 0) FROM change")).scalar()
+    rows = connection.execute(
+        text(f"SELECT id, {', '.join(JOURNAL_COLUMNS)} FROM lineitem")
+    ).fetchall()
+    data = zlib.compress(json.dumps([list(row) for row in rows], separators=(",", ":")).encode())
+    connection.execute(
+        insert(Checkpoint)
+        .prefix_with("OR REPLACE")
+        .values(change_id=latest, made_at=datetime.now(), data=data)
+    )
+
+
+@metrics.timed
+def add_transaction(
+    line_item_id: int,
+    posted_on: date,
+    kind: str,
+    amount: int,
+    memo: str = "",
+    portfolio_id: int = DEFAULT_PORTFOLIO,
+) -> dict:
+    """This function posts a deposit, payment or valuation to the ledger of a line item,
+    which updates the line item's amount to the new balance in the same transaction.
+
+    The first posting to a line item opens its ledger with a valuation of the amount it
+    had until then, dated `date.min`, so its balance as of any day is known. Postings
+    are journaled like edits, but cannot be undone.
+
+    Args:
+        line_item_id (int): The ID of the line item to post to.
+        posted_on (date): The day of the entry, which may be in the past.
+        kind (str): "deposit", "payment" or "valuation".
+        amount (int): The amount deposited, paid or valued, in cents.
+        memo (str): A description of the entry.
+        portfolio_id (int): The portfolio the line item belongs to.
+
+    Raises:
+        ValueError: If `kind` is not one of `TRANSACTION_KINDS`.
+        KeyError: If there is no line item with that id in the portfolio.
+
+    Returns:
+        dict: The line item with its new balance as its amount.
+    """
+    if kind not in TRANSACTION_KINDS:
+        raise ValueError(f"Unknown transaction kind: {kind}")
+
+    with Session(engine) as session:
         line_item = session.exec(
-            select(LineItem).where(LineItem.id == line_item_id)
-        ).one()
+            select(LineItem)
+            .where(LineItem.id == line_item_id)
+            .where(LineItem.portfolio_id == portfolio_id)
+        ).first()
+        if line_item is None:
+            raise KeyError(line_item_id)
+
+        with _changeset(session, portfolio_id, kind="ledger"):
+            opened = session.exec(
+                select(Transaction.id).where(Transaction.line_item_id == line_item_id).limit(1)
+            ).first()
+            if opened is None:
+                session.add(
+                    Transaction(
+                        line_item_id=line_item_id,
+                        posted_on=date.min,
+                        kind="valuation",
+                        amount=line_item.amount,
+                        memo="Opening balance",
+                    )
+                )
+            session.add(
+                Transaction(
+                    line_item_id=line_item_id,
+                    posted_on=posted_on,
+                    kind=kind,
+                    amount=amount,
+                    memo=memo,
+                )
+            )
+            session.flush()
+        session.commit()
+
+        session.refresh(line_item)
+        return line_item.dict()
+
+
+def get_balance_at(
+    line_item_id: int, day: date, portfolio_id: int = DEFAULT_PORTFOLIO
+) -> Optional[int]:
+    """This function returns the balance of a line item at the end of a day, from the
+    latest valuation up to that day plus the deposits and payments posted after it.
+
+    Args:
+        line_item_id (int): The ID of the line item.
+        day (date): The day to return the balance at.
+        portfolio_id (int): The portfolio the line item belongs to.
+
+    Raises:
+        KeyError: If there is no line item with that id in the portfolio.
+
+    Returns:
+        Optional[int]: The balance in cents, or None if the line item has no ledger.
+    """
+    with engine.connect() as connection:
+        _check_line_item(connection, line_item_id, portfolio_id)
+        return connection.execute(
+            _BALANCE_AT, {"line_item_id": line_item_id, "day": day}
+        ).scalar()
+
+
+@metrics.timed
+def get_statement(
+    line_item_id: int, start: date, end: date, portfolio_id: int = DEFAULT_PORTFOLIO
+) -> Dict[str, Any]:
+    """This function returns the ledger entries of a line item between two days, each
+    with the balance after it. Only the entries in the range and the ones since the
+    valuation before it are read.
+
+    Args:
+        line_item_id (int): The ID of the line item.
+        start (date): The first day to include.
+        end (date): The last day to include.
+        portfolio_id (int): The portfolio the line item belongs to.
+
+    Raises:
+        KeyError: If there is no line item with that id in the portfolio.
+
+    Returns:
+        Dict[str, Any]: The "opening_balance" before `start`, or None if the ledger was
+                        not open yet, the "entries" with their "balance", oldest first,
+                        and the "closing_balance" at the end of `end`. Amounts are in
+                        cents.
+    """
+    with engine.connect() as connection:
+        _check_line_item(connection, line_item_id, portfolio_id)
+        opening = connection.execute(
+            _BALANCE_AT, {"line_item_id": line_item_id, "day": start - timedelta(days=1)}
+        ).scalar()
+        rows = connection.execute(
+            select(Transaction)
+            .where(Transaction.line_item_id == line_item_id)
+            .where(Transaction.posted_on.between(start, end))
+            .order_by(Transaction.posted_on, Transaction.id)
+        ).fetchall()
+
+    balance = opening or 0
+    entries = []
+    for row in rows:
+        if row.kind == "valuation":
+            balance = row.amount
+        else:
+            balance += row.amount if row.kind == "deposit" else -row.amount
+        entries.append({**row._mapping, "balance": balance})
+
+    closing = balance if entries else opening
+    return {"opening_balance": opening, "entries": entries, "closing_balance": closing}
+
+
+def _check_line_item(connection: Any, line_item_id: int, portfolio_id: int) -> None:
+    found = connection.execute(
+        select(LineItem.id)
+        .where(LineItem.id == line_item_id)
+        .where(LineItem.portfolio_id == portfolio_id)
+    ).first()
+    if found is None:
+        raise KeyError(line_item_id)
+
+
+@metrics.timed
+def backup_database(
+    target_path: str,
+    pages_per_step: int = BACKUP_PAGES_PER_STEP,
+    progress: Optional[Callable[[int, int, int], None]] = None,
+) -> None:
+    """This function copies the database into another file with SQLite's online backup
+    API while the app keeps using it.
+
+    The copy is made `pages_per_step` pages at a time. Between steps the lock on the
+    database is released, so reads and writes go ahead during a long backup, and a step
+    that finds the database modified restarts the copy from a consistent state. The
+    copy is written next to `target_path` and only moved into place once complete, so
+    an interrupted backup never leaves a partial file behind.
+
+    Args:
+        target_path (str): The path of the backup file, replaced if it exists.
+        pages_per_step (int): How many pages to copy per step.
+        progress (Optional[Callable[[int, int, int], None]]): Called after every step
+            with the status, the number of pages remaining and the total page count.
+    """
+    partial_path = f"{target_path}.partial"
+    source = engine.raw_connection()
+    try:
+        target = sqlite3.connect(partial_path)
+        try:
+            source.driver_connection.backup(target, pages=pages_per_step, progress=progress)
+        finally:
+            target.close()
+        os.replace(partial_path, target_path)
+    except Exception:
+        if os.path.exists(partial_path):
+            os.remove(partial_path)
+        raise
+    finally:
+        source.close()
+
+
+def iter_batches(statement: Any, batch_size: int = BATCH_SIZE) -> Iterator[List[tuple]]:
+    """This function runs a query and yields its rows `batch_size` at a time, so tables
+    of any size can be streamed out with a bounded amount of memory.
+
+    Args:
+        statement (Any): The select statement to run.
+        batch_size (int): How many rows to yield at a time.
+
+    Returns:
+        Iterator[List[tuple]]: The rows, as tuples in the order the statement selects them.
+    """
+    with engine.connect() as connection:
+        result = connection.execute(statement)
+        for rows in result.partitions(batch_size):
+            yield [tuple(row) for row in rows]
+
+
+@metrics.timed
+def get_items_at(moment: datetime, portfolio_id: int = DEFAULT_PORTFOLIO) -> List[dict]:
+    """This function rebuilds a portfolio's line items as they were at a past moment,
+    from the latest checkpoint taken before it and the journaled changes made between
+    the two.
+
+    Args:
+        moment (datetime): The local time to rebuild the line items at.
+        portfolio_id (int): The portfolio to rebuild the line items of.
+
+    Raises:
+        ValueError: If `moment` is before the journal was started.
+
+    Returns:
+        List[dict]: The line items at that moment, ordered by id.
+    """
+    with Session(engine) as session:
+        checkpoint = session.exec(
+            select(Checkpoint)
+            .where(Checkpoint.made_at <= moment)
+            .order_by(Checkpoint.change_id.desc())
+            .limit(1)
+        ).first()
+        if checkpoint is None:
+            raise ValueError(f"No line items were journaled before {moment}")
+
+        # Checkpoints taken before there were several portfolios lack the portfolio
+        items = {
+            row[0]: {"portfolio_id": DEFAULT_PORTFOLIO, **dict(zip(("id", *JOURNAL_COLUMNS), row))}
+            for row in json.loads(zlib.decompress(checkpoint.data))
+        }
+
+        changes = session.exec(
+            select(Change.line_item_id, Change.old_values, Change.new_values)
+            .join(ChangeSet, ChangeSet.id == Change.changeset_id)
+            .where(Change.id > checkpoint.change_id)
+            .where(ChangeSet.made_at <= moment)
+            .order_by(Change.id)
+        )
+        for line_item_id, old_values, new_values in changes:
+            if new_values is None:
+                items.pop(line_item_id, None)
+            elif old_values is None:
+                items[line_item_id] = {"id": line_item_id, **json.loads(new_values)}
+            else:
+                items[line_item_id].update(json.loads(new_values))
+
+    return [
+        items[line_item_id]
+        for line_item_id in sorted(items)
+        if items[line_item_id]["portfolio_id"] == portfolio_id
+    ]
+
+
+@metrics.timed
+def get_totals(portfolio_id: int = DEFAULT_PORTFOLIO) -> Dict[str, int]:
+    """This function sums the assets and liabilities of a portfolio with a single
+    aggregate query over the per type totals, so the cost depends on the number of
+    types rather than the number of line items. Each total is converted into the
+    reporting currency by joining it with its exchange rate.
+
+    Args:
+        portfolio_id (int): The portfolio to sum the line items of.
+
+    Returns:
+        Dict[str, int]: The "assets", "liabilities" and "net_worth" totals, in cents of
+                        the reporting currency.
+    """
+    sum_assets = func.coalesce(
+        func.sum(case((TypeTotal.status == "Asset", CONVERTED_TYPE_TOTAL), else_=0)), 0
+    )
+    sum_liabilities = func.coalesce(
+        func.sum(case((TypeTotal.status == "Liability", CONVERTED_TYPE_TOTAL), else_=0)), 0
+    )
+    statement = (
+        select(sum_assets, sum_liabilities)
+        .select_from(TypeTotal)
+        .outerjoin(FxRate, FxRate.currency == TypeTotal.currency)
+        .where(TypeTotal.portfolio_id == portfolio_id)
+    )
+
+    with Session(engine) as session:
+        assets, liabilities = session.exec(statement).one()
+
+    return {
+        "assets": assets,
+        "liabilities": liabilities,
+        "net_worth": assets - liabilities,
+    }
+
+
+@metrics.timed
+def get_type_totals(portfolio_id: int = DEFAULT_PORTFOLIO) -> List[dict]:
+    """This function returns the total and number of line items of every status and
+    type in a portfolio, read from the trigger maintained `TypeTotal` table and
+    converted into the reporting currency.
+
+    Args:
+        portfolio_id (int): The portfolio to total the line items of.
+
+    Returns:
+        List[dict]: One dictionary per status and type with "status", "type", "amount"
+                    (in cents of the reporting currency) and "item_count", ordered by
+                    status and type.
+    """
+    statement = (
+        select(
+            TypeTotal.status,
+            TypeTotal.type,
+            func.sum(CONVERTED_TYPE_TOTAL),
+            func.sum(TypeTotal.item_count),
+        )
+        .outerjoin(FxRate, FxRate.currency == TypeTotal.currency)
+        .where(TypeTotal.portfolio_id == portfolio_id)
+        .group_by(TypeTotal.status, TypeTotal.type)
+        .order_by(TypeTotal.status, TypeTotal.type)
+    )
+
+    with Session(engine) as session:
+        return [
+            {"status": status, "type": type, "amount": amount, "item_count": item_count}
+            for status, type, amount, item_count in session.exec(statement)
+        ]
+
+
+@metrics.timed
+def load_fx_rates(path: str) -> int:
+    """This function replaces the exchange rates with those in a local CSV file with
+    "currency" and "rate" columns, where the rate is how many units of the reporting
+    currency one unit of the currency is worth. The reporting currency itself always
+    has a rate of 1. A missing file keeps the rates stored before, so line items in
+    other currencies are not left out of the totals because the file was moved.
+
+    Args:
+        path (str): The path of the rates file.
+
+    Raises:
+        ValueError: If a row of the file is not a currency with a positive rate.
+
+    Returns:
+        int: The number of rates stored, including the reporting currency.
+    """
+    global fx_rates_version
+
+    rates = {REPORTING_CURRENCY: 1.0}
+    replace = os.path.exists(path)
+    if replace:
+        with open(path, newline="") as rates_file:
+            reader = csv.reader(rates_file)
+            header = [column.strip().lower() for column in next(reader, [])]
+            for number, values in enumerate(reader, start=1):
+                row = dict(zip(header, (value.strip() for value in values)))
+                try:
+                    rate = float(row.get("rate", ""))
+                except ValueError:
+                    rate = 0.0
+                if not row.get("currency") or rate <= 0:
+                    raise ValueError(f"Row {number} of {path} is not a currency and rate")
+                rates[row["currency"].upper()] = rate
+
+    with Session(engine) as session:
+        if replace:
+            session.execute(delete(FxRate))
+        for currency, rate in rates.items():
+            session.merge(FxRate(currency=currency, rate=rate))
+        session.commit()
+        count = session.exec(select(func.count()).select_from(FxRate)).one()
+
+    fx_rates_version += 1
+    return count
+
+
+@metrics.timed
+def get_fx_rates() -> Dict[str, float]:
+    """This function returns the exchange rate of every currency into the reporting
+    currency. The rates are read once per `fx_rates_version`.
+
+    Returns:
+        Dict[str, float]: The rate of each currency, keyed by currency.
+    """
+    return dict(_fx_rates(fx_rates_version))
 
-        session.delete(line_item)
+
+@lru_cache(maxsize=1)
+def _fx_rates(version: int) -> Tuple[Tuple[str, float], ...]:
+    with Session(engine) as session:
+        return tuple((rate.currency, rate.rate) for rate in session.exec(select(FxRate)))
+
+
+def rate_for(rates: Dict[str, float], currency: str) -> float:
+    """This function returns the exchange rate of a currency from `get_fx_rates`. The
+    reporting currency has a rate of 1 even before any rates are loaded, and any other
+    currency without a rate gets 0, which leaves it out of the totals rather than
+    counting it at face value, see `get_unconverted_currencies`.
+
+    Args:
+        rates (Dict[str, float]): The rate of each currency, keyed by currency.
+        currency (str): The currency to return the rate of.
+
+    Returns:
+        float: The rate of the currency.
+    """
+    return rates.get(currency, 1.0 if currency == REPORTING_CURRENCY else 0.0)
+
+
+@metrics.timed
+def get_unconverted_currencies(portfolio_id: int = DEFAULT_PORTFOLIO) -> List[str]:
+    """This function lists the currencies of a portfolio's line items that have no
+    exchange rate, and so are left out of its totals, read from the few rows of the
+    trigger maintained `TypeTotal` table.
+
+    Args:
+        portfolio_id (int): The portfolio to check the line items of.
+
+    Returns:
+        List[str]: The currencies without a rate, in alphabetical order.
+    """
+    statement = (
+        select(TypeTotal.currency)
+        .outerjoin(FxRate, FxRate.currency == TypeTotal.currency)
+        .where(TypeTotal.portfolio_id == portfolio_id)
+        .where(FxRate.rate.is_(None))
+        .where(TypeTotal.currency != REPORTING_CURRENCY)
+        .distinct()
+        .order_by(TypeTotal.currency)
+    )
+
+    with Session(engine) as session:
+        return list(session.exec(statement))
+
+
+def convert_cents(amount: int, rate: float) -> int:
+    """This function converts cents of one currency into cents of the reporting
+    currency, rounding half away from zero like SQLite's ROUND.
+
+    Args:
+        amount (int): The amount in cents.
+        rate (float): The exchange rate of the amount's currency.
+
+    Returns:
+        int: The converted amount in cents.
+    """
+    converted = amount * rate
+    return int(converted + 0.5) if converted >= 0 else -int(-converted + 0.5)
+
+
+@metrics.timed
+def get_projection_assumptions() -> Dict[str, dict]:
+    """This function returns the growth and volatility assumed for each type of line
+    item in the net worth projection.
+
+    Returns:
+        Dict[str, dict]: The "growth" and "volatility" of each type, keyed by type.
+    """
+    with Session(engine) as session:
+        assumptions = session.exec(select(ProjectionAssumption)).all()
+        return {
+            assumption.type: {"growth": assumption.growth, "volatility": assumption.volatility}
+            for assumption in assumptions
+        }
+
+
+@metrics.timed
+def set_projection_assumption(type: str, growth: float, volatility: float) -> None:
+    """This function sets the growth and volatility assumed for one type of line item,
+    replacing any previous assumption.
+
+    Args:
+        type (str): The type of line item.
+        growth (float): The expected annual growth, or interest for liabilities, e.g. 0.07.
+        volatility (float): The annual standard deviation of the growth, e.g. 0.15.
+
+    Raises:
+        ValueError: If the growth loses the whole balance or the volatility is negative,
+                    which would leave the projection without percentiles.
+    """
+    if growth <= -1 or volatility < 0:
+        raise ValueError(
+            f"Cannot assume a growth of {growth:.2%} with a volatility of {volatility:.2%}"
+        )
+
+    with Session(engine) as session:
+        session.merge(ProjectionAssumption(type=type, growth=growth, volatility=volatility))
         session.commit()
 
 
-def get_dataframe() -> pd.DataFrame:
-    data = get_all_items()
+@metrics.timed
+def get_items_page(
+    offset: int,
+    limit: int,
+    sort: Sequence[Tuple[str, str]] = (),
+    filters: Sequence[Tuple[str, str, Any]] = (),
+    search: str = "",
+    portfolio_id: int = DEFAULT_PORTFOLIO,
+) -> List[dict]:
+    """This function retrieves one page of a portfolio's line items, sorted and filtered
+    in SQL, so only the rows in view are ever read.
+
+    A `search` only keeps line items whose name or type contains a word starting with
+    each of its words, found through the `lineitem_search` full-text index, and ranks
+    the best matches first after any explicit sort.
+
+    Every sort ends with the primary key so that pages are stable and do not
+    repeat or skip rows that share a sort value.
+
+    Args:
+        offset (int): The number of matching rows to skip.
+        limit (int): The maximum number of rows to return.
+        sort (Sequence[Tuple[str, str]]): (column, "asc" | "desc") pairs in priority order.
+        filters (Sequence[Tuple[str, str, Any]]): (column, operator, value) triples that
+            must all match. See `FILTER_OPERATORS` for the supported operators.
+        search (str): Words to search the names and types for, e.g. "chec sav".
+        portfolio_id (int): The portfolio to page through.
+
+    Raises:
+        ValueError: If a column or operator is unknown.
+
+    Returns:
+        List[dict]: The line items on the requested page.
+    """
+    columns = LineItem.__table__.columns
+    statement = select(LineItem).where(LineItem.portfolio_id == portfolio_id)
+
+    for column_name, operator, value in filters:
+        if column_name not in columns or operator not in FILTER_OPERATORS:
+            raise ValueError(f"Unsupported filter: {column_name} {operator}")
+        statement = statement.where(FILTER_OPERATORS[operator](columns[column_name], value))
+
+    order_by = []
+    for column_name, direction in sort:
+        if column_name not in columns or direction not in ("asc", "desc"):
+            raise ValueError(f"Unsupported sort: {column_name} {direction}")
+        column = columns[column_name]
+        order_by.append(column.desc() if direction == "desc" else column.asc())
+
+    match = search_query(search)
+    if match:
+        statement = statement.join(
+            search_table, search_table.c.rowid == LineItem.id
+        ).where(literal_column("lineitem_search").op("MATCH")(match))
+        order_by.append(search_table.c.rank)
+
+    order_by.append(columns["id"].asc())
+
+    statement = statement.order_by(*order_by).offset(offset).limit(limit)
+
+    with Session(engine) as session:
+        line_items = session.exec(statement).all()
+        return [item.dict() for item in line_items]
+
+
+def search_query(search: str) -> str:
+    """This function turns free text from a search box into an FTS5 query that matches
+    every word as a prefix, e.g. "chec sav" -> '"chec"* "sav"*'. Quoting each word
+    keeps FTS5 syntax characters in the text from being interpreted.
+
+    Args:
+        search (str): The text to search for.
+
+    Returns:
+        str: The FTS5 query, or an empty string when the text has no words.
+    """
+    return " ".join(f'"{term}"*' for term in SEARCH_TERM.findall(search))
+
+
+@metrics.timed
+def record_snapshot(
+    taken_on: Optional[date] = None, portfolio_id: Optional[int] = None
+) -> None:
+    """This function records the current total of every status and type of line item
+    in every portfolio as the snapshot for a day, replacing any snapshot already
+    recorded that day.
+
+    The totals are copied from the trigger maintained `TypeTotal` table and converted
+    into the reporting currency by SQLite in a single transaction, so no rows pass
+    through Python. A portfolio without any assets or liabilities, e.g. after they
+    were all deleted, gets a row of 0 with an empty type for them, so its history
+    drops to 0 instead of ending at the last day it had some.
+
+    Args:
+        taken_on (Optional[date]): The day to record the snapshot for. Defaults to today.
+        portfolio_id (Optional[int]): Only replaces the snapshot of this portfolio, e.g.
+            after its line items changed. Defaults to every portfolio that has line
+            items or a history, and `DEFAULT_PORTFOLIO`.
+    """
+    taken_on = taken_on or date.today()
+    replaced = NetWorthSnapshot.taken_on == taken_on
+    totals = (
+        select(
+            literal(taken_on, Date),
+            TypeTotal.portfolio_id,
+            TypeTotal.status,
+            TypeTotal.type,
+            func.sum(CONVERTED_TYPE_TOTAL),
+        )
+        .outerjoin(FxRate, FxRate.currency == TypeTotal.currency)
+        .group_by(TypeTotal.portfolio_id, TypeTotal.status, TypeTotal.type)
+    )
+    if portfolio_id is not None:
+        replaced &= NetWorthSnapshot.portfolio_id == portfolio_id
+        totals = totals.where(TypeTotal.portfolio_id == portfolio_id)
+
+    with engine.begin() as connection:
+        if portfolio_id is None:
+            portfolio_ids = set(
+                connection.execute(
+                    select(TypeTotal.portfolio_id).union(
+                        select(NetWorthSnapshot.portfolio_id)
+                    )
+                ).scalars()
+            ) | {DEFAULT_PORTFOLIO}
+        else:
+            portfolio_ids = {portfolio_id}
+
+        connection.execute(delete(NetWorthSnapshot).where(replaced))
+        connection.execute(
+            insert(NetWorthSnapshot).from_select(
+                ["taken_on", "portfolio_id", "status", "type", "amount"], totals
+            )
+        )
+
+        recorded = set(
+            connection.execute(
+                select(NetWorthSnapshot.portfolio_id, NetWorthSnapshot.status)
+                .where(replaced)
+                .distinct()
+            ).all()
+        )
+        empty = [
+            {
+                "taken_on": taken_on,
+                "portfolio_id": empty_portfolio_id,
+                "status": status,
+                "type": "",
+                "amount": 0,
+            }
+            for empty_portfolio_id in sorted(portfolio_ids)
+            for status in ("Asset", "Liability")
+            if (empty_portfolio_id, status) not in recorded
+        ]
+        if empty:
+            connection.execute(insert(NetWorthSnapshot), empty)
+
+
+@metrics.timed
+def get_history(
+    start: date,
+    end: date,
+    daily_days: int = 90,
+    weekly_days: int = 730,
+    portfolio_id: int = DEFAULT_PORTFOLIO,
+) -> List[dict]:
+    """This function returns the asset, liability and net worth totals of a portfolio
+    recorded between two days, downsampled so long histories stay small.
+
+    Snapshots within `daily_days` of `end` are returned for every day, older ones
+    within `weekly_days` are reduced to one per week and anything older to one per
+    month. Totals are balances rather than flows, so each bucket keeps the last
+    snapshot recorded in it.
+
+    Args:
+        start (date): The first day to include.
+        end (date): The last day to include.
+        daily_days (int): How many days before `end` keep daily resolution.
+        weekly_days (int): How many days before `end` keep weekly resolution.
+        portfolio_id (int): The portfolio to return the history of.
+
+    Returns:
+        List[dict]: One dictionary per point with "taken_on", "assets", "liabilities"
+                    and "net_worth", oldest first. Amounts are in cents.
+    """
+    query = text(
+        """
+        WITH daily AS (
+            SELECT
+                taken_on,
+                SUM(CASE WHEN status = 'Asset' THEN amount ELSE 0 END) AS assets,
+                SUM(CASE WHEN status = 'Liability' THEN amount ELSE 0 END) AS liabilities
+            FROM networthsnapshot
+            WHERE portfolio_id = :portfolio_id AND taken_on BETWEEN :start AND :end
+            GROUP BY taken_on
+        ),
+        bucketed AS (
+            SELECT
+                *,
+                CASE
+                    WHEN taken_on > date(:end, :daily_offset) THEN taken_on
+                    WHEN taken_on > date(:end, :weekly_offset) THEN strftime('%Y-W%W', taken_on)
+                    ELSE strftime('%Y-%m', taken_on)
+                END AS bucket
+            FROM daily
+        )
+        SELECT taken_on, assets, liabilities
+        FROM bucketed
+        WHERE taken_on IN (SELECT MAX(taken_on) FROM bucketed GROUP BY bucket)
+        ORDER BY taken_on
+        """
+    )
+    parameters = {
+        "start": start,
+        "end": end,
+        "daily_offset": f"-{daily_days} days",
+        "weekly_offset": f"-{weekly_days} days",
+        "portfolio_id": portfolio_id,
+    }
+
+    with engine.connect() as connection:
+        rows = connection.execute(query, parameters).fetchall()
+
+    return [
+        {
+            "taken_on": date.fromisoformat(taken_on),
+            "assets": assets,
+            "liabilities": liabilities,
+            "net_worth": assets - liabilities,
+        }
+        for taken_on, assets, liabilities in rows
+    ]
+
+
+@metrics.timed
+def get_dataframe(portfolio_id: int = DEFAULT_PORTFOLIO) -> "pd.DataFrame":
+    # pandas is only imported once a DataFrame is first needed, to keep startup fast
+    import pandas as pd
+
+    data = get_all_items(portfolio_id)
     df = pd.DataFrame(data)
 
-    # Set the data types of the columns
+    # Set the data types of the columns, amounts are stored in cents
     if not df.empty:
         df = df.astype(
             {
@@ -143,8 +1898,34 @@ def get_dataframe() -> pd.DataFrame:
                 "name": "str",
                 "status": "str",
                 "type": "str",
-                "amount": "float",
+                "amount": "int64",
+                "currency": "str",
+                "portfolio_id": "int",
             }
         )
 
+    return to_reporting_currency(df)
+
+
+def to_reporting_currency(df: "pd.DataFrame") -> "pd.DataFrame":
+    """This function converts the cents in the "amount" column of a DataFrame of line
+    items into dollars of the reporting currency, with one join against the exchange
+    rates and one vectorized multiply. Currencies without a rate are left out, like in
+    `rate_for`.
+
+    Args:
+        df (pd.DataFrame): Line items with "amount" in cents and "currency" columns.
+
+    Returns:
+        pd.DataFrame: The line items with converted amounts.
+    """
+    import pandas as pd
+
+    if df.empty:
+        return df
+
+    rates = pd.DataFrame(list(get_fx_rates().items()), columns=["currency", "rate"])
+    df = df.merge(rates, on="currency", how="left")
+    missing_rates = (df["currency"] == REPORTING_CURRENCY).astype(float)
+    df["amount"] = df["amount"] * df.pop("rate").fillna(missing_rates) / 100
     return df
@@ -0,0 +1,127 @@
+import csv
+import gzip
+import importlib.util
+import os
+from datetime import datetime
+from typing import Any, Dict, Iterable, List
+from sqlmodel import select
+from database import db
+from models.line_item import DEFAULT_PORTFOLIO, LineItem
+from models.net_worth_snapshot import NetWorthSnapshot
+
+# The Arrow type every exported column is written as in Parquet files
+ARROW_TYPES = {
+    "id": "int64",
+    "taken_on": "date32",
+    "name": "string",
+    "type": "string",
+    "status": "string",
+    "amount": "int64",
+    "currency": "string",
+}
+
+
+def export_statements(portfolio_id: int) -> Dict[str, Any]:
+    """
+    Returns the queries reading every exported table of a portfolio, keyed by the name
+    of the file they are written to. Amounts are exported in cents, as stored.
+    """
+    return {
+        "line_items": select(
+            LineItem.id,
+            LineItem.name,
+            LineItem.type,
+            LineItem.status,
+            LineItem.amount,
+            LineItem.currency,
+        )
+        .where(LineItem.portfolio_id == portfolio_id)
+        .order_by(LineItem.id),
+        "history": select(
+            NetWorthSnapshot.taken_on,
+            NetWorthSnapshot.status,
+            NetWorthSnapshot.type,
+            NetWorthSnapshot.amount,
+        )
+        .where(NetWorthSnapshot.portfolio_id == portfolio_id)
+        .order_by(NetWorthSnapshot.taken_on, NetWorthSnapshot.id),
+    }
+
+
+def write_parquet(path: str, columns: List[Any], batches: Iterable[List[tuple]]) -> None:
+    """
+    Writes batches of rows into a Parquet file, one row group per batch, so only one
+    batch is ever held in memory.
+
+    Args:
+        path (str): The path of the Parquet file.
+        columns (List[Any]): The selected columns, which give the names and types.
+        batches (Iterable[List[tuple]]): The rows, a batch at a time.
+    """
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    schema = pa.schema(
+        [
+            (column.name, pa.type_for_alias(ARROW_TYPES[column.name]))
+            for column in columns
+        ]
+    )
+    with pq.ParquetWriter(path, schema, compression="zstd") as writer:
+        for rows in batches:
+            arrays = [
+                pa.array(values, type=field.type)
+                for values, field in zip(zip(*rows), schema)
+            ]
+            writer.write_batch(pa.RecordBatch.from_arrays(arrays, schema=schema))
+
+
+def write_csv_gz(path: str, columns: List[Any], batches: Iterable[List[tuple]]) -> None:
+    """
+    Writes batches of rows into a gzip compressed CSV file with a header row, as they
+    are read.
+
+    Args:
+        path (str): The path of the .csv.gz file.
+        columns (List[Any]): The selected columns, which give the header.
+        batches (Iterable[List[tuple]]): The rows, a batch at a time.
+    """
+    with gzip.open(path, "wt", compresslevel=6, encoding="utf-8", newline="") as file:
+        writer = csv.writer(file)
+        writer.writerow([column.name for column in columns])
+        for rows in batches:
+            writer.writerows(rows)
+
+
+def export_portfolio(
+    directory: str, portfolio_id: int = DEFAULT_PORTFOLIO, batch_size: int = db.BATCH_SIZE
+) -> List[str]:
+    """
+    Exports the line items and the net worth history of a portfolio into a directory.
+
+    Each table is streamed from SQLite in batches of `batch_size` rows straight into
+    its file, so exporting a large portfolio never loads it whole. Files are written as
+    Parquet when pyarrow is installed, and as gzip compressed CSV otherwise.
+
+    Args:
+        directory (str): The directory to write the files into, created if missing.
+        portfolio_id (int): The portfolio to export.
+        batch_size (int): How many rows to read and write at a time.
+
+    Returns:
+        List[str]: The paths of the files written.
+    """
+    if importlib.util.find_spec("pyarrow"):
+        write, extension = write_parquet, "parquet"
+    else:
+        write, extension = write_csv_gz, "csv.gz"
+
+    os.makedirs(directory, exist_ok=True)
+    stamp = f"{datetime.now():%Y%m%d-%H%M%S}"
+
+    paths = []
+    for name, statement in export_statements(portfolio_id).items():
+        path = os.path.join(directory, f"{name}-{portfolio_id}-{stamp}.{extension}")
+        write(path, list(statement.selected_columns), db.iter_batches(statement, batch_size))
+        paths.append(path)
+    return paths
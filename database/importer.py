@@ -0,0 +1,180 @@
+import csv
+import re
+from typing import Dict, Iterable, Iterator, List, TextIO, Tuple
+from pydantic import ValidationError
+from database import db
+from models.line_item import DEFAULT_CURRENCY, DEFAULT_PORTFOLIO, LineItem, to_cents
+
+BATCH_SIZE = 5000
+MAX_REPORTED_ERRORS = 20
+CHUNK_SIZE = 64 * 1024
+
+STATUSES = ("Asset", "Liability")
+OFX_TAG = re.compile(r"<(/?[A-Za-z0-9.]+)>([^<]*)")
+# Statement aggregates in an OFX file and the status their balance counts as
+OFX_STATEMENTS = {"STMTRS": "Asset", "CCSTMTRS": "Liability"}
+
+
+def read_csv_rows(stream: TextIO) -> Iterator[dict]:
+    """
+    Streams the rows of a CSV file with `name`, `type`, `status` and `amount` columns,
+    and optionally `currency`. Header names are matched case-insensitively and amounts
+    are in dollars.
+
+    Args:
+        stream (TextIO): The open CSV file.
+
+    Yields:
+        dict: The raw values of one row.
+    """
+    reader = csv.reader(stream)
+    header = [column.strip().lower() for column in next(reader, [])]
+
+    for values in reader:
+        if any(value.strip() for value in values):
+            yield dict(zip(header, (value.strip() for value in values)))
+
+
+def _ofx_tokens(stream: TextIO) -> Iterator[Tuple[str, str]]:
+    """
+    Splits an OFX file into (tag, text) pairs one chunk at a time. Works for both the
+    SGML (1.x) dialect, where leaf elements are not closed, and the XML (2.x) one.
+    """
+    buffer = ""
+    for chunk in iter(lambda: stream.read(CHUNK_SIZE), ""):
+        buffer += chunk
+        # Keep a possibly incomplete trailing tag for the next chunk
+        split_at = max(buffer.rfind("<"), 0)
+        complete, buffer = buffer[:split_at], buffer[split_at:]
+        for match in OFX_TAG.finditer(complete):
+            yield match.group(1).upper(), match.group(2).strip()
+
+    for match in OFX_TAG.finditer(buffer):
+        yield match.group(1).upper(), match.group(2).strip()
+
+
+def read_ofx_rows(stream: TextIO) -> Iterator[dict]:
+    """
+    Streams one row per account statement in an OFX/QFX bank export, using the
+    statement's ledger balance as the amount. Bank statements become assets and
+    credit card statements liabilities.
+
+    Args:
+        stream (TextIO): The open OFX or QFX file.
+
+    Yields:
+        dict: The raw values of one account.
+    """
+    institution = ""
+    statement = {}
+
+    for tag, value in _ofx_tokens(stream):
+        if tag == "ORG" and value:
+            institution = value
+        elif tag in OFX_STATEMENTS:
+            statement = {"status": OFX_STATEMENTS[tag], "type": "Credit Card"}
+        elif tag == "CURDEF" and statement:
+            statement["currency"] = value
+        elif tag == "ACCTTYPE" and statement:
+            statement["type"] = value.title()
+        elif tag == "ACCTID" and statement:
+            statement["account"] = value
+        elif tag == "BALAMT" and statement and "amount" not in statement:
+            # The first balance in a statement is its ledger balance
+            statement["amount"] = value
+        elif tag.startswith("/") and tag[1:] in OFX_STATEMENTS and statement:
+            account = statement.pop("account", "")
+            name = " ".join(part for part in (institution, statement["type"]) if part)
+            statement["name"] = f"{name} ...{account[-4:]}" if account else name
+            if statement["status"] == "Liability" and "amount" in statement:
+                # Card balances are reported as negative amounts owed
+                statement["amount"] = statement["amount"].lstrip("-")
+            yield statement
+            statement = {}
+
+
+def validate_row(row: dict) -> dict:
+    """
+    Validates a raw row against `LineItem` and converts its amount into cents. Rows
+    without a currency are in `DEFAULT_CURRENCY`.
+
+    Args:
+        row (dict): The raw values, with the amount in dollars.
+
+    Raises:
+        ValueError: If the row is not a valid line item.
+
+    Returns:
+        dict: The `name`, `type`, `status`, `amount` and `currency` of the line item.
+    """
+    if row.get("status") not in STATUSES:
+        raise ValueError(f"status must be one of {', '.join(STATUSES)}")
+
+    try:
+        amount = to_cents(str(row.get("amount")).replace("$", "").replace(",", ""))
+    except ArithmeticError:
+        raise ValueError(f"amount {row.get('amount')!r} is not a number")
+
+    currency = (row.get("currency") or DEFAULT_CURRENCY).upper()
+    if len(currency) != 3 or not currency.isalpha():
+        raise ValueError(f"currency {currency!r} is not a three letter code")
+
+    try:
+        item = LineItem.validate({**row, "amount": amount, "currency": currency})
+    except ValidationError as e:
+        raise ValueError(str(e)) from e
+
+    if not item.name or not item.type:
+        raise ValueError("name and type are required")
+
+    return {
+        "name": item.name,
+        "type": item.type,
+        "status": item.status,
+        "amount": item.amount,
+        "currency": item.currency,
+    }
+
+
+def import_line_items(
+    stream: TextIO, file_name: str, portfolio_id: int = DEFAULT_PORTFOLIO
+) -> Dict[str, object]:
+    """
+    Imports a CSV or OFX/QFX file into the line items of a portfolio.
+
+    Rows are streamed through validation and upserted by name and type in batches of
+    `BATCH_SIZE` within a single transaction, so memory use does not grow with the
+    size of the file. Invalid rows are skipped and the first `MAX_REPORTED_ERRORS`
+    reasons are reported back.
+
+    Args:
+        stream (TextIO): The open file.
+        file_name (str): The file's name, whose extension selects the format.
+        portfolio_id (int): The portfolio to import the line items into.
+
+    Returns:
+        Dict[str, object]: The "inserted", "updated" and "rejected" row counts, plus the
+                           reported "errors".
+    """
+    if file_name.lower().endswith((".ofx", ".qfx")):
+        rows = read_ofx_rows(stream)
+    else:
+        rows = read_csv_rows(stream)
+
+    rejected = 0
+    errors: List[str] = []
+
+    def valid_rows(rows: Iterable[dict]) -> Iterator[dict]:
+        nonlocal rejected
+        for number, row in enumerate(rows, start=1):
+            try:
+                yield validate_row(row)
+            except ValueError as e:
+                rejected += 1
+                if len(errors) < MAX_REPORTED_ERRORS:
+                    errors.append(f"Row {number}: {e}")
+
+    counts = db.bulk_upsert_line_items(
+        valid_rows(rows), batch_size=BATCH_SIZE, portfolio_id=portfolio_id
+    )
+    return {**counts, "rejected": rejected, "errors": errors}
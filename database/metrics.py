@@ -0,0 +1,246 @@
+import asyncio
+import contextvars
+import functools
+import json
+import os
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from threading import Lock
+from typing import Any, Callable, Dict, Iterator, List, Optional, TypeVar
+
+# Instrumentation is switched on with NETWORTH_METRICS=1 before the app starts. When it
+# is off, `timed` and `action` return the functions they decorate unchanged and no
+# query or payload hooks are installed, so it costs nothing.
+ENABLED = os.environ.get("NETWORTH_METRICS") == "1"
+
+# Upper bounds of the latency histogram buckets in seconds, doubling from 0.1 ms to
+# about 13 s, with a final bucket for anything slower
+BUCKETS = tuple(0.0001 * 2**index for index in range(18))
+
+F = TypeVar("F", bound=Callable[..., Any])
+
+_lock = Lock()
+# The statistics of the user action the current code runs on behalf of, if any
+_current_action: contextvars.ContextVar[Optional[dict]] = contextvars.ContextVar(
+    "current_action", default=None
+)
+
+
+class Histogram:
+    """
+    Counts observed latencies in the fixed `BUCKETS`, so recording one is O(log buckets)
+    and memory use does not grow with the number of observations.
+    """
+
+    def __init__(self) -> None:
+        self.counts = [0] * (len(BUCKETS) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def observe(self, seconds: float) -> None:
+        self.counts[bisect_left(BUCKETS, seconds)] += 1
+        self.count += 1
+        self.total += seconds
+        self.max = max(self.max, seconds)
+
+    def quantile(self, q: float) -> float:
+        """
+        Estimates a quantile as the upper bound of the bucket it falls in, in seconds.
+        """
+        rank = q * self.count
+        seen = 0
+        for bound, count in zip(BUCKETS, self.counts):
+            seen += count
+            if seen >= rank:
+                return min(bound, self.max)
+        return self.max
+
+    def to_dict(self) -> dict:
+        return {
+            "count": self.count,
+            "mean_ms": self.total / self.count * 1000 if self.count else 0.0,
+            "p50_ms": self.quantile(0.5) * 1000,
+            "p95_ms": self.quantile(0.95) * 1000,
+            "p99_ms": self.quantile(0.99) * 1000,
+            "max_ms": self.max * 1000,
+        }
+
+
+latencies: Dict[str, Histogram] = {}
+# Per user action: how often it ran and how many SQL statements it ran in total
+actions: Dict[str, Dict[str, int]] = {}
+# Per message type sent to the browser: how many were sent and their total JSON size
+payloads: Dict[str, Dict[str, int]] = {}
+
+
+def observe(name: str, seconds: float) -> None:
+    """
+    Records one latency of `name`.
+
+    Args:
+        name (str): What was timed, e.g. "db.get_totals".
+        seconds (float): How long it took.
+    """
+    with _lock:
+        histogram = latencies.get(name)
+        if histogram is None:
+            histogram = latencies[name] = Histogram()
+        histogram.observe(seconds)
+
+
+@contextmanager
+def measure(name: str) -> Iterator[None]:
+    """
+    Times the block it wraps as `name`, e.g. `with metrics.measure("import"): ...`.
+    Does nothing while instrumentation is disabled.
+    """
+    if not ENABLED:
+        yield
+        return
+
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        observe(name, time.perf_counter() - started)
+
+
+def timed(function: F) -> F:
+    """
+    Records the latency of every call of a function, sync or async, under its module
+    and name, e.g. "db.get_totals". Returns the function itself while instrumentation
+    is disabled.
+    """
+    if not ENABLED:
+        return function
+
+    module = function.__module__.rsplit(".", 1)[-1]
+    # main.py runs as a script, but reads better under its file's name
+    module = "main" if module in ("__main__", "__mp_main__") else module
+    name = f"{module}.{function.__name__}"
+
+    if asyncio.iscoroutinefunction(function):
+
+        @functools.wraps(function)
+        async def timed_coroutine(*args: Any, **kwargs: Any) -> Any:
+            with measure(name):
+                return await function(*args, **kwargs)
+
+        return timed_coroutine  # type: ignore[return-value]
+
+    @functools.wraps(function)
+    def timed_function(*args: Any, **kwargs: Any) -> Any:
+        with measure(name):
+            return function(*args, **kwargs)
+
+    return timed_function  # type: ignore[return-value]
+
+
+def action(function: F) -> F:
+    """
+    Marks an async UI handler as a user action: its latency is recorded like `timed`,
+    and every SQL statement run on its behalf, including on the database thread pool,
+    is counted towards it. Returns the function itself while instrumentation is
+    disabled.
+    """
+    if not ENABLED:
+        return function
+
+    name = f"action.{function.__name__}"
+
+    @functools.wraps(function)
+    async def counted(*args: Any, **kwargs: Any) -> Any:
+        stats = {"queries": 0}
+        token = _current_action.set(stats)
+        try:
+            with measure(name):
+                return await function(*args, **kwargs)
+        finally:
+            _current_action.reset(token)
+            with _lock:
+                totals = actions.setdefault(name, {"count": 0, "queries": 0})
+                totals["count"] += 1
+                totals["queries"] += stats["queries"]
+
+    return counted  # type: ignore[return-value]
+
+
+def count_query(*args: Any) -> None:
+    """
+    SQLAlchemy `before_cursor_execute` listener that counts a statement towards the
+    current user action.
+    """
+    stats = _current_action.get()
+    if stats is not None:
+        with _lock:
+            stats["queries"] += 1
+
+
+def record_payload(message_type: str, data: Any) -> None:
+    """
+    Records the JSON size of a message sent to the browser.
+
+    Args:
+        message_type (str): The socket.io event, e.g. "update" or "run_method".
+        data (Any): The message's data.
+    """
+    if not ENABLED:
+        return
+
+    size = len(json.dumps(data, default=str))
+    with _lock:
+        totals = payloads.setdefault(message_type, {"count": 0, "bytes": 0, "max_bytes": 0})
+        totals["count"] += 1
+        totals["bytes"] += size
+        totals["max_bytes"] = max(totals["max_bytes"], size)
+
+
+def snapshot() -> dict:
+    """
+    Returns everything recorded so far.
+
+    Returns:
+        dict: "enabled", plus "latencies" per timed name, "actions" with their query
+              counts, and "payloads" per message type.
+    """
+    with _lock:
+        return {
+            "enabled": ENABLED,
+            "latencies": {name: histogram.to_dict() for name, histogram in latencies.items()},
+            "actions": {
+                name: {
+                    **totals,
+                    "queries_per_action": totals["queries"] / totals["count"],
+                }
+                for name, totals in actions.items()
+            },
+            "payloads": {name: dict(totals) for name, totals in payloads.items()},
+        }
+
+
+def rows() -> List[dict]:
+    """
+    Flattens the latencies into one row per timed name, slowest in total first, for
+    showing in a table.
+    """
+    with _lock:
+        histograms = sorted(latencies.items(), key=lambda item: item[1].total, reverse=True)
+        return [
+            {
+                "name": name,
+                **{key: round(value, 2) for key, value in histogram.to_dict().items()},
+            }
+            for name, histogram in histograms
+        ]
+
+
+def reset() -> None:
+    """
+    Forgets everything recorded so far.
+    """
+    with _lock:
+        latencies.clear()
+        actions.clear()
+        payloads.clear()
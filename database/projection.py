@@ -0,0 +1,123 @@
+from functools import lru_cache
+from typing import TYPE_CHECKING, Dict, Iterable, Tuple
+
+if TYPE_CHECKING:
+    import numpy as np
+
+# Percentiles of the simulated net worth reported for every month
+PERCENTILES = (5, 25, 50, 75, 95)
+DEFAULT_MONTHS = 30 * 12
+DEFAULT_PATHS = 10_000
+# Projections are cached per set of balances and assumptions
+CACHE_SIZE = 32
+
+# (growth, volatility, balance in dollars) of one group of types
+AssetClass = Tuple[float, float, float]
+
+
+def asset_classes(
+    type_totals: Iterable[dict], assumptions: Dict[str, dict]
+) -> Tuple[AssetClass, ...]:
+    """
+    Groups the per type totals by their growth and volatility assumptions. Types that
+    share assumptions are simulated as one asset class, so the cost of a projection
+    grows with the number of distinct assumptions rather than the number of types.
+    Types without assumptions neither grow nor vary.
+
+    Args:
+        type_totals (Iterable[dict]): The "status", "type" and "amount" (in cents) of
+                                      every type, as returned by `db.get_type_totals`.
+        assumptions (Dict[str, dict]): The "growth" and "volatility" of each type.
+
+    Returns:
+        Tuple[AssetClass, ...]: The (growth, volatility, balance in dollars) of every
+                                asset class, with liabilities counted negatively,
+                                sorted so equal inputs always give an equal key.
+    """
+    balances: Dict[Tuple[float, float], int] = {}
+    for type_total in type_totals:
+        assumption = assumptions.get(type_total["type"], {})
+        key = (assumption.get("growth", 0.0), assumption.get("volatility", 0.0))
+        sign = -1 if type_total["status"] == "Liability" else 1
+        balances[key] = balances.get(key, 0) + sign * type_total["amount"]
+
+    return tuple(
+        sorted(
+            (growth, volatility, cents / 100)
+            for (growth, volatility), cents in balances.items()
+        )
+    )
+
+
+def project_net_worth(
+    type_totals: Iterable[dict],
+    assumptions: Dict[str, dict],
+    months: int = DEFAULT_MONTHS,
+    paths: int = DEFAULT_PATHS,
+    seed: int = 0,
+) -> dict:
+    """
+    Projects the net worth forward with a Monte Carlo simulation and returns its
+    percentile bands, ready to be plotted.
+
+    Each asset class follows a geometric Brownian motion with monthly steps: its annual
+    growth sets the expected change and its annual volatility the spread around it.
+    Every path of every class is simulated at once with NumPy array operations. The
+    simulation is seeded, so the same inputs always give the same bands, and results
+    are cached per set of balances and assumptions.
+
+    Args:
+        type_totals (Iterable[dict]): The per type totals, see `asset_classes`.
+        assumptions (Dict[str, dict]): The "growth" and "volatility" of each type.
+        months (int): How many months to project.
+        paths (int): How many paths to simulate.
+        seed (int): The seed of the random numbers.
+
+    Returns:
+        dict: "years", the time of each point from now, and "percentiles", mapping each
+              of `PERCENTILES` to the net worth in dollars at those times. Both start
+              with today's net worth.
+    """
+    return _simulate(asset_classes(type_totals, assumptions), months, paths, seed)
+
+
+@lru_cache(maxsize=CACHE_SIZE)
+def _simulate(classes: Tuple[AssetClass, ...], months: int, paths: int, seed: int) -> dict:
+    # NumPy is only imported once a projection is first needed, to keep startup fast
+    import numpy as np
+
+    rng = np.random.default_rng(seed)
+    steps = np.arange(1, months + 1, dtype=np.float64)
+    # Laid out as (months, paths) so cumulative sums and percentiles run over
+    # contiguous memory
+    net_worth = np.zeros((months, paths), dtype=np.float64)
+    # Classes that do not vary follow the same path everywhere and are added at the end
+    certain = np.zeros(months, dtype=np.float64)
+
+    for growth, volatility, balance in classes:
+        monthly_volatility = volatility / np.sqrt(12)
+        drift = np.log1p(growth) / 12 - monthly_volatility**2 / 2
+
+        if not volatility:
+            certain += balance * np.exp(drift * steps)
+            continue
+
+        log_returns = rng.standard_normal((months, paths), dtype=np.float32)
+        log_returns *= monthly_volatility
+        log_returns += drift
+        np.cumsum(log_returns, axis=0, out=log_returns)
+        np.exp(log_returns, out=log_returns)
+        log_returns *= balance
+        net_worth += log_returns
+
+    net_worth += certain[:, np.newaxis]
+    bands = np.percentile(net_worth, PERCENTILES, axis=1, overwrite_input=True)
+
+    today = sum(balance for _, _, balance in classes)
+    return {
+        "years": tuple((np.arange(months + 1) / 12).round(3).tolist()),
+        "percentiles": {
+            percentile: (today, *band.round(2).tolist())
+            for percentile, band in zip(PERCENTILES, bands)
+        },
+    }
@@ -0,0 +1,433 @@
+from collections import defaultdict
+from datetime import date
+from threading import Lock, RLock
+from typing import TYPE_CHECKING, Any, Callable, Dict, List, Optional, Sequence, Tuple
+from database import db
+from models.line_item import DEFAULT_CURRENCY, DEFAULT_PORTFOLIO
+
+if TYPE_CHECKING:
+    import pandas as pd
+    from database.columns import LineItemColumns
+
+
+class LineItemRepository:
+    """
+    In-memory view of the line items of one portfolio with write-through persistence.
+
+    The repository loads every line item of its portfolio once, keyed by id, and then
+    serves all reads from memory. Mutations are written through to SQLite via the `db`
+    module first and only applied to the cache once the commit succeeded, so the
+    cache never holds data the database does not. Running asset and liability
+    totals are adjusted per currency on every mutation, and converted into the
+    reporting currency only when the items or the exchange rates changed, making
+    `get_totals` O(number of currencies) at worst.
+
+    The reports read `columns` instead, a compact array copy of the line items that is
+    read from the database without going through the cache.
+    """
+
+    def __init__(self, portfolio_id: int = DEFAULT_PORTFOLIO) -> None:
+        self.portfolio_id = portfolio_id
+        self._lock = RLock()
+        self._items: Dict[int, dict] = {}
+        # Running totals in cents, keyed by (status, currency)
+        self._totals: Dict[Tuple[str, str], int] = defaultdict(int)
+        # The converted totals and the (version, rates version) they were converted at
+        self._converted_totals: Optional[Tuple[Tuple[int, int], Dict[str, int]]] = None
+        self._snapshot: Optional[Tuple[dict, ...]] = None
+        # The compact columns and the version they were read at
+        self._columns: Optional[Tuple[int, "LineItemColumns"]] = None
+        self._loaded = False
+        self._version = 0
+
+    @property
+    def version(self) -> int:
+        """
+        A counter that changes whenever the line items may have changed, so readers can
+        cheaply tell whether anything derived from them needs rebuilding.
+        """
+        return self._version
+
+    # ------------- Cache Maintenance -------------
+    def load(self) -> None:
+        """
+        (Re)loads every line item from the database and recomputes the totals.
+        """
+        items = db.get_all_items(self.portfolio_id)
+
+        with self._lock:
+            self._items = {}
+            self._totals = defaultdict(int)
+            for item in items:
+                self._put(item)
+            self._loaded = True
+
+    def invalidate(self) -> None:
+        """
+        Drops the cache so the next read reloads it from the database. Used after
+        writes that bypass the repository, such as bulk imports.
+        """
+        with self._lock:
+            self._loaded = False
+            self._snapshot = None
+            self._version += 1
+
+    def _ensure_loaded(self) -> None:
+        if not self._loaded:
+            self.load()
+
+    def _put(self, item: dict) -> None:
+        self._items[item["id"]] = item
+        self._totals[item["status"], item["currency"]] += item["amount"]
+        self._snapshot = None
+        self._version += 1
+
+    def _replace(self, item: dict) -> None:
+        previous = self._items[item["id"]]
+        self._totals[previous["status"], previous["currency"]] -= previous["amount"]
+        self._items[item["id"]] = item
+        self._totals[item["status"], item["currency"]] += item["amount"]
+        self._snapshot = None
+        self._version += 1
+
+    def _pop(self, line_item_id: int) -> dict:
+        item = self._items.pop(line_item_id)
+        self._totals[item["status"], item["currency"]] -= item["amount"]
+        self._snapshot = None
+        self._version += 1
+        return item
+
+    # ------------- Reads -------------
+    def snapshot(self) -> Tuple[dict, ...]:
+        """
+        Returns an immutable snapshot of all line items. The same tuple is handed
+        out until the next mutation, so readers within one refresh see consistent
+        data without touching SQLite.
+
+        Returns:
+            Tuple[dict, ...]: All line items as dictionaries.
+        """
+        with self._lock:
+            self._ensure_loaded()
+            if self._snapshot is None:
+                self._snapshot = tuple(dict(item) for item in self._items.values())
+            return self._snapshot
+
+    def columns(self) -> "LineItemColumns":
+        """
+        Returns the line items as compact arrays, read straight from the database cursor
+        by `db.get_line_item_columns`. The same columns are handed out until the next
+        mutation. They are read without holding the lock, so writes never wait on them,
+        and are only kept if no write happened meanwhile.
+
+        Returns:
+            LineItemColumns: The amounts, names, types, statuses and currencies of all
+                             line items.
+        """
+        version = self._version
+        cached = self._columns
+        if cached is not None and cached[0] == version:
+            return cached[1]
+
+        columns = db.get_line_item_columns(self.portfolio_id)
+        with self._lock:
+            if self._version == version:
+                self._columns = (version, columns)
+        return columns
+
+    def get_all_items(self) -> List[dict]:
+        """
+        Returns all line items as a list of dictionaries.
+
+        Returns:
+            List[dict]: A list of dictionaries, where each dictionary represents a line item.
+        """
+        return [dict(item) for item in self.snapshot()]
+
+    def get_line_item(self, line_item_id: int) -> dict:
+        """
+        Returns a single line item by id.
+
+        Args:
+            line_item_id (int): The ID of the line item to retrieve.
+
+        Returns:
+            dict: A dictionary representation of the line item.
+        """
+        with self._lock:
+            self._ensure_loaded()
+            return dict(self._items[line_item_id])
+
+    def get_totals(self) -> Dict[str, int]:
+        """
+        Returns the running totals maintained on every mutation, converted into the
+        reporting currency. The conversion is memoized until the line items or the
+        exchange rates change. Until the cache is loaded, the totals come from a single
+        aggregate query instead, so showing them does not require loading every line
+        item.
+
+        Returns:
+            Dict[str, int]: The "assets", "liabilities" and "net_worth" totals, in cents
+                            of the reporting currency.
+        """
+        if not self._loaded:
+            return db.get_totals(self.portfolio_id)
+
+        with self._lock:
+            key = (self._version, db.fx_rates_version)
+            if self._converted_totals is None or self._converted_totals[0] != key:
+                rates = db.get_fx_rates()
+                converted: Dict[str, int] = defaultdict(int)
+                for (status, currency), amount in self._totals.items():
+                    converted[status] += db.convert_cents(amount, db.rate_for(rates, currency))
+
+                assets = converted["Asset"]
+                liabilities = converted["Liability"]
+                self._converted_totals = (
+                    key,
+                    {
+                        "assets": assets,
+                        "liabilities": liabilities,
+                        "net_worth": assets - liabilities,
+                    },
+                )
+
+            return dict(self._converted_totals[1])
+
+    def get_dataframe(self) -> "pd.DataFrame":
+        """
+        Builds the reporting DataFrame from the cached snapshot, with amounts in dollars
+        of the reporting currency.
+
+        Returns:
+            pd.DataFrame: One row per line item.
+        """
+        # pandas is only imported once a DataFrame is first needed, to keep startup fast
+        import pandas as pd
+
+        df = pd.DataFrame(list(self.snapshot()))
+
+        if not df.empty:
+            df = df.astype({"amount": "int64"})
+
+        return db.to_reporting_currency(df)
+
+    # ------------- Writes -------------
+    def create_line_item(
+        self,
+        name: str,
+        type: str,
+        status: str,
+        amount: int,
+        currency: str = DEFAULT_CURRENCY,
+    ) -> dict:
+        """
+        Creates a line item in the database and adds it to the cache.
+
+        Args:
+            name (str): The name of the line item to be created.
+            type (str): The type of the line item to be created.
+            status (str): Whether the line item is an "Asset" or a "Liability".
+            amount (int): The amount of the line item to be created, in cents.
+            currency (str): The currency of the amount, e.g. "EUR".
+
+        Returns:
+            dict: A dictionary representation of the newly created line item.
+        """
+        with self._lock:
+            self._ensure_loaded()
+            item = db.create_line_item(
+                name=name,
+                type=type,
+                status=status,
+                amount=amount,
+                currency=currency,
+                portfolio_id=self.portfolio_id,
+            )
+            self._put(item)
+            return dict(item)
+
+    def update_line_item(
+        self,
+        id: int,
+        name: str,
+        status: str,
+        type: str,
+        amount: int,
+        currency: str = DEFAULT_CURRENCY,
+    ) -> dict:
+        """
+        Updates a line item in the database and swaps the cached copy.
+
+        Args:
+            id (int): integer representation of the record id
+            name (str): The name of the line item to update.
+            status (str): Whether the line item is an "Asset" or a "Liability".
+            type (str): The type of the line item to update.
+            amount (int): The amount of the line item to update, in cents.
+            currency (str): The currency of the amount, e.g. "EUR".
+
+        Returns:
+            dict: A dictionary representation of the updated line item.
+        """
+        with self._lock:
+            self._ensure_loaded()
+            item = db.update_line_item(
+                id=id,
+                name=name,
+                status=status,
+                type=type,
+                amount=amount,
+                currency=currency,
+                portfolio_id=self.portfolio_id,
+            )
+            self._replace(item)
+            return dict(item)
+
+    def delete_line_item(self, line_item_id: int) -> dict:
+        """
+        Deletes a line item from the database and the cache.
+
+        Args:
+            line_item_id (int): The ID of the line item to delete.
+
+        Returns:
+            dict: The line item that was removed.
+        """
+        with self._lock:
+            self._ensure_loaded()
+            db.delete_line_item(line_item_id, self.portfolio_id)
+            return self._pop(line_item_id)
+
+    def update_line_items(
+        self, line_item_ids: Sequence[int], values: Dict[str, Any]
+    ) -> List[dict]:
+        """
+        Sets the same values on many line items with one bulk UPDATE and swaps the
+        cached copies.
+
+        Args:
+            line_item_ids (Sequence[int]): The IDs of the line items to update.
+            values (Dict[str, Any]): The new "name", "type", "status", "amount" (in cents)
+                and/or "currency".
+
+        Returns:
+            List[dict]: The updated line items.
+        """
+        with self._lock:
+            self._ensure_loaded()
+            db.update_line_items(line_item_ids, values, self.portfolio_id)
+
+            updated = []
+            for line_item_id in line_item_ids:
+                if line_item_id in self._items:
+                    item = {**self._items[line_item_id], **values}
+                    self._replace(item)
+                    updated.append(dict(item))
+            return updated
+
+    def delete_line_items(self, line_item_ids: Sequence[int]) -> List[dict]:
+        """
+        Deletes many line items with one bulk DELETE and drops them from the cache.
+
+        Args:
+            line_item_ids (Sequence[int]): The IDs of the line items to delete.
+
+        Returns:
+            List[dict]: The line items that were removed.
+        """
+        with self._lock:
+            self._ensure_loaded()
+            db.delete_line_items(line_item_ids, self.portfolio_id)
+            return [
+                self._pop(line_item_id)
+                for line_item_id in line_item_ids
+                if line_item_id in self._items
+            ]
+
+    def add_transaction(
+        self, line_item_id: int, posted_on: date, kind: str, amount: int, memo: str = ""
+    ) -> dict:
+        """
+        Posts an entry to the ledger of a line item through `db.add_transaction` and
+        swaps the cached copy for the line item with its new balance.
+
+        Args:
+            line_item_id (int): The ID of the line item to post to.
+            posted_on (date): The day of the entry.
+            kind (str): "deposit", "payment" or "valuation".
+            amount (int): The amount deposited, paid or valued, in cents.
+            memo (str): A description of the entry.
+
+        Returns:
+            dict: The line item with its new balance as its amount.
+        """
+        with self._lock:
+            self._ensure_loaded()
+            item = db.add_transaction(
+                line_item_id, posted_on, kind, amount, memo, self.portfolio_id
+            )
+            self._replace(item)
+            return dict(item)
+
+    def undo(self) -> Optional[Dict[int, Optional[dict]]]:
+        """
+        Undoes the latest change to the line items through `db.undo` and applies the
+        result to the cache, so only the line items it touched are swapped.
+
+        Returns:
+            Optional[Dict[int, Optional[dict]]]: The changed line items keyed by id, with
+                None for deleted ones, or None if there was nothing to undo.
+        """
+        return self._revert(db.undo)
+
+    def redo(self) -> Optional[Dict[int, Optional[dict]]]:
+        """
+        Redoes the latest undo through `db.redo` and applies the result to the cache.
+
+        Returns:
+            Optional[Dict[int, Optional[dict]]]: The changed line items keyed by id, with
+                None for deleted ones, or None if there was nothing to redo.
+        """
+        return self._revert(db.redo)
+
+    def _revert(
+        self, revert: Callable[[int], Optional[Dict[int, Optional[dict]]]]
+    ) -> Optional[Dict[int, Optional[dict]]]:
+        with self._lock:
+            self._ensure_loaded()
+            reverted = revert(self.portfolio_id)
+
+            for line_item_id, item in (reverted or {}).items():
+                if item is None:
+                    if line_item_id in self._items:
+                        self._pop(line_item_id)
+                elif line_item_id in self._items:
+                    self._replace(dict(item))
+                else:
+                    self._put(dict(item))
+            return reverted
+
+
+_repositories: Dict[int, LineItemRepository] = {}
+_repositories_lock = Lock()
+
+
+def portfolio(portfolio_id: int) -> LineItemRepository:
+    """
+    Returns the repository of a portfolio, which is created on first use and then
+    shared by everything serving that portfolio.
+
+    Args:
+        portfolio_id (int): The portfolio to return the repository of.
+
+    Returns:
+        LineItemRepository: The portfolio's repository.
+    """
+    with _repositories_lock:
+        if portfolio_id not in _repositories:
+            _repositories[portfolio_id] = LineItemRepository(portfolio_id)
+        return _repositories[portfolio_id]
+
+
+line_items = portfolio(DEFAULT_PORTFOLIO)
@@ -1,23 +1,57 @@
+import time
+
+# Taken before anything else is imported, for the startup timing report
+STARTUP_STARTED = time.perf_counter()
+
+import asyncio
+import io
+import json
 import os
-import pandas as pd
-import plotly.graph_objects as go
-from nicegui import app, ui
-from database import db
+from collections import defaultdict
+from datetime import date, datetime, timedelta
+from typing import Awaitable, Callable, Dict, List, Optional, Sequence, Set
+from fastapi import HTTPException
+from nicegui import app, background_tasks, events, ui
+from nicegui import globals as nicegui_globals
+import api
+from database import aio, db, exporter, importer, metrics, projection, repository
+from database.columns import LineItemColumns
+from models.line_item import DEFAULT_PORTFOLIO, format_cents, to_cents
+from models.transaction import TRANSACTION_KINDS
 
-# ============== Configuration =======================
-ui.dark_mode().enable()
+startup_marks = {"imports": time.perf_counter()}
 
+# ============== Configuration =======================
 app.native.window_args["resizable"] = True
 app.native.start_args["debug"] = False
 
 # Initialize the SQLite Database
-if not os.path.exists("networth.db"):
+if not os.path.exists(db.sqlite_file_name):
     print("Database does not exist... Creating Database")
     db.initialize_database()
+else:
+    db.migrate_database()
+
+# Exchange rates come from a local file, so conversion works offline
+db.load_fx_rates(db.fx_rates_file)
+currencies = sorted(db.get_fx_rates())
+
+startup_marks["database"] = time.perf_counter()
+
+# Keep today's history snapshot current, even when nothing is edited
+ui.timer(60 * 60, aio.db.record_snapshot)
+# Checkpoint the change journal, so rebuilding past states replays few changes
+ui.timer(60 * 60, aio.db.record_checkpoint)
 
 # =============== Global Variables ====================
-select_data = []
-my_data = db.get_all_items()
+# Line items beyond this many slices are grouped into "Other" in the composition chart
+COMPOSITION_MAX_SLICES = 12
+# How many of the largest line items a drill-down into one type shows
+ROLLUP_MAX_ITEMS = 50
+# How many days of ledger entries the ledger dialog lists
+LEDGER_DAYS = 365
+# How many of the rows an import skipped are described in its notification
+IMPORT_SHOWN_ERRORS = 3
 colors = [
     "#00CBFF",
     "#354A53",
@@ -31,274 +65,1362 @@ colors = [
 ]
 
 
-# =============== API Handlers ======================
-def add_new_data() -> None:
+# =============== Helpers ======================
+def table_row(item: dict) -> dict:
     """
-    Adds a new line item to the database and updates the table with the new data.
+    Converts a line item into a row for the table, with the amount in cents formatted
+    as a dollar string.
+    """
+    return {**item, "amount": format_cents(item["amount"])}
+
 
-    This function creates a new line item in the database using the values entered
-    by the user in the `add_name`, `add_type`, and `add_amount` fields. It then
-    retrieves all items from the database, sorts them by name, and updates the table
-    with the new data. Finally, it displays a notification to the user that the new
-    item has been added and closes the `new_data_dialog`.
+def format_money(cents: int) -> str:
     """
+    Formats cents of the reporting currency for display, e.g. "$1,234.50" in dollars or
+    "1,234.50 EUR" in any other currency.
+    """
+    if db.REPORTING_CURRENCY == "USD":
+        return f"${cents / 100:,.2f}"
+    return f"{cents / 100:,.2f} {db.REPORTING_CURRENCY}"
 
-    db.create_line_item(
-        name=add_name.value,
-        type=add_type.value,
-        status=add_status.value,
-        amount=f"{float(add_amount.value):.2f}",
-    )
 
-    my_table.options["rowData"] = sorted(
-        db.get_all_items(), key=lambda data: data["name"]
-    )
+def table_rows(items: list) -> list:
+    """
+    Converts line items into rows for the table.
+    """
+    return [table_row(item) for item in items]
 
-    ui.notify(f"{add_name.value} Added!", color="green")
 
-    # Close Dialog and Reset Values (inputs will reset themselves)
-    new_data_dialog.close()
-    add_name.set_value(None)
-    add_type.set_value(None)
-    add_status.set_value(None)
-    add_amount.set_value(None)
+def parse_sort_model(sort_model: list) -> list:
+    """
+    Converts an AG Grid sort model into (column, direction) pairs for `db.get_items_page`.
+    """
+    return [(sort["colId"], sort["sort"]) for sort in sort_model]
 
-    # Update Table
-    my_table.update()
 
-    net_breakdown_cards.refresh()
-    net_composition_plot.refresh()
+def parse_filter_model(filter_model: dict) -> list:
+    """
+    Converts an AG Grid filter model into (column, operator, value) triples for
+    `db.get_items_page`. Amount filters are entered in dollars and compared in cents.
+    """
+    filters = []
+    for column, condition in filter_model.items():
+        value = condition.get("filter")
+        if column == "amount":
+            value = to_cents(value)
+        filters.append((column, condition["type"], value))
+    return filters
 
 
-def update_data() -> None:
+@app.get("/grid/line_items")
+@metrics.timed
+def grid_line_items(
+    start: int,
+    end: int,
+    sort: str = "[]",
+    filter: str = "{}",
+    search: str = "",
+    portfolio_id: int = DEFAULT_PORTFOLIO,
+) -> dict:
     """
-    Updates an existing line item in the database and refreshes the table with the updated data.
+    Serves one block of rows of a portfolio to the grid's infinite row model.
 
-    This function updates an existing line item in the database using the values entered by the
-    user in the `edit_name`, `edit_type`, and `edit_amount` fields. It then retrieves all items
-    from the database, sorts them by name, and updates the table with the new data. Finally, it
-    displays a notification to the user that the selected item has been updated and closes the
-    `edit_data_dialog`.
+    The grid asks for the rows between `start` and `end` together with its current
+    sort and filter models and the text in the search box. `last_row` stays -1 while
+    there may be more rows, and becomes the total row count once a short block shows
+    the end was reached.
     """
-    db.update_line_item(
-        id=select_data["id"],
-        name=edit_name.value,
-        type=edit_type.value,
-        status=edit_status.value,
-        amount=f"{float(edit_amount.value):.2f}",
-    )
+    limit = end - start
+    try:
+        items = db.get_items_page(
+            offset=start,
+            limit=limit,
+            sort=parse_sort_model(json.loads(sort)),
+            filters=parse_filter_model(json.loads(filter)),
+            search=search,
+            portfolio_id=portfolio_id,
+        )
+    except (ValueError, KeyError, ArithmeticError) as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    last_row = start + len(items) if len(items) < limit else -1
+    return {"rows": table_rows(items), "last_row": last_row}
 
-    my_table.options["rowData"] = sorted(
-        db.get_all_items(), key=lambda data: data["name"]
+
+@app.get("/debug/metrics")
+def debug_metrics() -> dict:
+    """
+    Serves the latencies, per action query counts and payload sizes recorded by the
+    `metrics` instrumentation, which is enabled with NETWORTH_METRICS=1.
+    """
+    return metrics.snapshot()
+
+
+def measure_payloads() -> None:
+    """
+    Wraps the socket.io server's `emit`, so the size of every message NiceGUI sends to
+    the browser is recorded.
+    """
+    emit = nicegui_globals.sio.emit
+
+    async def measured_emit(event: str, data=None, *args, **kwargs):
+        metrics.record_payload(event, data)
+        return await emit(event, data, *args, **kwargs)
+
+    nicegui_globals.sio.emit = measured_emit
+
+
+def data_directory(name: str) -> str:
+    """
+    Returns the path of a folder next to the database file, e.g. for backups.
+    """
+    return os.path.join(os.path.dirname(os.path.abspath(db.sqlite_file_name)), name)
+
+
+def load_history(portfolio_id: int) -> list:
+    """
+    Loads the last ten years of a portfolio's net worth history for `net_history_plot`.
+    """
+    today = date.today()
+    return db.get_history(
+        start=today - timedelta(days=365 * 10), end=today, portfolio_id=portfolio_id
     )
 
-    ui.notify(f"Updated {select_data['name']}")
 
-    edit_data_dialog.close()
-    my_table.update()
+def composition_slices(columns: LineItemColumns, max_slices: int, rates: dict) -> tuple:
+    """
+    Sums the line items by name and keeps the `max_slices - 1` largest, grouping the rest
+    into an "Other" slice, so the chart stays the same size however many items exist.
+    Amounts are converted into the reporting currency with `rates`.
 
-    net_breakdown_cards.refresh()
-    net_composition_plot.refresh()
+    Returns:
+        tuple: The slice labels and their values in the reporting currency, largest first.
+    """
+    import numpy as np
+
+    names, amounts = columns.sums_by("name", rates)
 
+    if len(names) <= max_slices:
+        largest = np.argsort(-amounts, kind="stable")
+        other = None
+    else:
+        largest = np.argpartition(-amounts, max_slices - 2)[: max_slices - 1]
+        largest = largest[np.argsort(-amounts[largest], kind="stable")]
+        other = int(amounts.sum() - amounts[largest].sum())
 
-# ============== Event Handlers ===================
-def opendata(e) -> None:
-    # Open Dialog to add new data to table
-    new_data_dialog.open()
+    labels = [names[index] for index in largest]
+    values = (amounts[largest] / 100).tolist()
+    if other is not None:
+        labels.append("Other")
+        values.append(other / 100)
+    return labels, values
 
 
-async def removedata() -> None:
+class RefreshScheduler:
     """
-    Removes a selected line item from the database and refreshes the table with the
-    updated data.
+    Coalesces bursts of refresh requests into a single call of an async callback.
 
-    This function retrieves the selected row from the table and uses the
-    `db.select_line_item` function to find the corresponding line item in the database.
-    It then deletes the line item from the database using the `db.delete_line_item`
-    function. Finally, it displays a notification to the user that the selected item
-    has been removed, retrieves all items from the database, sorts them by name, and
-    updates the table with the new data.
+    The first request starts a timer of `delay` seconds, and every request made before
+    it fires is folded into the same refresh. Requests made while the callback is
+    running schedule exactly one more refresh afterwards.
     """
 
-    row = await my_table.get_selected_row()
+    def __init__(self, callback: Callable[[], Awaitable[None]], delay: float = 0.1) -> None:
+        self.callback = callback
+        self.delay = delay
+        self._pending = False
+        self._task: Optional[asyncio.Task] = None
 
-    if not row:
-        ui.notify("No Data was Selected")
-        return
+    def request(self) -> None:
+        """
+        Asks for a refresh without waiting for it.
+        """
+        self._pending = True
+        if self._task is None or self._task.done():
+            self._task = background_tasks.create(self._run(), name="refresh scheduler")
 
-    db.delete_line_item(row["id"])
+    async def _run(self) -> None:
+        while self._pending:
+            await asyncio.sleep(self.delay)
+            self._pending = False
+            await self.callback()
 
-    ui.notify(f"Removed {row['name']}", color="red")
 
-    my_table.options["rowData"] = sorted(
-        db.get_all_items(), key=lambda data: data["name"]
+async def on_first_connect() -> None:
+    """
+    Prints how long each startup phase took once the first page has connected, which
+    is when the window has painted.
+    """
+    if "first paint" in startup_marks:
+        return
+    startup_marks["first paint"] = time.perf_counter()
+
+    previous = STARTUP_STARTED
+    phases = []
+    for phase, mark in startup_marks.items():
+        phases.append(f"{phase} {mark - previous:.2f}s")
+        previous = mark
+
+    print(
+        f"Startup took {previous - STARTUP_STARTED:.2f}s to first paint: "
+        + ", ".join(phases)
     )
 
-    my_table.update()
 
-    net_breakdown_cards.refresh()
-    net_composition_plot.refresh()
+# =============== Portfolio Pages ======================
+# The pages currently connected to each portfolio, which are told about its changes
+subscribers: Dict[int, Set["PortfolioPage"]] = defaultdict(set)
+
 
+# Records today's snapshot of each portfolio again after its line items changed
+snapshot_recorders: Dict[int, RefreshScheduler] = {}
 
-async def editdata() -> None:
+
+def publish_change(portfolio_id: int, origin: Optional["PortfolioPage"] = None) -> None:
     """
-    Opens the edit data dialog and populates it with the data from the selected row in the table.
+    Shows a change to a portfolio's line items on every page connected to it, except
+    the page the change was made on, which already shows it. Pages of other
+    portfolios are not sent anything.
 
-    This function retrieves the selected row from the table and stores it in the global `select_data`
-    variable. If no row is selected, it displays a notification to the user and returns without doing
-    anything. Otherwise, it sets the values of the `edit_name`, `edit_type`, and `edit_amount` fields
-    in the `edit_data_dialog` to the values f
+    Today's snapshot of the portfolio is then recorded again, once per burst of
+    changes, and the reports of all its pages are refreshed after it, so their history
+    chart ends at the current totals.
     """
-    global select_data
-    select_data = await my_table.get_selected_row()
+    for page in list(subscribers[portfolio_id]):
+        if page is not origin:
+            page.reload()
 
-    if not select_data:
-        ui.notify("No Data was Selected")
-        return
+    if portfolio_id not in snapshot_recorders:
+        snapshot_recorders[portfolio_id] = RefreshScheduler(
+            lambda: record_portfolio_snapshot(portfolio_id)
+        )
+    snapshot_recorders[portfolio_id].request()
 
-    edit_name.set_value(select_data["name"])
-    edit_type.set_value(select_data["type"])
-    edit_status.set_value(select_data["status"])
-    edit_amount.set_value(select_data["amount"])
 
-    edit_data_dialog.open()
+async def record_portfolio_snapshot(portfolio_id: int) -> None:
+    """
+    Records today's snapshot of a portfolio and refreshes the reports of its pages.
+    """
+    await aio.db.record_snapshot(portfolio_id=portfolio_id)
+    for page in list(subscribers[portfolio_id]):
+        page.report_refresher.request()
 
 
-# ============== UI Functions =====================
-@ui.refreshable
-def net_composition_plot() -> None:
-    line_df: pd.DataFrame = db.get_dataframe()
-    if line_df.empty:
-        ui.label("")
-    else:
-        fig = go.Figure(
-            data=[
-                go.Pie(
-                    labels=line_df["name"],
-                    values=line_df["amount"],
-                    hole=0.5,
-                    title="Net Worth Composition",
-                    titleposition="top center",
-                    marker=dict(colors=colors),
-                )
-            ]
+class PortfolioPage:
+    """
+    The UI of one portfolio as shown to one client.
+
+    Every browser tab gets its own page, so the table, the dialogs, the edit selection
+    and the rendered reports of one client never leak into another's. The page
+    subscribes to changes of its portfolio while connected, see `publish_change`.
+    """
+
+    def __init__(self, portfolio_id: int = DEFAULT_PORTFOLIO) -> None:
+        self.portfolio_id = portfolio_id
+        self.line_items = repository.portfolio(portfolio_id)
+        self.aio_line_items = aio.portfolio(portfolio_id)
+        self.select_data: dict = {}
+        self.select_rows: list = []
+        # The data each report section was last rendered from, see `refresh_reports`
+        self.rendered_reports = {
+            "totals": None,
+            "composition": None,
+            "history": None,
+            "rollup": None,
+            "projection": None,
+        }
+        self.composition_plot: Optional[ui.plotly] = None
+        self.report_refresher = RefreshScheduler(self.refresh_reports)
+
+    # ------------- Subscription -------------
+    async def on_connect(self) -> None:
+        """
+        Subscribes to the portfolio's changes, points the grid at its rows and loads the
+        charts once the page is shown. Building them needs every line item, the history
+        and plotly, so they start as spinners to let the window appear sooner.
+        """
+        subscribers[self.portfolio_id].add(self)
+        await self.attach_datasource()
+        await self.refresh_reports()
+
+    def on_disconnect(self) -> None:
+        """
+        Stops sending the portfolio's changes to a page that was closed.
+        """
+        subscribers[self.portfolio_id].discard(self)
+
+    def changed(self) -> None:
+        """
+        Shows a change made on this page on the other pages of the portfolio, and
+        refreshes the reports of every page once today's snapshot is recorded.
+        """
+        publish_change(self.portfolio_id, origin=self)
+
+    def reload(self) -> None:
+        """
+        Shows a change made elsewhere, e.g. on another page or through the REST API, in
+        the grid. The reports are refreshed by `publish_change`.
+        """
+        background_tasks.create(self.reload_table(), name="reload table")
+
+    # ------------- Grid -------------
+    async def attach_datasource(self) -> None:
+        """
+        Points the grid's infinite row model at the `/grid/line_items` route of the
+        portfolio. Called when a browser connects, since the datasource is a JavaScript
+        object the grid options cannot carry.
+        """
+        await self.my_table.client.run_javascript(
+            f"""
+            const grid = getElement({self.my_table.id});
+            grid.gridOptions.api.setDatasource({{
+                getRows: (params) => {{
+                    const query = new URLSearchParams({{
+                        start: params.startRow,
+                        end: params.endRow,
+                        sort: JSON.stringify(params.sortModel),
+                        filter: JSON.stringify(params.filterModel),
+                        search: grid.searchText || "",
+                        portfolio_id: {self.portfolio_id},
+                    }});
+                    fetch(`/grid/line_items?${{query}}`)
+                        .then((response) => response.json())
+                        .then((page) => params.successCallback(page.rows, page.last_row))
+                        .catch(() => params.failCallback());
+                }},
+            }});
+            """,
+            respond=False,
+        )
+
+    async def apply_row_transaction(
+        self, add: Sequence[dict] = (), update: Sequence[dict] = (), remove: Sequence[int] = ()
+    ) -> None:
+        """
+        Applies a change to the rows shown in the browser without resending the table.
+
+        Updated rows are patched in place on the loaded row nodes, matched by their `id`
+        field. Added or removed rows shift every position after them, so the grid is
+        instead told to re-fetch only the blocks it currently has cached.
+        """
+        transaction = json.dumps(
+            {"update": table_rows(update), "refresh": bool(add or remove)}
+        )
+        await self.my_table.client.run_javascript(
+            f"""
+            const api = getElement({self.my_table.id}).gridOptions.api;
+            const transaction = {transaction};
+            const rowsById = Object.fromEntries(transaction.update.map((row) => [row.id, row]));
+            api.forEachNode((node) => {{
+                if (node.data && node.data.id in rowsById) node.setData(rowsById[node.data.id]);
+            }});
+            if (transaction.refresh) api.refreshInfiniteCache();
+            """,
+            respond=False,
+        )
+
+    async def reload_table(self) -> None:
+        """
+        Makes the grid re-fetch the blocks it has cached, e.g. after the line items were
+        changed outside this page.
+        """
+        await self.my_table.client.run_javascript(
+            f"getElement({self.my_table.id}).gridOptions.api.purgeInfiniteCache();",
+            respond=False,
+        )
+
+    @metrics.action
+    async def search_table(self, search: Optional[str]) -> None:
+        """
+        Shows the line items matching the search box in the grid, best matches first.
+
+        The search text is kept on the grid for the datasource to send along, and the grid
+        re-fetches its blocks so matches stream in page by page. A column sort would hide
+        the ranking, so it is cleared when a search starts.
+        """
+        await self.my_table.client.run_javascript(
+            f"""
+            const grid = getElement({self.my_table.id});
+            grid.searchText = {json.dumps(search or "")};
+            const sorted = grid.gridOptions.columnApi.getColumnState().some((column) => column.sort);
+            if (grid.searchText && sorted) {{
+                grid.gridOptions.columnApi.applyColumnState({{ defaultState: {{ sort: null }} }});
+            }} else {{
+                grid.gridOptions.api.purgeInfiniteCache();
+            }}
+            """,
+            respond=False,
+        )
+
+    # ------------- Reports -------------
+    @metrics.action
+    async def refresh_reports(self) -> None:
+        """
+        Refreshes the report sections whose data changed since they were last rendered.
+        It only reads; today's snapshot is recorded after changes, see `publish_change`.
+
+        The database work, including reading the compact line item columns again if
+        the line items changed, runs on the database thread pool first, so rendering
+        only reads data from memory. The columns are never built on the event loop;
+        until the first refresh, the cards show the repository's totals instead.
+        Each section records in `rendered_reports` what it was rendered from: the
+        composition chart the repository version, while the cards, the history chart
+        and the rollup keep the data itself, since their values can repeat. The cards
+        also list the currencies left out of the totals for lack of a rate. Reading the
+        exchange rates first caches them for the current rates version, so converting
+        never waits on SQLite. The projection is cached per set of balances and
+        assumptions, so it is only simulated again when either changed.
+        """
+        history = await aio.run(load_history, self.portfolio_id)
+        type_totals = await aio.db.get_type_totals(self.portfolio_id)
+        await aio.db.get_fx_rates()
+        assumptions = await aio.db.get_projection_assumptions()
+        net_projection = await aio.run(projection.project_net_worth, type_totals, assumptions)
+        unconverted = await aio.db.get_unconverted_currencies(self.portfolio_id)
+        columns = await self.aio_line_items.columns()
+
+        totals = columns.totals(db.get_fx_rates())
+        if (totals, unconverted) != self.rendered_reports["totals"]:
+            self.net_breakdown_cards.refresh(totals, unconverted)
+
+        if (self.line_items.version, db.fx_rates_version) != self.rendered_reports[
+            "composition"
+        ]:
+            await self.update_composition_plot(columns)
+
+        if history != self.rendered_reports["history"]:
+            self.net_history_plot.refresh(history)
+
+        if type_totals != self.rendered_reports["rollup"]:
+            self.net_rollup_plot.refresh(type_totals)
+            await self.show_type_items(self.rollup_select.value)
+
+        if net_projection != self.rendered_reports["projection"]:
+            self.net_projection_plot.refresh(net_projection)
+
+    # ------------- API Handlers -------------
+    @metrics.action
+    async def add_new_data(self) -> None:
+        """
+        Adds a new line item to the database and updates the table with the new data.
+
+        This function creates a new line item in the database using the values entered
+        by the user in the `add_name`, `add_type`, and `add_amount` fields. It then
+        adds the new row to the table through a row transaction. Finally, it displays a
+        notification to the user that the new item has been added and closes the
+        `new_data_dialog`.
+        """
+
+        new_item = await self.aio_line_items.create_line_item(
+            name=self.add_name.value,
+            type=self.add_type.value,
+            status=self.add_status.value,
+            amount=to_cents(self.add_amount.value),
+            currency=self.add_currency.value,
+        )
+
+        ui.notify(f"{self.add_name.value} Added!", color="green")
+
+        # Close Dialog and Reset Values (inputs will reset themselves)
+        self.new_data_dialog.close()
+        self.add_name.set_value(None)
+        self.add_type.set_value(None)
+        self.add_status.set_value(None)
+        self.add_amount.set_value(None)
+        self.add_currency.set_value(db.REPORTING_CURRENCY)
+
+        # Update Table
+        await self.apply_row_transaction(add=[new_item])
+
+        self.changed()
+
+    @metrics.action
+    async def update_data(self) -> None:
+        """
+        Updates an existing line item in the database and refreshes the table with the updated data.
+
+        This function updates an existing line item in the database using the values entered by the
+        user in the `edit_name`, `edit_type`, and `edit_amount` fields. It then sends the updated row
+        to the table through a row transaction. Finally, it displays a notification to the user that
+        the selected item has been updated and closes the `edit_data_dialog`.
+        """
+        updated_item = await self.aio_line_items.update_line_item(
+            id=self.select_data["id"],
+            name=self.edit_name.value,
+            type=self.edit_type.value,
+            status=self.edit_status.value,
+            amount=to_cents(self.edit_amount.value),
+            currency=self.edit_currency.value,
+        )
+
+        ui.notify(f"Updated {self.select_data['name']}")
+
+        self.edit_data_dialog.close()
+        await self.apply_row_transaction(update=[updated_item])
+
+        self.changed()
+
+    @metrics.action
+    async def import_data(self, e: events.UploadEventArguments) -> None:
+        """
+        Imports an uploaded CSV or OFX/QFX file of line items into the portfolio.
+
+        The file is streamed through `importer.import_line_items` on the database thread
+        pool, which writes every row in a single transaction. Because the import bypasses
+        the repository, its cache is then invalidated, and the table and reports are
+        refreshed once for the whole file. The first rows it skipped, if any, are
+        described in the notification.
+        """
+        result = await aio.run(
+            importer.import_line_items,
+            io.TextIOWrapper(e.content, encoding="utf-8-sig", newline=""),
+            e.name,
+            self.portfolio_id,
+        )
+        self.line_items.invalidate()
+
+        message = f"Imported {result['inserted']} new and updated {result['updated']} line items"
+        if result["rejected"]:
+            message += f", skipped {result['rejected']} invalid rows: "
+            message += "; ".join(result["errors"][:IMPORT_SHOWN_ERRORS])
+        ui.notify(
+            message,
+            color="orange" if result["rejected"] else "green",
+            multi_line=bool(result["rejected"]),
+            close_button=bool(result["rejected"]),
+        )
+
+        self.import_dialog.close()
+        self.import_upload.reset()
+        self.my_table.call_api_method("refreshInfiniteCache")
+
+        self.changed()
+
+    @metrics.action
+    async def undo_change(self, redo: bool = False) -> None:
+        """
+        Undoes the latest change to the portfolio's line items, such as an edit, a delete
+        or a whole import, or redoes the latest undone one, and refreshes the table and
+        reports.
+        """
+        if redo:
+            reverted = await self.aio_line_items.redo()
+        else:
+            reverted = await self.aio_line_items.undo()
+
+        if reverted is None:
+            ui.notify("Nothing to redo" if redo else "Nothing to undo")
+            return
+
+        ui.notify(f"{'Redid' if redo else 'Undid'} changes to {len(reverted)} line items")
+        self.my_table.call_api_method("refreshInfiniteCache")
+
+        self.changed()
+
+    @metrics.action
+    async def backup_data(self) -> None:
+        """
+        Backs the whole database up into the "backups" folder next to it. The copy runs
+        on the database thread pool in small steps, so the app keeps serving meanwhile.
+        """
+        directory = data_directory("backups")
+        os.makedirs(directory, exist_ok=True)
+        path = os.path.join(directory, f"networth-{datetime.now():%Y%m%d-%H%M%S}.db")
+
+        await aio.db.backup_database(path)
+        ui.notify(f"Backed up to {path}", color="green")
+
+    @metrics.action
+    async def export_data(self) -> None:
+        """
+        Exports the portfolio's line items and history into the "exports" folder next to
+        the database, streamed in batches on the database thread pool.
+        """
+        paths = await aio.run(
+            exporter.export_portfolio, data_directory("exports"), self.portfolio_id
         )
+        ui.notify(f"Exported to {', '.join(paths)}", color="green")
+
+    async def handle_key(self, e: events.KeyEventArguments) -> None:
+        """
+        Undoes with Ctrl+Z and redoes with Ctrl+Y or Ctrl+Shift+Z, or Cmd on macOS, while
+        no input has focus.
+        """
+        if not e.action.keydown or e.action.repeat or not (e.modifiers.ctrl or e.modifiers.meta):
+            return
+
+        key = e.key.name.lower()
+        if key == "z":
+            await self.undo_change(redo=e.modifiers.shift)
+        elif key == "y":
+            await self.undo_change(redo=True)
+
+    async def open_assumptions(self) -> None:
+        """
+        Opens the projection assumptions dialog for the types that currently have line items.
+        """
+        self.assumption_type.options = sorted(
+            {group["type"] for group in self.rendered_reports["rollup"] or []}
+        )
+        self.assumption_type.update()
+        self.assumption_dialog.open()
+
+    async def show_assumption(self, type: Optional[str]) -> None:
+        """
+        Fills the assumptions dialog with the growth and volatility saved for a type.
+        """
+        assumptions = await aio.db.get_projection_assumptions()
+        assumption = assumptions.get(type, {"growth": 0.0, "volatility": 0.0})
+        self.assumption_growth.set_value(assumption["growth"] * 100)
+        self.assumption_volatility.set_value(assumption["volatility"] * 100)
+
+    @metrics.action
+    async def save_assumption(self) -> None:
+        """
+        Saves the growth and volatility entered for a type and projects the net worth again.
+        """
+        try:
+            await aio.db.set_projection_assumption(
+                type=self.assumption_type.value,
+                growth=(self.assumption_growth.value or 0) / 100,
+                volatility=(self.assumption_volatility.value or 0) / 100,
+            )
+        except ValueError as e:
+            ui.notify(str(e), color="orange")
+            return
+
+        ui.notify(f"Saved assumptions for {self.assumption_type.value}")
+        self.assumption_dialog.close()
+
+        self.report_refresher.request()
+
+    # ------------- Event Handlers -------------
+    def opendata(self, e) -> None:
+        # Open Dialog to add new data to table
+        self.new_data_dialog.open()
+
+    @metrics.action
+    async def removedata(self) -> None:
+        """
+        Removes the selected line items from the database and refreshes the table with the
+        updated data.
+
+        This function retrieves every selected row from the table and deletes them through
+        the `delete_line_items` repository method, which writes through to the
+        database with a single bulk DELETE. Finally, it displays a notification to the user
+        that the selected items have been removed and removes the rows from the table
+        through a row transaction.
+        """
+
+        rows = await self.my_table.get_selected_rows()
 
-        # Set the background color to black
-        fig.update_layout(
-            plot_bgcolor="#121212", paper_bgcolor="#121212", font={"color": "white"}
+        if not rows:
+            ui.notify("No Data was Selected")
+            return
+
+        ids = [row["id"] for row in rows]
+        await self.aio_line_items.delete_line_items(ids)
+
+        if len(rows) == 1:
+            ui.notify(f"Removed {rows[0]['name']}", color="red")
+        else:
+            ui.notify(f"Removed {len(rows)} line items", color="red")
+
+        await self.apply_row_transaction(remove=ids)
+
+        self.changed()
+
+    @metrics.action
+    async def update_selected_data(self) -> None:
+        """
+        Applies the bulk edit dialog to every selected line item at once.
+
+        Only the fields that were filled in are changed, with a single bulk UPDATE through the
+        `update_line_items` repository method. The changed rows are then sent to the
+        table through a row transaction and the reports are refreshed once for the whole batch.
+        """
+        values = {}
+        if self.bulk_type.value:
+            values["type"] = self.bulk_type.value
+        if self.bulk_status.value:
+            values["status"] = self.bulk_status.value
+
+        self.bulk_edit_dialog.close()
+
+        if not values:
+            ui.notify("Nothing to Update")
+            return
+
+        updated_items = await self.aio_line_items.update_line_items(
+            [row["id"] for row in self.select_rows], values
         )
 
-        # Set the text color to white
-        fig.update_traces(textfont=dict(color="white"))
+        ui.notify(f"Updated {len(updated_items)} line items")
+        await self.apply_row_transaction(update=updated_items)
+
+        self.changed()
+
+    @metrics.action
+    async def editdata(self) -> None:
+        """
+        Opens the edit data dialog and populates it with the data from the selected row in the table.
+
+        This function retrieves the selected row from the table and stores it in the page's `select_data`
+        attribute. If no row is selected, it displays a notification to the user and returns without doing
+        anything. Otherwise, it sets the values of the `edit_name`, `edit_type`, and `edit_amount` fields
+        in the `edit_data_dialog` to the values f
+
+        When more than one row is selected, the rows are stored in the page's `select_rows`
+        attribute and the `bulk_edit_dialog` is opened instead.
+        """
+        self.select_rows = await self.my_table.get_selected_rows()
+
+        if not self.select_rows:
+            ui.notify("No Data was Selected")
+            return
 
-        ui.plotly(fig).classes("w-5/6 h-screen m-auto")
+        if len(self.select_rows) > 1:
+            self.bulk_edit_label.set_text(
+                f"Editing {len(self.select_rows)} line items, blank fields are left unchanged"
+            )
+            self.bulk_type.set_value(None)
+            self.bulk_status.set_value(None)
+            self.bulk_edit_dialog.open()
+            return
 
+        self.select_data = self.select_rows[0]
 
-@ui.refreshable
-def net_breakdown_cards() -> None:
-    line_df = db.get_dataframe()
+        self.edit_name.set_value(self.select_data["name"])
+        self.edit_type.set_value(self.select_data["type"])
+        self.edit_status.set_value(self.select_data["status"])
+        self.edit_amount.set_value(self.select_data["amount"])
+        if self.select_data["currency"] not in self.edit_currency.options:
+            # Imported items may be in a currency the rates file does not list
+            self.edit_currency.options.append(self.select_data["currency"])
+            self.edit_currency.update()
+        self.edit_currency.set_value(self.select_data["currency"])
+
+        self.edit_data_dialog.open()
+
+    @metrics.action
+    async def open_ledger(self) -> None:
+        """
+        Opens the ledger dialog of the selected line item, listing the entries of the
+        last `LEDGER_DAYS` days with the balance after each.
+        """
+        rows = await self.my_table.get_selected_rows()
+
+        if len(rows) != 1:
+            ui.notify("Select one line item to see its ledger")
+            return
+
+        self.select_data = rows[0]
+        self.ledger_label.set_text(f"Ledger of {self.select_data['name']}")
+        self.ledger_date.set_value(date.today().isoformat())
+        await self.show_statement()
+        self.ledger_dialog.open()
+
+    async def show_statement(self) -> None:
+        """
+        Fills the ledger dialog's table with the selected line item's recent entries.
+        """
+        today = date.today()
+        statement = await aio.db.get_statement(
+            self.select_data["id"],
+            today - timedelta(days=LEDGER_DAYS),
+            today,
+            self.portfolio_id,
+        )
+        self.ledger_table.rows = [
+            {
+                **entry,
+                "posted_on": entry["posted_on"].isoformat(),
+                "amount": format_cents(entry["amount"]),
+                "balance": format_cents(entry["balance"]),
+            }
+            for entry in reversed(statement["entries"])
+        ]
+        self.ledger_table.update()
+
+    @metrics.action
+    async def post_transaction(self) -> None:
+        """
+        Posts the entry filled into the ledger dialog, which updates the line item's
+        amount to its new balance, and shows it in the table and the reports.
+        """
+        if not self.ledger_kind.value or self.ledger_amount.value is None:
+            ui.notify("Choose a kind and an amount")
+            return
+
+        updated_item = await self.aio_line_items.add_transaction(
+            self.select_data["id"],
+            date.fromisoformat(self.ledger_date.value),
+            self.ledger_kind.value,
+            to_cents(self.ledger_amount.value),
+            self.ledger_memo.value or "",
+        )
+
+        ui.notify(f"Posted to {self.select_data['name']}", color="green")
+        self.ledger_amount.set_value(None)
+        self.ledger_memo.set_value(None)
+
+        await self.show_statement()
+        await self.apply_row_transaction(update=[updated_item])
+
+        self.changed()
+
+    # ------------- UI Functions -------------
+    @metrics.timed
+    async def update_composition_plot(self, columns: LineItemColumns) -> None:
+        """
+        Draws the composition chart the first time it is called. Afterwards only the
+        chart's `labels` and `values` are patched in the browser with `Plotly.restyle`,
+        rather than rebuilding the component and resending the whole figure.
+
+        Args:
+            columns (LineItemColumns): The line items, as read off the event loop.
+        """
+        self.rendered_reports["composition"] = (self.line_items.version, db.fx_rates_version)
+        labels, values = composition_slices(
+            columns, COMPOSITION_MAX_SLICES, db.get_fx_rates()
+        )
+
+        if self.composition_plot is None:
+            self.composition_container.clear()
+            with self.composition_container:
+                self.composition_plot = ui.plotly(
+                    {
+                        "data": [
+                            {
+                                "type": "pie",
+                                "labels": labels,
+                                "values": values,
+                                "hole": 0.5,
+                                "title": {
+                                    "text": "Net Worth Composition",
+                                    "position": "top center",
+                                },
+                                "marker": {"colors": colors},
+                                # Set the text color to white
+                                "textfont": {"color": "white"},
+                            }
+                        ],
+                        # Set the background color to black
+                        "layout": {
+                            "plot_bgcolor": "#121212",
+                            "paper_bgcolor": "#121212",
+                            "font": {"color": "white"},
+                        },
+                    }
+                ).classes("w-5/6 h-screen m-auto")
+            return
+
+        trace = self.composition_plot.figure["data"][0]
+        if trace["labels"] == labels and trace["values"] == values:
+            return
+
+        # The figure dict is also the element's props, so a reconnecting client gets the
+        # new slices too, without `update()` sending the whole figure again
+        trace.update(labels=labels, values=values)
+        patch = json.dumps({"labels": [labels], "values": [values]})
+        await self.composition_plot.client.run_javascript(
+            f"Plotly.restyle(getElement({self.composition_plot.id}).$el.id, {patch}, [0]);",
+            respond=False,
+        )
+
+    @ui.refreshable
+    @metrics.timed
+    def net_history_plot(self, history: Optional[list] = None) -> None:
+        if history is None:
+            ui.spinner(size="lg").classes("m-auto")
+            return
+
+        import plotly.graph_objects as go
+
+        self.rendered_reports["history"] = history
+        if not history:
+            ui.label("")
+        else:
+            days = [point["taken_on"] for point in history]
+            fig = go.Figure(
+                data=[
+                    go.Scatter(
+                        x=days,
+                        y=[point[key] / 100 for point in history],
+                        name=name,
+                        mode="lines",
+                        line=dict(color=color),
+                    )
+                    for key, name, color in [
+                        ("net_worth", "Net Worth", colors[0]),
+                        ("assets", "Total Assets", colors[3]),
+                        ("liabilities", "Total Liabilities", colors[2]),
+                    ]
+                ]
+            )
+
+            fig.update_layout(
+                title="Net Worth History",
+                plot_bgcolor="#121212",
+                paper_bgcolor="#121212",
+                font={"color": "white"},
+            )
+
+            ui.plotly(fig).classes("w-5/6 h-screen m-auto")
+
+    @ui.refreshable
+    @metrics.timed
+    def net_projection_plot(self, net_projection: Optional[dict] = None) -> None:
+        """
+        Fan chart of the projected net worth: the median path with the 25th to 75th and
+        5th to 95th percentile bands of the simulation around it.
+        """
+        if net_projection is None:
+            ui.spinner(size="lg").classes("m-auto")
+            return
+
+        self.rendered_reports["projection"] = net_projection
+        years = net_projection["years"]
+        percentiles = net_projection["percentiles"]
+
+        def band(lower: int, upper: int, name: str, opacity: float) -> list:
+            edge = {"x": years, "mode": "lines", "line": {"width": 0}}
+            return [
+                {**edge, "y": percentiles[lower], "showlegend": False, "hoverinfo": "skip"},
+                {
+                    **edge,
+                    "y": percentiles[upper],
+                    "fill": "tonexty",
+                    "fillcolor": f"rgba(0, 203, 255, {opacity})",
+                    "name": name,
+                },
+            ]
+
+        ui.plotly(
+            {
+                "data": [
+                    *band(5, 95, "5th to 95th Percentile", 0.2),
+                    *band(25, 75, "25th to 75th Percentile", 0.4),
+                    {
+                        "x": years,
+                        "y": percentiles[50],
+                        "mode": "lines",
+                        "name": "Median",
+                        "line": {"color": colors[0]},
+                    },
+                ],
+                "layout": {
+                    "title": "Projected Net Worth",
+                    "xaxis": {"title": "Years from Today"},
+                    "plot_bgcolor": "#121212",
+                    "paper_bgcolor": "#121212",
+                    "font": {"color": "white"},
+                },
+            }
+        ).classes("w-5/6 h-screen m-auto")
+
+    @ui.refreshable
+    @metrics.timed
+    def net_rollup_plot(self, type_totals: Optional[list] = None) -> None:
+        """
+        Sunburst of the totals by status and then by type, drawn from the trigger maintained
+        type totals so its cost depends on the number of types, not line items. Also keeps
+        the drill-down select's options in step with the types.
+        """
+        if type_totals is None:
+            ui.spinner(size="lg").classes("m-auto")
+            return
+
+        self.rendered_reports["rollup"] = type_totals
+        self.rollup_select.options = {
+            f"{group['status']}/{group['type']}": f"{group['status']} / {group['type']}"
+            for group in type_totals
+        }
+        if self.rollup_select.value not in self.rollup_select.options:
+            self.rollup_select.value = None
+        self.rollup_select.update()
+
+        status_totals = defaultdict(int)
+        for group in type_totals:
+            status_totals[group["status"]] += group["amount"]
+
+        # A type's id always has its status and a "/" in front, so it never equals a
+        # status's id, whatever the type is named; the labels are the names as they are
+        ids, labels, parents, values = [], [], [], []
+        for status, amount in status_totals.items():
+            ids.append(status)
+            labels.append(status)
+            parents.append("")
+            values.append(amount / 100)
+        for group in type_totals:
+            ids.append(f"{group['status']}/{group['type']}")
+            labels.append(group["type"])
+            parents.append(group["status"])
+            values.append(group["amount"] / 100)
+
+        ui.plotly(
+            {
+                "data": [
+                    {
+                        "type": "sunburst",
+                        "ids": ids,
+                        "labels": labels,
+                        "parents": parents,
+                        "values": values,
+                        "branchvalues": "total",
+                        "marker": {"colors": colors},
+                    }
+                ],
+                "layout": {
+                    "title": "Totals by Status and Type",
+                    "plot_bgcolor": "#121212",
+                    "paper_bgcolor": "#121212",
+                    "font": {"color": "white"},
+                },
+            }
+        ).classes("w-5/6 h-screen m-auto")
+
+    @ui.refreshable
+    @metrics.timed
+    def type_items_plot(
+        self, group: Optional[dict] = None, items: Optional[list] = None
+    ) -> None:
+        """
+        Treemap of the largest line items of one status and type. Whatever the
+        `ROLLUP_MAX_ITEMS` largest items leave of the type's total is shown as "Other".
+        """
+        if group is None:
+            return
+        items = items or []
+
+        labels = [item["name"] for item in items]
+        values = [item["amount"] / 100 for item in items]
+        other = group["amount"] - sum(item["amount"] for item in items)
+        if other:
+            labels.append("Other")
+            values.append(other / 100)
+
+        ui.plotly(
+            {
+                "data": [
+                    {
+                        "type": "treemap",
+                        "labels": labels,
+                        "parents": [""] * len(labels),
+                        "values": values,
+                        "marker": {"colors": colors},
+                    }
+                ],
+                "layout": {
+                    "title": f"{group['status']} / {group['type']}",
+                    "plot_bgcolor": "#121212",
+                    "paper_bgcolor": "#121212",
+                    "font": {"color": "white"},
+                },
+            }
+        ).classes("w-5/6 h-screen m-auto")
+
+    @metrics.action
+    async def show_type_items(self, key: Optional[str]) -> None:
+        """
+        Drills down into one status and type, loading only its largest line items through
+        an indexed, paged query. Their amounts are converted into the reporting currency,
+        like the type's total.
+        """
+        groups = {
+            f"{group['status']}/{group['type']}": group
+            for group in self.rendered_reports["rollup"] or []
+        }
+        if key not in groups:
+            self.type_items_plot.refresh(None, [])
+            return
+
+        group = groups[key]
+        items = await aio.db.get_items_page(
+            offset=0,
+            limit=ROLLUP_MAX_ITEMS,
+            sort=[("amount", "desc")],
+            filters=[("status", "equals", group["status"]), ("type", "equals", group["type"])],
+            portfolio_id=self.portfolio_id,
+        )
+        rates = await aio.db.get_fx_rates()
+        for item in items:
+            item["amount"] = db.convert_cents(
+                item["amount"], db.rate_for(rates, item["currency"])
+            )
+        self.type_items_plot.refresh(group, items)
+
+    @ui.refreshable
+    def debug_metrics_panel(self) -> None:
+        """
+        Tables of everything `metrics` recorded, shown when instrumentation is enabled.
+        """
+        snapshot = metrics.snapshot()
+
+        ui.table(
+            title="Latencies (ms)",
+            columns=[
+                {"name": key, "label": key, "field": key}
+                for key in ("name", "count", "mean_ms", "p50_ms", "p95_ms", "p99_ms", "max_ms")
+            ],
+            rows=metrics.rows(),
+            row_key="name",
+        ).classes("w-full")
+        ui.table(
+            title="Actions",
+            columns=[
+                {"name": key, "label": key, "field": key}
+                for key in ("name", "count", "queries", "queries_per_action")
+            ],
+            rows=[{"name": name, **totals} for name, totals in snapshot["actions"].items()],
+            row_key="name",
+        ).classes("w-full")
+        ui.table(
+            title="Payloads",
+            columns=[
+                {"name": key, "label": key, "field": key}
+                for key in ("name", "count", "bytes", "max_bytes")
+            ],
+            rows=[{"name": name, **totals} for name, totals in snapshot["payloads"].items()],
+            row_key="name",
+        ).classes("w-full")
+
+    @ui.refreshable
+    @metrics.timed
+    def net_breakdown_cards(
+        self, totals: Optional[Dict[str, int]] = None, unconverted: Optional[List[str]] = None
+    ) -> None:
+        # The first paint uses the running totals, which cost no more than a query
+        if totals is None:
+            totals = self.line_items.get_totals()
+            unconverted = db.get_unconverted_currencies(self.portfolio_id)
+        unconverted = unconverted or []
+        self.rendered_reports["totals"] = (totals, unconverted)
 
-    if line_df.empty:
         with ui.row().classes("w-full justify-evenly") as tile_row:
             with ui.card().classes("w-1/4 place-content-center") as total_items:
                 ui.label("Net Worth").classes("text-xl").classes("m-auto")
-                ui.label(f"${float(0):,.2f}").classes("text-center").classes("m-auto")
+                ui.label(format_money(totals["net_worth"])).classes(
+                    "text-center"
+                ).classes("m-auto")
             with ui.card().classes("w-1/4 place-content-center") as total_assets:
                 ui.label("Total Assets").classes("text-xl").classes("m-auto")
-                ui.label(f"${float(0):,.2f}").classes("m-auto")
+                ui.label(format_money(totals["assets"])).classes("m-auto")
             with ui.card().classes("w-1/4 place-content-center") as total_liabilities:
                 ui.label("Total Liabilities").classes("text-xl").classes("m-auto")
-                ui.label(f"${float(0):,.2f}").classes("m-auto")
-    else:
-        sum_liabilties = line_df.loc[line_df["status"] == "Liability", "amount"].sum()
-        sum_assets = line_df.loc[line_df["status"] == "Asset", "amount"].sum()
-        net_worth = sum_assets - sum_liabilties
+                ui.label(format_money(totals["liabilities"])).classes("m-auto")
+        if unconverted:
+            ui.label(
+                f"Not counted, no exchange rate: {', '.join(unconverted)}"
+            ).classes("text-warning m-auto")
 
-        with ui.row().classes("w-full justify-evenly") as tile_row:
-            with ui.card().classes("w-1/4 place-content-center") as total_items:
-                ui.label("Net Worth").classes("text-xl").classes("m-auto")
-                ui.label(f"${float(net_worth):,.2f}").classes("text-center").classes(
-                    "m-auto"
+    # ------------- Main UI -------------
+    def build(self) -> None:
+        """
+        Creates the page's elements in the current client.
+        """
+        ui.dark_mode().enable()
+
+        # App Title
+        ui.label("Net Worth Calculator").classes("text-4xl")
+        ui.splitter(horizontal=True)
+
+        # ------ Data Entry and Table ------------
+        ui.label("Line Items").classes("text-2xl")
+        ui.input(
+            label="Search", on_change=lambda e: self.search_table(e.value)
+        ).props("clearable debounce=250").classes("w-1/4")
+        self.my_table: ui.aggrid = ui.aggrid(
+            {
+                "defaultColDef": {
+                    "flex": 1,
+                    "sortable": True,
+                    "filter": "agTextColumnFilter",
+                    "filterParams": {"maxNumConditions": 1},
+                },
+                "columnDefs": [
+                    {"headerName": "Name", "field": "name", "sort": "asc"},
+                    {"headerName": "Type", "field": "type"},
+                    {"headerName": "Status", "field": "status"},
+                    {
+                        "headerName": "Amount",
+                        "field": "amount",
+                        "filter": "agNumberColumnFilter",
+                    },
+                    {"headerName": "Currency", "field": "currency"},
+                    {"headerName": "ID", "field": "id", "hide": True},
+                ],
+                "rowModelType": "infinite",
+                "cacheBlockSize": 100,
+                "rowSelection": "multiple",
+            }
+        ).classes("m-auto")
+        self.my_table.client.on_connect(self.on_connect)
+        self.my_table.client.on_disconnect(self.on_disconnect)
+
+        # Dialog for Adding Input
+        with ui.dialog() as self.new_data_dialog:
+            with ui.card():
+                self.add_name = ui.input(label="Add Name")
+                self.add_type = ui.input(label="Add Type")
+                self.add_status = ui.select(
+                    label="Add Status", options=["Asset", "Liability"], value=None
+                ).classes("w-full")
+                self.add_amount = ui.number(label="Add Amount", format="%.2f", value=None).on(
+                    "blur", lambda: self.add_amount.update()
                 )
-            with ui.card().classes("w-1/4 place-content-center") as total_assets:
-                ui.label("Total Assets").classes("text-xl").classes("m-auto")
-                ui.label(f"${float(sum_assets):,.2f}").classes("m-auto")
-            with ui.card().classes("w-1/4 place-content-center") as total_liabilities:
-                ui.label("Total Liabilities").classes("text-xl").classes("m-auto")
-                ui.label(f"${float(sum_liabilties):,.2f}").classes("m-auto")
-
-
-# =============== Main UI ======================
-
-# App Title
-ui.label("Net Worth Calculator").classes("text-4xl")
-ui.splitter(horizontal=True)
-
-# ------ Data Entry and Table ------------
-ui.label("Line Items").classes("text-2xl")
-my_table: ui.aggrid = ui.aggrid(
-    {
-        "defaultColDef": {"flex": 1},
-        "columnDefs": [
-            {"headerName": "Name", "field": "name"},
-            {"headerName": "Type", "field": "type"},
-            {"headerName": "Status", "field": "status"},
-            {"headerName": "Amount", "field": "amount"},
-            {"headerName": "ID", "field": "id", "hide": True},
-        ],
-        "rowData": sorted(db.get_all_items(), key=lambda data: data["name"]),
-        "rowSelection": "multiple",
-    }
-).classes("m-auto")
-
-
-# Dialog for Adding Input
-with ui.dialog() as new_data_dialog:
-    with ui.card():
-        add_name = ui.input(label="Add Name")
-        add_type = ui.input(label="Add Type")
-        add_status = ui.select(
-            label="Add Status", options=["Asset", "Liability"], value=None
-        ).classes("w-full")
-        add_amount = ui.number(label="Add Amount", format="%.2f", value=None).on(
-            "blur", lambda: add_amount.update()
-        )
-        ui.button("Save New Stream", on_click=add_new_data)
-
-# Dialog for Editing Input
-with ui.dialog() as edit_data_dialog:
-    with ui.card():
-        edit_name = ui.input(label="Edit Name")
-        edit_type = ui.input(label="Edit Type")
-        edit_status = ui.select(
-            label="Edit Status", options=["Asset", "Liability"]
-        ).classes("w-full")
-        edit_amount = ui.number(label="Edit Amount", format="%.2f").on(
-            "blur", lambda: edit_amount.update()
-        )
-        ui.button("Edit Stream", on_click=update_data)
+                self.add_currency = ui.select(
+                    label="Add Currency", options=currencies, value=db.REPORTING_CURRENCY
+                ).classes("w-full")
+                ui.button("Save New Stream", on_click=self.add_new_data)
+
+        # Dialog for Editing Input
+        with ui.dialog() as self.edit_data_dialog:
+            with ui.card():
+                self.edit_name = ui.input(label="Edit Name")
+                self.edit_type = ui.input(label="Edit Type")
+                self.edit_status = ui.select(
+                    label="Edit Status", options=["Asset", "Liability"]
+                ).classes("w-full")
+                self.edit_amount = ui.number(label="Edit Amount", format="%.2f").on(
+                    "blur", lambda: self.edit_amount.update()
+                )
+                self.edit_currency = ui.select(
+                    label="Edit Currency", options=list(currencies)
+                ).classes("w-full")
+                ui.button("Edit Stream", on_click=self.update_data)
+
+        # Dialog for Editing Several Selected Rows at Once
+        with ui.dialog() as self.bulk_edit_dialog:
+            with ui.card():
+                self.bulk_edit_label = ui.label()
+                self.bulk_type = ui.input(label="Bulk Type")
+                self.bulk_status = ui.select(
+                    label="Bulk Status", options=["Asset", "Liability"], clearable=True
+                ).classes("w-full")
+                ui.button("Edit Selected", on_click=self.update_selected_data)
+
+        # Dialog for the Ledger of the Selected Row
+        with ui.dialog() as self.ledger_dialog:
+            with ui.card():
+                self.ledger_label = ui.label().classes("text-xl")
+                self.ledger_table = ui.table(
+                    columns=[
+                        {"name": key, "label": label, "field": key}
+                        for key, label in (
+                            ("posted_on", "Date"),
+                            ("kind", "Kind"),
+                            ("amount", "Amount"),
+                            ("balance", "Balance"),
+                            ("memo", "Memo"),
+                        )
+                    ],
+                    rows=[],
+                    row_key="id",
+                    pagination=10,
+                ).classes("w-full")
+                self.ledger_kind = ui.select(
+                    label="Kind", options=list(TRANSACTION_KINDS)
+                ).classes("w-full")
+                self.ledger_date = ui.input(label="Date").props("type=date")
+                self.ledger_amount = ui.number(label="Amount", format="%.2f")
+                self.ledger_memo = ui.input(label="Memo")
+                ui.button("Post", on_click=self.post_transaction)
+
+        # Dialog for Importing a File
+        with ui.dialog() as self.import_dialog:
+            with ui.card():
+                ui.label("Import a CSV (name, type, status, amount) or an OFX/QFX bank export")
+                self.import_upload = ui.upload(
+                    on_upload=self.import_data, auto_upload=True
+                ).props('accept=".csv,.ofx,.qfx"').classes("w-full")
+
+        # CRUD Buttons
+        with ui.row():
+            ui.button("Add", color="green", on_click=lambda e: self.opendata(e))
+            ui.button("Edit", on_click=self.editdata)
+            ui.button("Delete", color="red", on_click=self.removedata)
+            ui.button("Ledger", on_click=self.open_ledger)
+            ui.button("Import", on_click=self.import_dialog.open)
+            ui.button("Undo", on_click=lambda: self.undo_change())
+            ui.button("Redo", on_click=lambda: self.undo_change(redo=True))
+            ui.button("Backup", on_click=self.backup_data)
+            ui.button("Export", on_click=self.export_data)
+
+        ui.keyboard(on_key=self.handle_key)
 
+        ui.splitter(horizontal=True)
 
-# CRUD Buttons
-with ui.row() as button_row:
-    ui.button("Add", color="green", on_click=lambda e: opendata(e))
-    ui.button("Edit", on_click=editdata)
-    ui.button("Delete", color="red", on_click=removedata)
+        # ----------- Reporting -------------
 
-ui.splitter(horizontal=True)
+        ui.label("Net Worth Breakdown").classes("text-2xl")
+        self.net_breakdown_cards()
+        with ui.column().classes("w-full") as self.composition_container:
+            ui.spinner(size="lg").classes("m-auto")
+        self.net_history_plot()
 
-# ----------- Reporting -------------
+        ui.label("Rollup by Type").classes("text-2xl")
+        self.rollup_select = ui.select(
+            {},
+            label="Drill Down",
+            clearable=True,
+            on_change=lambda e: self.show_type_items(e.value),
+        ).classes("w-1/4")
+        self.net_rollup_plot()
+        self.type_items_plot()
 
-ui.label("Net Worth Breakdown").classes("text-2xl")
-net_breakdown_cards()
-net_composition_plot()
+        ui.label("Projection").classes("text-2xl")
+        ui.button("Assumptions", on_click=self.open_assumptions)
+        self.net_projection_plot()
 
-ui.run(
-    native=True,
-    window_size=(1200, 800),
-    title="Net Worth Tracker",
-    favicon="assets\\assst.ico",
-    fullscreen=False,
-    reload=False,
-)
+        # Dialog for the Growth and Volatility of Each Type
+        with ui.dialog() as self.assumption_dialog:
+            with ui.card():
+                self.assumption_type = ui.select(
+                    label="Type", options=[], on_change=lambda e: self.show_assumption(e.value)
+                ).classes("w-full")
+                self.assumption_growth = ui.number(
+                    label="Annual Growth or Interest (%)", format="%.2f", min=-99.99
+                )
+                self.assumption_volatility = ui.number(
+                    label="Annual Volatility (%)", format="%.2f", min=0
+                )
+                ui.button("Save Assumptions", on_click=self.save_assumption)
+
+        # ----------- Debug Metrics -------------
+        if metrics.ENABLED:
+            with ui.expansion("Debug Metrics").classes("w-full"):
+                self.debug_metrics_panel()
+            ui.timer(2.0, self.debug_metrics_panel.refresh)
+
+
+@ui.page("/")
+def index_page() -> None:
+    PortfolioPage(DEFAULT_PORTFOLIO).build()
+
+
+@ui.page("/portfolio/{portfolio_id}")
+def portfolio_page(portfolio_id: int) -> None:
+    PortfolioPage(portfolio_id).build()
+
+
+app.include_router(api.router)
+api.change_handlers.append(publish_change)
+
+if metrics.ENABLED:
+    measure_payloads()
+
+startup_marks["ui"] = time.perf_counter()
+app.on_startup(lambda: startup_marks.update(server=time.perf_counter()))
+app.on_connect(on_first_connect)
+
+# Only start the app when run, so the module can be imported, e.g. by the benchmarks
+if __name__ in {"__main__", "__mp_main__"}:
+    ui.run(
+        native=True,
+        window_size=(1200, 800),
+        title="Net Worth Tracker",
+        favicon="assets\\assst.ico",
+        fullscreen=False,
+        reload=False,
+    )
@@ -0,0 +1,35 @@
+from datetime import datetime
+from sqlmodel import SQLModel, Field
+from typing import Optional
+
+
+class ChangeSet(SQLModel, table=True):
+    """
+    One write to the line items, such as a single edit, a bulk delete or an import,
+    or the undo or redo of an earlier one. Its changes are undone together.
+    """
+
+    id: Optional[int] = Field(default=None, primary_key=True)
+    made_at: datetime = Field(index=True)
+    # Each portfolio is undone separately
+    portfolio_id: int = Field(index=True)
+    # "edit" for writes made by the user, "undo" or "redo" for reverts of earlier ones
+    # and "ledger" for postings to the ledger, which cannot be undone
+    kind: str = "edit"
+    # The change set an "undo" or "redo" reverted
+    reverts: Optional[int] = Field(default=None, index=True)
+
+
+class Change(SQLModel, table=True):
+    """
+    The delta one change set made to one line item, appended by triggers on the line
+    item table, see `db.create_journal`. Rows are never updated or deleted.
+    """
+
+    id: Optional[int] = Field(default=None, primary_key=True)
+    changeset_id: int = Field(index=True)
+    line_item_id: int = Field(index=True)
+    # JSON objects of the columns before and after the change. An update only stores
+    # the columns it changed, an insert has no old values and a delete no new ones.
+    old_values: Optional[str] = None
+    new_values: Optional[str] = None
@@ -0,0 +1,14 @@
+from datetime import datetime
+from sqlmodel import SQLModel, Field
+
+
+class Checkpoint(SQLModel, table=True):
+    """
+    A full copy of the line items as of one change, which past states are rebuilt from
+    by replaying the later changes, see `db.get_items_at`.
+    """
+
+    change_id: int = Field(primary_key=True)
+    made_at: datetime = Field(index=True)
+    # zlib compressed JSON of the line items as lists of `JOURNAL_COLUMNS` values
+    data: bytes
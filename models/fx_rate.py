@@ -0,0 +1,12 @@
+from sqlmodel import SQLModel, Field
+
+
+class FxRate(SQLModel, table=True):
+    """
+    The exchange rate of one currency into the reporting currency, loaded from a local
+    rates file by `db.load_fx_rates`.
+    """
+
+    currency: str = Field(primary_key=True)
+    # How many units of the reporting currency one unit of this currency is worth
+    rate: float
@@ -1,10 +1,78 @@
+from decimal import Decimal, ROUND_HALF_UP
+from sqlalchemy import Index
 from sqlmodel import SQLModel, Field
-from typing import Optional, List
+from typing import Optional, List, Union
+
+# Line items without a currency, such as those created before currencies existed
+DEFAULT_CURRENCY = "USD"
+# Line items created before there were several portfolios belong to this one
+DEFAULT_PORTFOLIO = 1
+
+
+# Every read is scoped to one portfolio, so the columns line items are sorted and
+# filtered by are indexed behind the portfolio, which lets a sorted page of one
+# portfolio be read in index order. The name index also covers the type, since name
+# and type are the natural key imports are matched by.
+PORTFOLIO_INDEXES = {
+    "name": ("name", "type"),
+    "type": ("type",),
+    "status": ("status",),
+    "amount": ("amount",),
+    "currency": ("currency",),
+}
 
 
 class LineItem(SQLModel, table=True):
+    # Ids are never reused, so a new line item cannot inherit the ledger of a deleted
+    # one, and undoing a delete brings the line item back to the ledger it left
+    __table_args__ = (
+        *(
+            Index(f"ix_lineitem_portfolio_id_{name}", "portfolio_id", *columns)
+            for name, columns in PORTFOLIO_INDEXES.items()
+        ),
+        {"sqlite_autoincrement": True},
+    )
+
     id: Optional[int] = Field(default=None, primary_key=True)
     name: str
     type: str
     status: str
-    amount: str
+    # Stored as integer cents so totals can be summed exactly in SQL
+    amount: int
+    # ISO 4217 code of the currency the amount is in
+    currency: str = Field(
+        default=DEFAULT_CURRENCY,
+        sa_column_kwargs={"server_default": DEFAULT_CURRENCY},
+    )
+    # The portfolio the line item belongs to, each of which is served separately
+    portfolio_id: int = Field(
+        default=DEFAULT_PORTFOLIO,
+        sa_column_kwargs={"server_default": str(DEFAULT_PORTFOLIO)},
+    )
+
+
+def to_cents(amount: Union[str, float, int, Decimal]) -> int:
+    """Converts a dollar amount into integer cents, rounding half up.
+
+    Args:
+        amount (Union[str, float, int, Decimal]): The dollar amount, e.g. "12.34" or 12.34.
+
+    Returns:
+        int: The amount expressed in cents, e.g. 1234.
+    """
+    dollars = Decimal(str(amount)).quantize(Decimal("0.01"), rounding=ROUND_HALF_UP)
+    return int(dollars * 100)
+
+
+def format_cents(cents: int) -> str:
+    """Formats integer cents as a plain two decimal dollar string, e.g. 1234 -> "12.34".
+
+    Args:
+        cents (int): The amount in cents.
+
+    Returns:
+        str: The amount in dollars with two decimal places.
+    """
+    sign = "-" if cents < 0 else ""
+    dollars, remainder = divmod(abs(int(cents)), 100)
+    return f"{sign}{dollars}.{remainder:02d}"
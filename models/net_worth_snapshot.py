@@ -0,0 +1,18 @@
+from datetime import date
+from sqlalchemy import UniqueConstraint
+from sqlmodel import SQLModel, Field
+from typing import Optional
+
+
+class NetWorthSnapshot(SQLModel, table=True):
+    """The total amount of one status and type of line item in a portfolio on a given day."""
+
+    __table_args__ = (UniqueConstraint("taken_on", "portfolio_id", "status", "type"),)
+
+    id: Optional[int] = Field(default=None, primary_key=True)
+    taken_on: date = Field(index=True)
+    portfolio_id: int = Field(index=True)
+    status: str
+    type: str
+    # Stored as integer cents, like LineItem.amount
+    amount: int
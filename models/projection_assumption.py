@@ -0,0 +1,13 @@
+from sqlmodel import SQLModel, Field
+
+
+class ProjectionAssumption(SQLModel, table=True):
+    """
+    How one type of line item is expected to change over time in the net worth
+    projection. Rates are annual fractions, e.g. 0.07 for 7%. For liabilities the
+    growth is the interest charged on the balance.
+    """
+
+    type: str = Field(primary_key=True)
+    growth: float = 0.0
+    volatility: float = 0.0
@@ -0,0 +1,31 @@
+from datetime import date
+from sqlalchemy import Index
+from sqlmodel import SQLModel, Field
+from typing import Optional
+
+# A deposit adds to the balance of a line item, a payment subtracts from it and a
+# valuation sets it, e.g. from a statement or an appraisal
+TRANSACTION_KINDS = ("deposit", "payment", "valuation")
+
+
+class Transaction(SQLModel, table=True):
+    """
+    One entry in the ledger of a line item. Entries are only ever appended, and the
+    line item's amount is kept at the balance they add up to by a trigger, see
+    `db.create_ledger`.
+    """
+
+    # "transaction" is an SQL keyword, so the table is named after what it belongs to
+    __tablename__ = "lineitemtransaction"
+    # Statements and balances as of a day read one line item's entries in date order
+    __table_args__ = (
+        Index("ix_lineitemtransaction_line_item_id_posted_on", "line_item_id", "posted_on"),
+    )
+
+    id: Optional[int] = Field(default=None, primary_key=True)
+    line_item_id: int
+    posted_on: date
+    kind: str
+    # Stored as integer cents, like LineItem.amount
+    amount: int
+    memo: str = ""
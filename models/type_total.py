@@ -0,0 +1,16 @@
+from sqlmodel import SQLModel, Field
+
+
+class TypeTotal(SQLModel, table=True):
+    """
+    The running total of one status, type and currency of line item in a portfolio.
+    Kept current by triggers on the line item table, see `db.create_triggers`.
+    """
+
+    portfolio_id: int = Field(primary_key=True)
+    status: str = Field(primary_key=True)
+    type: str = Field(primary_key=True)
+    currency: str = Field(primary_key=True)
+    # Stored as integer cents of the currency, like LineItem.amount
+    amount: int = 0
+    item_count: int = 0
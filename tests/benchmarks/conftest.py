@@ -0,0 +1,64 @@
+import os
+import pytest
+from database import db
+from database.repository import line_items
+
+pytest.importorskip("pytest_benchmark")
+
+# Row counts the benchmarks run against, e.g. BENCHMARK_SIZES=1000,100000 to skip 1M
+SIZES = [
+    int(size) for size in os.environ.get("BENCHMARK_SIZES", "1000,100000,1000000").split(",")
+]
+TYPES = ["Cash", "Savings", "Brokerage", "Retirement", "Real Estate", "Vehicle", "Loan", "Card"]
+
+
+def pytest_collection_modifyitems(config, items):
+    """Benchmarks are slow to seed, so they only run when asked for with --benchmark-only."""
+    if config.getoption("benchmark_only"):
+        return
+
+    skip = pytest.mark.skip(reason="benchmarks only run with --benchmark-only")
+    for item in items:
+        if "benchmark" in item.fixturenames:
+            item.add_marker(skip)
+
+
+def synthetic_rows(count):
+    """Yields `count` reproducible line items spread over every type and both statuses."""
+    for index in range(count):
+        yield {
+            "name": f"Item {index}",
+            "type": TYPES[index % len(TYPES)],
+            "status": "Liability" if index % 5 == 0 else "Asset",
+            "amount": index * 7_919 % 100_000_000,
+            "currency": "EUR" if index % 10 == 0 else "USD",
+        }
+
+
+@pytest.fixture(scope="session")
+def seeded_files(tmp_path_factory):
+    """Seeds each database size at most once per session, as seeding 1M rows takes a while."""
+    files = {}
+
+    def seeded_file(size):
+        if size not in files:
+            path = str(tmp_path_factory.mktemp("benchmarks") / f"networth_{size}.db")
+            db.configure_database(path)
+            db.initialize_database()
+            db.bulk_upsert_line_items(synthetic_rows(size), batch_size=50_000)
+            db.record_snapshot()
+            files[size] = path
+        return files[size]
+
+    return seeded_file
+
+
+@pytest.fixture(scope="module", params=SIZES, ids=lambda size: f"{size}_rows")
+def seeded_db(request, seeded_files):
+    """Points the db module, and an emptied repository, at a seeded database file."""
+    previous_path = db.sqlite_file_name
+    db.configure_database(seeded_files(request.param))
+    line_items.invalidate()
+    yield db
+    line_items.invalidate()
+    db.configure_database(previous_path)
@@ -0,0 +1,82 @@
+import pytest
+from database.repository import line_items
+
+ITEM = {"name": "Benchmark", "type": "Cash", "status": "Asset", "amount": 12_345}
+
+
+def test_get_all_items(benchmark, seeded_db):
+    benchmark.pedantic(seeded_db.get_all_items, rounds=3)
+
+
+def test_get_dataframe(benchmark, seeded_db):
+    benchmark.pedantic(seeded_db.get_dataframe, rounds=3)
+
+
+def test_repository_load(benchmark, seeded_db):
+    benchmark.pedantic(line_items.load, rounds=3)
+
+
+def test_repository_get_dataframe(benchmark, seeded_db):
+    line_items.load()
+    benchmark.pedantic(line_items.get_dataframe, rounds=3)
+
+
+def test_get_totals(benchmark, seeded_db):
+    benchmark(seeded_db.get_totals)
+
+
+def test_get_type_totals(benchmark, seeded_db):
+    benchmark(seeded_db.get_type_totals)
+
+
+@pytest.mark.parametrize(
+    "page",
+    [
+        {"offset": 0},
+        {"offset": 0, "sort": [("amount", "desc")]},
+        {"offset": 0, "filters": [("name", "contains", "99")]},
+        {"offset": 0, "search": "item 12"},
+        {"offset": 900},
+    ],
+    ids=["first", "sorted", "filtered", "searched", "deep"],
+)
+def test_get_items_page(benchmark, seeded_db, page):
+    benchmark(seeded_db.get_items_page, limit=100, **page)
+
+
+def test_create_line_item(benchmark, seeded_db):
+    created = []
+    benchmark.pedantic(
+        lambda: created.append(seeded_db.create_line_item(**ITEM)["id"]), rounds=100
+    )
+    seeded_db.delete_line_items(created)
+
+
+def test_update_line_item(benchmark, seeded_db):
+    item = seeded_db.create_line_item(**ITEM)
+    amounts = iter(range(10**9))
+    benchmark.pedantic(
+        lambda: seeded_db.update_line_item(**{**ITEM, "id": item["id"], "amount": next(amounts)}),
+        rounds=100,
+    )
+    seeded_db.delete_line_item(item["id"])
+
+
+def test_delete_line_item(benchmark, seeded_db):
+    benchmark.pedantic(
+        seeded_db.delete_line_item,
+        setup=lambda: ((seeded_db.create_line_item(**ITEM)["id"],), {}),
+        rounds=100,
+    )
+
+
+def test_bulk_update_line_items(benchmark, seeded_db):
+    ids = [item["id"] for item in seeded_db.get_items_page(offset=0, limit=1_000)]
+    statuses = iter(["Liability", "Asset"] * 50)
+    benchmark.pedantic(
+        lambda: seeded_db.update_line_items(ids, {"status": next(statuses)}), rounds=10
+    )
+
+
+def test_record_snapshot(benchmark, seeded_db):
+    benchmark(seeded_db.record_snapshot)
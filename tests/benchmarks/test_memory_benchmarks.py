@@ -0,0 +1,50 @@
+import tracemalloc
+# Imported before anything is traced, so the module itself is not counted
+import pandas  # noqa: F401
+from database.repository import line_items
+
+
+def traced(build):
+    """Returns the bytes still allocated by what `build` returned, and the peak while building."""
+    tracemalloc.start()
+    try:
+        built = build()
+        held, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    del built
+    return held, peak
+
+
+def build_dict_reports():
+    """The reporting path before the columns: the cache, its snapshot and a DataFrame."""
+    line_items.invalidate()
+    line_items.load()
+    return line_items.get_dataframe()
+
+
+def test_line_item_columns_memory(benchmark, seeded_db):
+    dicts_held, dicts_peak = traced(build_dict_reports)
+    line_items.invalidate()
+    columns_held, columns_peak = traced(seeded_db.get_line_item_columns)
+
+    benchmark.extra_info.update(
+        dicts_held_bytes=dicts_held,
+        dicts_peak_bytes=dicts_peak,
+        columns_held_bytes=columns_held,
+        columns_peak_bytes=columns_peak,
+    )
+    print(
+        f"\nheld {dicts_held / 2**20:.1f} MB by dictionaries, "
+        f"{columns_held / 2**20:.1f} MB by columns; "
+        f"peak {dicts_peak / 2**20:.1f} MB and {columns_peak / 2**20:.1f} MB"
+    )
+    assert columns_held < dicts_held
+
+    benchmark.pedantic(seeded_db.get_line_item_columns, rounds=3)
+
+
+def test_columns_totals(benchmark, seeded_db):
+    columns = seeded_db.get_line_item_columns()
+    rates = seeded_db.get_fx_rates()
+    benchmark(columns.totals, rates)
@@ -0,0 +1,65 @@
+import asyncio
+import pytest
+from database import projection
+from database.repository import line_items
+
+
+@pytest.fixture(scope="module")
+def page(seeded_db):
+    """Builds the page of the default portfolio from main.py without starting the server."""
+    import main
+
+    page = main.PortfolioPage()
+    page.build()
+    return page
+
+
+@pytest.fixture
+def loaded(seeded_db):
+    """Renders are handed the repository's columns, read before anything is timed."""
+    seeded_db.get_fx_rates()
+    return line_items.columns()
+
+
+def test_refresh_reports(benchmark, page, loaded):
+    benchmark.pedantic(lambda: asyncio.run(page.refresh_reports()), rounds=3)
+
+
+def test_net_breakdown_cards(benchmark, page, seeded_db, loaded):
+    benchmark(page.net_breakdown_cards.refresh, loaded.totals(seeded_db.get_fx_rates()))
+
+
+def test_update_composition_plot(benchmark, page, loaded):
+    def render():
+        # A new version makes the columns be read again and the slices be recomputed
+        line_items.invalidate()
+        asyncio.run(page.update_composition_plot(line_items.columns()))
+
+    benchmark.pedantic(render, rounds=3)
+
+
+def test_net_history_plot(benchmark, page, loaded):
+    import main
+
+    history = main.load_history(page.portfolio_id)
+    benchmark(page.net_history_plot.refresh, history)
+
+
+def test_net_rollup_plot(benchmark, page, seeded_db, loaded):
+    type_totals = seeded_db.get_type_totals()
+    benchmark(page.net_rollup_plot.refresh, type_totals)
+
+
+def test_net_projection_plot(benchmark, page, seeded_db, loaded):
+    type_totals = seeded_db.get_type_totals()
+    assumptions = {
+        type_total["type"]: {"growth": 0.05, "volatility": 0.1} for type_total in type_totals
+    }
+
+    def render():
+        projection._simulate.cache_clear()
+        page.net_projection_plot.refresh(
+            projection.project_net_worth(type_totals, assumptions)
+        )
+
+    benchmark.pedantic(render, rounds=3)
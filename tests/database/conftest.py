@@ -0,0 +1,12 @@
+import pytest
+from database import db
+
+
+@pytest.fixture
+def test_db(tmp_path):
+    """Points the db module at an empty SQLite file for the duration of a test."""
+    previous_path = db.sqlite_file_name
+    db.configure_database(str(tmp_path / "networth.db"))
+    db.initialize_database()
+    yield db
+    db.configure_database(previous_path)
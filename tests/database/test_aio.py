@@ -0,0 +1,24 @@
+import asyncio
+import threading
+from database import aio
+
+
+def test_proxy_runs_calls_off_the_event_loop_thread(test_db):
+    async def create_and_total():
+        calling_thread = threading.get_ident()
+        item = await aio.db.create_line_item(
+            name="Checking", type="Cash", status="Asset", amount=100
+        )
+        worker_thread = await aio.run(threading.get_ident)
+        totals = await aio.db.get_totals()
+        return item, totals, calling_thread != worker_thread
+
+    item, totals, off_loop = asyncio.run(create_and_total())
+
+    assert item["name"] == "Checking"
+    assert totals["assets"] == 100
+    assert off_loop
+
+
+def test_proxy_passes_through_attributes():
+    assert aio.db.MAX_IDS_PER_STATEMENT == aio.sync_db.MAX_IDS_PER_STATEMENT
@@ -0,0 +1,182 @@
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+import api
+from database import repository
+from database.repository import line_items
+
+
+@pytest.fixture
+def client(test_db):
+    # The shared repository may hold items of another test's database
+    line_items.invalidate()
+    app = FastAPI()
+    app.include_router(api.router)
+    with TestClient(app) as client:
+        yield client
+    line_items.invalidate()
+
+
+def test_crud_and_not_found(client):
+    created = client.post(
+        "/api/line_items",
+        json={"name": "Checking", "type": "Cash", "status": "Asset", "amount": 10_000},
+    )
+    assert created.status_code == 201
+    item = created.json()
+    assert item["currency"] == "USD"
+
+    updated = client.put(
+        f"/api/line_items/{item['id']}",
+        json={"name": "Checking", "type": "Cash", "status": "Asset", "amount": 500},
+    )
+    assert updated.json()["amount"] == 500
+    assert client.get(f"/api/line_items/{item['id']}").json()["amount"] == 500
+    assert client.get("/api/totals").json()["net_worth"] == 500
+
+    assert client.delete(f"/api/line_items/{item['id']}").status_code == 200
+    assert client.get(f"/api/line_items/{item['id']}").status_code == 404
+    assert client.delete(f"/api/line_items/{item['id']}").status_code == 404
+    assert client.post(
+        "/api/line_items",
+        json={"name": "Loan", "type": "Debt", "status": "Owed", "amount": 1},
+    ).status_code == 422
+
+
+def test_pagination_and_bulk_writes(client):
+    rows = [
+        {"name": f"Item {i}", "type": "Cash", "status": "Asset", "amount": i}
+        for i in range(5)
+    ]
+    assert client.post("/api/line_items/bulk_upsert", json=rows).json() == {
+        "inserted": 5,
+        "updated": 0,
+    }
+
+    first = client.get("/api/line_items", params={"limit": 3, "sort": "-amount"}).json()
+    assert [item["amount"] for item in first["items"]] == [4, 3, 2]
+    assert first["next_offset"] == 3
+    last = client.get("/api/line_items", params={"offset": 3, "limit": 3, "sort": "-amount"})
+    assert last.json()["next_offset"] is None
+    assert client.get("/api/line_items", params={"sort": "-color"}).status_code == 400
+
+    ids = [item["id"] for item in first["items"]]
+    update = client.post(
+        "/api/line_items/bulk_update", json={"ids": ids, "values": {"type": "Savings"}}
+    )
+    assert update.json() == {"updated": 3}
+    assert client.post("/api/line_items/bulk_delete", json={"ids": ids[:2]}).json() == {
+        "deleted": 2
+    }
+
+    remaining = client.get("/api/line_items", params={"type": "Savings"}).json()
+    assert [item["id"] for item in remaining["items"]] == ids[2:]
+
+
+def test_bulk_update_rejects_bad_values_before_writing(client):
+    item = client.post(
+        "/api/line_items",
+        json={"name": "Checking", "type": "Cash", "status": "Asset", "amount": 100},
+    ).json()
+
+    for values in (
+        {"amount": "abc"},
+        {"status": "Foo"},
+        {"currency": "XYZ"},
+        {"color": "red"},
+        {"name": None},
+        {"type": "Savings", "amount": "abc"},
+    ):
+        update = client.post(
+            "/api/line_items/bulk_update", json={"ids": [item["id"]], "values": values}
+        )
+        assert update.status_code == 400, values
+
+    assert client.get(f"/api/line_items/{item['id']}").json() == item
+    assert client.get("/api/totals").json()["net_worth"] == 100
+    assert client.post(
+        "/api/line_items/bulk_update",
+        json={"ids": [item["id"]], "values": {"amount": 250, "currency": "USD"}},
+    ).json() == {"updated": 1}
+    assert client.get("/api/totals").json()["net_worth"] == 250
+
+
+def test_etag_answers_304_until_a_write(client):
+    first = client.get("/api/totals")
+    etag = first.headers["etag"]
+
+    cached = client.get("/api/totals", headers={"If-None-Match": etag})
+    assert cached.status_code == 304
+    assert cached.content == b""
+
+    client.post(
+        "/api/line_items",
+        json={"name": "Checking", "type": "Cash", "status": "Asset", "amount": 1},
+    )
+    fresh = client.get("/api/totals", headers={"If-None-Match": etag})
+    assert fresh.status_code == 200
+    assert fresh.headers["etag"] != etag
+
+
+def test_history_rebuilds_past_line_items(client):
+    before = client.get("/api/history/line_items", params={"at": "2000-01-01T00:00"})
+    assert before.status_code == 404
+
+    client.post(
+        "/api/line_items",
+        json={"name": "Checking", "type": "Cash", "status": "Asset", "amount": 1},
+    )
+    now = client.get("/api/history/line_items", params={"at": "2999-01-01T00:00"})
+    assert [item["name"] for item in now.json()] == ["Checking"]
+
+
+def test_portfolios_are_served_separately(client, monkeypatch):
+    repository.portfolio(2).invalidate()
+    changed = []
+    monkeypatch.setattr(api, "change_handlers", [changed.append])
+
+    client.post(
+        "/api/line_items",
+        params={"portfolio_id": 2},
+        json={"name": "Checking", "type": "Cash", "status": "Asset", "amount": 1},
+    )
+    assert changed == [2]
+    assert client.get("/api/totals", params={"portfolio_id": 2}).json()["net_worth"] == 1
+    assert client.get("/api/totals").json()["net_worth"] == 0
+    assert client.get("/api/line_items").json()["items"] == []
+    assert (
+        client.get("/api/totals").headers["etag"]
+        != client.get("/api/totals", params={"portfolio_id": 2}).headers["etag"]
+    )
+    repository.portfolio(2).invalidate()
+
+
+def test_transactions_update_balances_and_statements(client):
+    item = client.post(
+        "/api/line_items",
+        json={"name": "Checking", "type": "Cash", "status": "Asset", "amount": 1_000},
+    ).json()
+
+    posted = client.post(
+        f"/api/line_items/{item['id']}/transactions",
+        json={"posted_on": "2024-01-10", "kind": "deposit", "amount": 250},
+    )
+    assert posted.status_code == 201
+    assert posted.json()["amount"] == 1_250
+    assert client.get(f"/api/line_items/{item['id']}").json()["amount"] == 1_250
+    assert client.get(
+        f"/api/line_items/{item['id']}/balance", params={"on": "2024-01-09"}
+    ).json()["balance"] == 1_000
+
+    statement = client.get(
+        f"/api/line_items/{item['id']}/statement",
+        params={"start": "2024-01-01", "end": "2024-01-31"},
+    ).json()
+    assert statement["entries"][0]["balance"] == 1_250
+    assert client.post(
+        f"/api/line_items/{item['id']}/transactions",
+        json={"posted_on": "2024-01-10", "kind": "transfer", "amount": 1},
+    ).status_code == 422
+    assert client.get(
+        "/api/line_items/999/statement", params={"start": "2024-01-01", "end": "2024-01-31"}
+    ).status_code == 404
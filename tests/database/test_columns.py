@@ -0,0 +1,40 @@
+from database.repository import LineItemRepository
+
+
+def test_columns_encode_line_items_compactly(test_db):
+    test_db.create_line_item(name="Checking", type="Cash", status="Asset", amount=1_000)
+    test_db.create_line_item(
+        name="Checking", type="Cash", status="Asset", amount=500, currency="EUR"
+    )
+    test_db.create_line_item(name="Loan", type="Debt", status="Liability", amount=-250)
+    test_db.create_line_item(name="Other", type="Cash", status="Asset", amount=9, portfolio_id=2)
+
+    columns = test_db.get_line_item_columns()
+
+    assert len(columns) == 3
+    assert columns.amounts.dtype == "int64"
+    assert columns.codes["status"].dtype == "uint8"
+    assert columns.values["name"] == ("Checking", "Loan")
+    assert columns.codes["name"].tolist() == [0, 0, 1]
+
+    rates = {"EUR": 1.1}
+    names, sums = columns.sums_by("name", rates)
+    assert dict(zip(names, sums.tolist())) == {"Checking": 1_550, "Loan": -250}
+    assert columns.totals(rates) == {"assets": 1_550, "liabilities": -250, "net_worth": 1_800}
+
+
+def test_repository_columns_are_read_again_after_a_mutation(test_db):
+    repository = LineItemRepository()
+    repository.create_line_item(name="Checking", type="Cash", status="Asset", amount=100)
+    repository.create_line_item(name="Loan", type="Debt", status="Liability", amount=30)
+
+    first = repository.columns()
+    assert repository.columns() is first
+    assert first.totals({}) == repository.get_totals()
+
+    repository.delete_line_items([1])
+    assert repository.columns() is not first
+    assert repository.columns().totals({}) == repository.get_totals()
+
+    assert len(test_db.get_line_item_columns(portfolio_id=3)) == 0
+    assert test_db.get_line_item_columns(portfolio_id=3).totals({})["net_worth"] == 0
@@ -0,0 +1,309 @@
+from datetime import date
+import pytest
+from sqlalchemy import text
+from models.line_item import format_cents, to_cents
+
+
+def test_to_cents_rounds_half_up():
+    assert to_cents("12.345") == 1235
+    assert to_cents(0.1) == 10
+    assert to_cents(7) == 700
+    assert format_cents(1235) == "12.35"
+    assert format_cents(-5) == "-0.05"
+
+
+def test_get_totals(test_db):
+    assert test_db.get_totals() == {"assets": 0, "liabilities": 0, "net_worth": 0}
+
+    test_db.create_line_item(name="Checking", type="Cash", status="Asset", amount=150_025)
+    test_db.create_line_item(name="Car", type="Vehicle", status="Asset", amount=1_000_000)
+    test_db.create_line_item(name="Loan", type="Debt", status="Liability", amount=400_050)
+
+    assert test_db.get_totals() == {
+        "assets": 1_150_025,
+        "liabilities": 400_050,
+        "net_worth": 749_975,
+    }
+
+
+def test_migrate_text_amounts_to_cents(test_db):
+    with test_db.engine.begin() as connection:
+        connection.execute(text("DROP TABLE lineitem"))
+        connection.execute(
+            text(
+                "CREATE TABLE lineitem (id INTEGER PRIMARY KEY, name VARCHAR, "
+                "type VARCHAR, status VARCHAR, amount VARCHAR)"
+            )
+        )
+        connection.execute(
+            text(
+                "INSERT INTO lineitem (name, type, status, amount) VALUES "
+                "('Checking', 'Cash', 'Asset', '1500.25'), "
+                "('Loan', 'Debt', 'Liability', '400.10')"
+            )
+        )
+
+    test_db.migrate_database()
+    test_db.migrate_database()
+
+    items = {item["name"]: item["amount"] for item in test_db.get_all_items()}
+    assert items == {"Checking": 150_025, "Loan": 40_010}
+    assert test_db.get_totals()["net_worth"] == 110_015
+
+
+def test_get_items_page_sorts_filters_and_pages(test_db):
+    for index in range(10):
+        test_db.create_line_item(
+            name=f"Item {index}",
+            type="Cash" if index % 2 else "Debt",
+            status="Asset",
+            amount=index * 100,
+        )
+
+    page = test_db.get_items_page(
+        offset=1,
+        limit=2,
+        sort=[("amount", "desc")],
+        filters=[("type", "equals", "Cash")],
+    )
+    assert [item["name"] for item in page] == ["Item 7", "Item 5"]
+
+    page = test_db.get_items_page(offset=0, limit=50, filters=[("name", "contains", "%")])
+    assert page == []
+
+    with pytest.raises(ValueError):
+        test_db.get_items_page(offset=0, limit=10, sort=[("id; DROP TABLE", "asc")])
+
+
+def test_bulk_update_and_delete_line_items(test_db, monkeypatch):
+    monkeypatch.setattr(test_db, "MAX_IDS_PER_STATEMENT", 3)
+    ids = [
+        test_db.create_line_item(name=f"Item {index}", type="Cash", status="Asset", amount=1)["id"]
+        for index in range(8)
+    ]
+
+    assert test_db.update_line_items(ids[:7], {"amount": 5, "type": "Savings"}) == 7
+    assert test_db.delete_line_items(ids[1:]) == 7
+
+    assert test_db.get_all_items() == [
+        {
+            "id": ids[0],
+            "name": "Item 0",
+            "type": "Savings",
+            "status": "Asset",
+            "amount": 5,
+            "currency": "USD",
+            "portfolio_id": 1,
+        }
+    ]
+
+    with pytest.raises(ValueError):
+        test_db.update_line_items(ids, {"id": 1})
+
+
+def test_connections_use_wal_and_readers_do_not_block(test_db):
+    test_db.create_line_item(name="Checking", type="Cash", status="Asset", amount=100)
+
+    with test_db.engine.connect() as connection:
+        assert connection.execute(text("PRAGMA journal_mode")).scalar() == "wal"
+        assert connection.execute(text("PRAGMA synchronous")).scalar() == 1
+
+    with test_db.engine.connect() as writer:
+        transaction = writer.begin()
+        writer.execute(text("UPDATE lineitem SET amount = 999"))
+
+        # A reader sees the last committed state while the write is still open
+        assert test_db.get_totals()["assets"] == 100
+
+        transaction.commit()
+
+    assert test_db.get_totals()["assets"] == 999
+
+
+def test_type_totals_follow_every_change(test_db):
+    checking = test_db.create_line_item(name="Checking", type="Cash", status="Asset", amount=100)
+    savings = test_db.create_line_item(name="Savings", type="Cash", status="Asset", amount=200)
+    test_db.create_line_item(name="Card", type="Credit", status="Liability", amount=50)
+
+    test_db.update_line_item(
+        id=savings["id"], name="Savings", status="Asset", type="Savings", amount=250
+    )
+    test_db.update_line_items([checking["id"]], {"amount": 120})
+    test_db.bulk_upsert_line_items(
+        [{"name": "Car", "type": "Vehicle", "status": "Asset", "amount": 900}]
+    )
+    test_db.delete_line_items([savings["id"]])
+
+    assert test_db.get_type_totals() == [
+        {"status": "Asset", "type": "Cash", "amount": 120, "item_count": 1},
+        {"status": "Asset", "type": "Vehicle", "amount": 900, "item_count": 1},
+        {"status": "Liability", "type": "Credit", "amount": 50, "item_count": 1},
+    ]
+    assert test_db.get_totals() == {"assets": 1020, "liabilities": 50, "net_worth": 970}
+
+
+def test_missing_triggers_rebuild_type_totals(test_db):
+    test_db.create_line_item(name="Checking", type="Cash", status="Asset", amount=100)
+
+    with test_db.engine.begin() as connection:
+        connection.execute(text("DROP TRIGGER lineitem_type_total_insert"))
+    test_db.create_line_item(name="Savings", type="Cash", status="Asset", amount=200)
+
+    test_db.create_triggers()
+
+    assert test_db.get_type_totals() == [
+        {"status": "Asset", "type": "Cash", "amount": 300, "item_count": 2}
+    ]
+
+
+def test_search_matches_prefixes_and_ranks_names_first(test_db):
+    account = test_db.create_line_item(name="Savings", type="Checking", status="Asset", amount=1)
+    checking = test_db.create_line_item(name="Chase Checking", type="Cash", status="Asset", amount=2)
+    loan = test_db.create_line_item(name="Car Loan", type="Debt", status="Liability", amount=3)
+
+    def search(text, **kwargs):
+        return [item["id"] for item in test_db.get_items_page(0, 10, search=text, **kwargs)]
+
+    assert search("chec") == [checking["id"], account["id"]]
+    assert search("car lo") == [loan["id"]]
+    assert search("chec", sort=[("amount", "asc")]) == [account["id"], checking["id"]]
+    assert search('"ch*') == [checking["id"], account["id"]]
+
+    test_db.update_line_item(
+        id=loan["id"], name="Chevy Loan", status="Liability", type="Debt", amount=3
+    )
+    test_db.delete_line_item(account["id"])
+
+    assert search("che") == [checking["id"], loan["id"]]
+    assert search("car") == []
+
+
+def test_totals_are_converted_into_the_reporting_currency(test_db, tmp_path):
+    rates_file = tmp_path / "fx_rates.csv"
+    rates_file.write_text("Currency,Rate\neur,1.1\nGBP,1.25\n")
+    assert test_db.load_fx_rates(str(rates_file)) == 3
+
+    test_db.create_line_item(name="Checking", type="Cash", status="Asset", amount=100)
+    euros = test_db.create_line_item(
+        name="Konto", type="Cash", status="Asset", amount=1_000, currency="EUR"
+    )
+    test_db.create_line_item(
+        name="Card", type="Credit", status="Liability", amount=200, currency="GBP"
+    )
+
+    assert test_db.get_totals() == {"assets": 1_200, "liabilities": 250, "net_worth": 950}
+    assert test_db.get_type_totals()[0] == {
+        "status": "Asset",
+        "type": "Cash",
+        "amount": 1_200,
+        "item_count": 2,
+    }
+    assert list(test_db.get_dataframe()["amount"]) == [1.0, 11.0, 2.5]
+
+    test_db.update_line_items([euros["id"]], {"currency": "USD"})
+    assert test_db.get_totals()["assets"] == 1_100
+
+    with pytest.raises(ValueError):
+        rates_file.write_text("currency,rate\nEUR,abc\n")
+        test_db.load_fx_rates(str(rates_file))
+
+
+def test_currencies_without_a_rate_are_left_out_of_the_totals(test_db, tmp_path):
+    rates_file = tmp_path / "fx_rates.csv"
+    rates_file.write_text("currency,rate\nEUR,1.1\n")
+    test_db.load_fx_rates(str(rates_file))
+
+    test_db.create_line_item(name="Checking", type="Cash", status="Asset", amount=100)
+    test_db.create_line_item(
+        name="Konto", type="Cash", status="Asset", amount=1_000, currency="EUR"
+    )
+    test_db.create_line_item(
+        name="Yen", type="Cash", status="Asset", amount=5_000, currency="JPY"
+    )
+
+    assert test_db.get_unconverted_currencies() == ["JPY"]
+    assert test_db.get_totals()["assets"] == 1_200
+    assert test_db.get_type_totals()[0]["amount"] == 1_200
+    assert sorted(test_db.get_dataframe()["amount"]) == [0.0, 1.0, 11.0]
+
+    # A missing file keeps the rates stored before
+    assert test_db.load_fx_rates(str(tmp_path / "missing.csv")) == 2
+    assert test_db.get_fx_rates() == {"USD": 1.0, "EUR": 1.1}
+    assert test_db.get_totals()["assets"] == 1_200
+
+
+def test_migration_adds_currencies_and_rebuilds_type_totals(test_db):
+    test_db.create_line_item(name="Checking", type="Cash", status="Asset", amount=100)
+
+    with test_db.engine.begin() as connection:
+        for trigger in test_db.TYPE_TOTAL_TRIGGERS:
+            connection.execute(text(f"DROP TRIGGER {trigger}"))
+        connection.execute(text("DROP TABLE typetotal"))
+        connection.execute(
+            text(
+                "CREATE TABLE typetotal (status VARCHAR, type VARCHAR, amount INTEGER, "
+                "item_count INTEGER, PRIMARY KEY (status, type))"
+            )
+        )
+
+    test_db.migrate_database()
+    test_db.create_line_item(
+        name="Konto", type="Cash", status="Asset", amount=50, currency="EUR"
+    )
+
+    # EUR has no rate, so it is counted in the item count but left out of the amount
+    assert test_db.get_type_totals() == [
+        {"status": "Asset", "type": "Cash", "amount": 100, "item_count": 2}
+    ]
+
+
+def test_portfolios_are_isolated(test_db):
+    checking = test_db.create_line_item(
+        name="Checking", type="Cash", status="Asset", amount=100
+    )
+    test_db.create_line_item(
+        name="Checking", type="Cash", status="Asset", amount=40, portfolio_id=2
+    )
+    test_db.bulk_upsert_line_items(
+        [{"name": "Checking", "type": "Cash", "status": "Asset", "amount": 70}],
+        portfolio_id=2,
+    )
+
+    assert test_db.get_totals()["assets"] == 100
+    assert test_db.get_totals(portfolio_id=2)["assets"] == 70
+    assert [item["amount"] for item in test_db.get_items_page(0, 10, portfolio_id=2)] == [70]
+    assert test_db.get_type_totals(portfolio_id=2)[0]["item_count"] == 1
+    with pytest.raises(KeyError):
+        test_db.get_line_item(checking["id"], portfolio_id=2)
+
+    assert test_db.delete_line_items([checking["id"]], portfolio_id=2) == 0
+    test_db.undo(portfolio_id=2)
+    assert test_db.get_totals(portfolio_id=2)["assets"] == 40
+    assert test_db.get_totals()["assets"] == 100
+
+
+def test_migration_moves_snapshots_into_the_default_portfolio(test_db):
+    with test_db.engine.begin() as connection:
+        connection.execute(text("DROP TABLE networthsnapshot"))
+        connection.execute(
+            text(
+                "CREATE TABLE networthsnapshot (id INTEGER PRIMARY KEY, taken_on DATE, "
+                "status VARCHAR, type VARCHAR, amount INTEGER, "
+                "UNIQUE (taken_on, status, type))"
+            )
+        )
+        connection.execute(
+            text(
+                "INSERT INTO networthsnapshot (taken_on, status, type, amount) "
+                "VALUES ('2024-01-31', 'Asset', 'Cash', 100)"
+            )
+        )
+
+    test_db.migrate_database()
+    test_db.migrate_database()
+
+    day = date(2024, 1, 31)
+    assert test_db.get_history(day, day) == [
+        {"taken_on": day, "assets": 100, "liabilities": 0, "net_worth": 100}
+    ]
+    assert test_db.get_history(day, day, portfolio_id=2) == []
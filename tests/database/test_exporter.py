@@ -0,0 +1,60 @@
+import csv
+import gzip
+import sqlite3
+from datetime import date
+import pytest
+from database import exporter
+
+
+def test_backup_copies_the_open_database(test_db, tmp_path):
+    for index in range(100):
+        test_db.create_line_item(
+            name=f"Item {index}", type="Cash", status="Asset", amount=index
+        )
+    steps = []
+
+    target = tmp_path / "backup.db"
+    test_db.backup_database(
+        str(target), pages_per_step=1, progress=lambda *step: steps.append(step)
+    )
+
+    assert len(steps) > 1
+    assert not (tmp_path / "backup.db.partial").exists()
+    with sqlite3.connect(target) as backup:
+        assert backup.execute("SELECT COUNT(*), SUM(amount) FROM lineitem").fetchone() == (
+            100,
+            4950,
+        )
+
+
+def test_export_falls_back_to_compressed_csv(test_db, tmp_path, monkeypatch):
+    test_db.create_line_item(name="Checking", type="Cash", status="Asset", amount=150)
+    test_db.create_line_item(
+        name="Checking", type="Cash", status="Asset", amount=1, portfolio_id=2
+    )
+    test_db.record_snapshot(date(2024, 1, 31))
+    monkeypatch.setattr(exporter.importlib.util, "find_spec", lambda name: None)
+
+    items_path, history_path = exporter.export_portfolio(str(tmp_path / "exports"))
+
+    with gzip.open(items_path, "rt", newline="") as file:
+        assert list(csv.reader(file)) == [
+            ["id", "name", "type", "status", "amount", "currency"],
+            ["1", "Checking", "Cash", "Asset", "150", "USD"],
+        ]
+    with gzip.open(history_path, "rt", newline="") as file:
+        assert list(csv.reader(file))[1] == ["2024-01-31", "Asset", "Cash", "150"]
+
+
+def test_export_writes_parquet_in_batches(test_db, tmp_path):
+    pq = pytest.importorskip("pyarrow.parquet")
+    for index in range(5):
+        test_db.create_line_item(
+            name=f"Item {index}", type="Cash", status="Asset", amount=index
+        )
+
+    items_path, _ = exporter.export_portfolio(str(tmp_path), batch_size=2)
+
+    parquet = pq.ParquetFile(items_path)
+    assert parquet.metadata.num_row_groups == 3
+    assert parquet.read().column("amount").to_pylist() == [0, 1, 2, 3, 4]
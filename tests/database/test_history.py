@@ -0,0 +1,86 @@
+from datetime import date, timedelta
+from models.net_worth_snapshot import NetWorthSnapshot
+
+
+def test_record_snapshot_replaces_same_day(test_db):
+    day = date(2024, 1, 31)
+    item = test_db.create_line_item(name="Checking", type="Cash", status="Asset", amount=100)
+    test_db.record_snapshot(day)
+
+    test_db.update_line_item(
+        id=item["id"], name="Checking", status="Asset", type="Cash", amount=250
+    )
+    test_db.create_line_item(name="Card", type="Credit", status="Liability", amount=50)
+    test_db.record_snapshot(day)
+
+    assert test_db.get_history(day, day) == [
+        {"taken_on": day, "assets": 250, "liabilities": 50, "net_worth": 200}
+    ]
+
+
+def test_history_is_downsampled_by_age(test_db):
+    end = date(2024, 6, 30)
+    start = end - timedelta(days=1000)
+
+    with test_db.engine.begin() as connection:
+        connection.execute(
+            NetWorthSnapshot.__table__.insert(),
+            [
+                {
+                    "taken_on": day,
+                    "portfolio_id": 1,
+                    "status": "Asset",
+                    "type": "Cash",
+                    "amount": day.toordinal(),
+                }
+                for day in (start + timedelta(days=offset) for offset in range(1001))
+            ],
+        )
+
+    history = test_db.get_history(start, end, daily_days=30, weekly_days=365)
+    days = [point["taken_on"] for point in history]
+
+    assert days == sorted(days)
+    assert days[-1] == end
+    assert days[-30:] == [end - timedelta(days=offset) for offset in range(29, -1, -1)]
+    # ~335 days of weeks and ~635 days of months instead of 1001 points
+    assert len(history) < 30 + 50 + 23
+    assert all(point["assets"] == point["taken_on"].toordinal() for point in history)
+
+
+def test_record_snapshot_of_one_portfolio_keeps_the_others(test_db):
+    day = date(2024, 1, 31)
+    test_db.create_line_item(name="Checking", type="Cash", status="Asset", amount=100)
+    test_db.create_line_item(
+        name="Checking", type="Cash", status="Asset", amount=10, portfolio_id=2
+    )
+    test_db.record_snapshot(day)
+
+    test_db.create_line_item(name="Savings", type="Cash", status="Asset", amount=5)
+    test_db.create_line_item(
+        name="Savings", type="Cash", status="Asset", amount=1, portfolio_id=2
+    )
+    test_db.record_snapshot(day, portfolio_id=2)
+
+    assert test_db.get_history(day, day)[0]["assets"] == 100
+    assert test_db.get_history(day, day, portfolio_id=2)[0]["assets"] == 11
+
+
+def test_history_drops_to_zero_once_everything_is_deleted(test_db):
+    yesterday, today = date(2024, 1, 30), date(2024, 1, 31)
+    item = test_db.create_line_item(name="Checking", type="Cash", status="Asset", amount=100)
+    test_db.create_line_item(
+        name="Checking", type="Cash", status="Asset", amount=10, portfolio_id=2
+    )
+    test_db.record_snapshot(yesterday)
+
+    test_db.delete_line_item(item["id"])
+    test_db.record_snapshot(today)
+    test_db.record_snapshot(today, portfolio_id=3)
+
+    assert test_db.get_history(yesterday, today) == [
+        {"taken_on": yesterday, "assets": 100, "liabilities": 0, "net_worth": 100},
+        {"taken_on": today, "assets": 0, "liabilities": 0, "net_worth": 0},
+    ]
+    assert test_db.get_history(today, today, portfolio_id=2)[0]["net_worth"] == 10
+    assert test_db.get_history(today, today, portfolio_id=3)[0]["net_worth"] == 0
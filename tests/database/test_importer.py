@@ -0,0 +1,78 @@
+import io
+from database import importer
+
+OFX = """OFXHEADER:100
+DATA:OFXSGML
+
+<OFX>
+<SIGNONMSGSRSV1><SONRS><FI><ORG>Big Bank<FID>123</FI></SONRS></SIGNONMSGSRSV1>
+<BANKMSGSRSV1><STMTTRNRS><STMTRS>
+<CURDEF>USD
+<BANKACCTFROM><BANKID>1<ACCTID>000123456789<ACCTTYPE>CHECKING</BANKACCTFROM>
+<LEDGERBAL><BALAMT>1520.35<DTASOF>20240101</LEDGERBAL>
+<AVAILBAL><BALAMT>1400.00<DTASOF>20240101</AVAILBAL>
+</STMTRS></STMTTRNRS></BANKMSGSRSV1>
+<CREDITCARDMSGSRSV1><CCSTMTTRNRS><CCSTMTRS>
+<CCACCTFROM><ACCTID>4111222233334444</CCACCTFROM>
+<LEDGERBAL><BALAMT>-310.20<DTASOF>20240101</LEDGERBAL>
+</CCSTMTRS></CCSTMTTRNRS></CREDITCARDMSGSRSV1>
+</OFX>
+"""
+
+
+def test_csv_import_upserts_and_rejects(test_db):
+    test_db.create_line_item(name="Checking", type="Cash", status="Asset", amount=100)
+
+    csv_file = io.StringIO(
+        "Name,Type,Status,Amount\n"
+        "Checking,Cash,Asset,\"$1,000.50\"\n"
+        "Mortgage,Loan,Liability,250000\n"
+        "Broken,Cash,Maybe,1\n"
+        "Bad Amount,Cash,Asset,lots\n"
+        "Mortgage,Loan,Liability,249000\n"
+    )
+    result = importer.import_line_items(csv_file, "items.csv")
+
+    assert result["inserted"] == 1
+    assert result["updated"] == 1
+    assert result["rejected"] == 2
+    assert [error.split(":")[0] for error in result["errors"]] == ["Row 3", "Row 4"]
+
+    items = {item["name"]: item["amount"] for item in test_db.get_all_items()}
+    assert items == {"Checking": 100_050, "Mortgage": 24_900_000}
+
+
+def test_csv_import_batches(test_db):
+    rows = "".join(f"Item {index},Cash,Asset,1\n" for index in range(12_345))
+    result = importer.import_line_items(
+        io.StringIO("name,type,status,amount\n" + rows), "items.csv"
+    )
+
+    assert result["inserted"] == 12_345
+    assert test_db.get_totals()["assets"] == 1_234_500
+
+
+def test_csv_import_reads_currencies(test_db):
+    csv_file = io.StringIO(
+        "name,type,status,amount,currency\n"
+        "Konto,Cash,Asset,10,eur\n"
+        "Checking,Cash,Asset,5,\n"
+        "Odd,Cash,Asset,1,EURO\n"
+    )
+    result = importer.import_line_items(csv_file, "items.csv")
+
+    assert result["rejected"] == 1
+    currencies = {item["name"]: item["currency"] for item in test_db.get_all_items()}
+    assert currencies == {"Konto": "EUR", "Checking": "USD"}
+
+
+def test_ofx_import_reads_statement_balances(test_db, monkeypatch):
+    monkeypatch.setattr(importer, "CHUNK_SIZE", 7)
+    result = importer.import_line_items(io.StringIO(OFX), "export.QFX")
+
+    assert result["inserted"] == 2
+    items = {item["name"]: item for item in test_db.get_all_items()}
+    assert items["Big Bank Checking ...6789"]["amount"] == 152_035
+    assert items["Big Bank Checking ...6789"]["status"] == "Asset"
+    assert items["Big Bank Credit Card ...4444"]["amount"] == 31_020
+    assert items["Big Bank Credit Card ...4444"]["status"] == "Liability"
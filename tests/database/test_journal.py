@@ -0,0 +1,47 @@
+from datetime import datetime
+
+
+def test_undo_and_redo_walk_back_and_forth(test_db):
+    checking = test_db.create_line_item(name="Checking", type="Cash", status="Asset", amount=100)
+    loan = test_db.create_line_item(name="Loan", type="Debt", status="Liability", amount=50)
+    test_db.update_line_item(
+        id=checking["id"], name="Checking", type="Cash", status="Asset", amount=300
+    )
+    test_db.delete_line_items([checking["id"], loan["id"]])
+    assert test_db.get_all_items() == []
+
+    assert test_db.undo() == {
+        checking["id"]: {**checking, "amount": 300},
+        loan["id"]: loan,
+    }
+    assert test_db.undo() == {checking["id"]: checking}
+    assert test_db.get_totals()["net_worth"] == 50
+
+    assert test_db.redo() == {checking["id"]: {**checking, "amount": 300}}
+    assert test_db.get_line_item(checking["id"])["amount"] == 300
+
+    # A new edit makes the remaining undo impossible to redo
+    test_db.update_line_items([loan["id"]], {"amount": 75})
+    assert test_db.redo() is None
+    test_db.undo()
+    test_db.undo()
+    test_db.undo()
+    test_db.undo()
+    assert test_db.undo() is None
+    assert test_db.get_all_items() == []
+
+
+def test_items_are_rebuilt_at_past_moments(test_db):
+    checking = test_db.create_line_item(name="Checking", type="Cash", status="Asset", amount=100)
+    created = datetime.now()
+    test_db.bulk_upsert_line_items(
+        [{"name": "Checking", "type": "Cash", "status": "Asset", "amount": 200}]
+    )
+    assert test_db.record_checkpoint(min_changes=1)
+    assert not test_db.record_checkpoint(min_changes=1)
+    updated = datetime.now()
+    test_db.delete_line_item(checking["id"])
+
+    assert test_db.get_items_at(created) == [checking]
+    assert test_db.get_items_at(updated) == [{**checking, "amount": 200}]
+    assert test_db.get_items_at(datetime.now()) == []
@@ -0,0 +1,154 @@
+from datetime import date
+import pytest
+from sqlalchemy import text
+
+
+def test_postings_keep_the_amount_at_the_balance(test_db):
+    checking = test_db.create_line_item(name="Checking", type="Cash", status="Asset", amount=1_000)
+
+    test_db.add_transaction(checking["id"], date(2024, 1, 10), "deposit", 500)
+    test_db.add_transaction(checking["id"], date(2024, 2, 1), "payment", 200)
+    # A back-dated entry shifts every balance after it
+    item = test_db.add_transaction(checking["id"], date(2024, 1, 5), "deposit", 100)
+    assert item["amount"] == 1_400
+    assert test_db.get_totals()["net_worth"] == 1_400
+
+    # An entry before the latest valuation does not change the balance
+    test_db.add_transaction(checking["id"], date(2024, 3, 1), "valuation", 5_000)
+    item = test_db.add_transaction(checking["id"], date(2024, 2, 15), "payment", 300)
+    assert item["amount"] == 5_000
+    item = test_db.add_transaction(checking["id"], date(2024, 3, 2), "payment", 1)
+    assert item["amount"] == 4_999
+
+    assert test_db.get_balance_at(checking["id"], date(2023, 12, 31)) == 1_000
+    assert test_db.get_balance_at(checking["id"], date(2024, 1, 31)) == 1_600
+    assert test_db.get_balance_at(checking["id"], date(2024, 2, 20)) == 1_100
+    assert test_db.get_balance_at(checking["id"], date(2024, 3, 1)) == 5_000
+
+
+def test_edited_amounts_are_posted_as_valuations(test_db):
+    checking = test_db.create_line_item(name="Checking", type="Cash", status="Asset", amount=1_000)
+    test_db.add_transaction(checking["id"], date(2024, 1, 10), "deposit", 500)
+
+    item = test_db.update_line_item(
+        id=checking["id"], name="Current", type="Cash", status="Asset", amount=9_000
+    )
+    assert (item["name"], item["amount"]) == ("Current", 9_000)
+    assert test_db.get_balance_at(checking["id"], date.today()) == 9_000
+    # The edit is now the latest valuation, so a back-dated entry leaves it alone
+    item = test_db.add_transaction(checking["id"], date(2024, 1, 5), "deposit", 100)
+    assert item["amount"] == 9_000
+    assert test_db.get_balance_at(checking["id"], date.today()) == 9_000
+    assert test_db.get_balance_at(checking["id"], date(2024, 1, 31)) == 1_600
+    # Postings cannot be undone, and neither can the edit behind the valuation
+    assert test_db.undo() is None
+
+    # An entry dated after today is followed by the valuation, not left after it
+    test_db.add_transaction(checking["id"], date(2999, 1, 1), "deposit", 50)
+    test_db.update_line_items([checking["id"]], {"amount": 7_000, "type": "Savings"})
+    item = test_db.get_line_item(checking["id"])
+    assert (item["type"], item["amount"]) == ("Savings", 7_000)
+    assert test_db.get_balance_at(checking["id"], date(2999, 1, 1)) == 7_000
+
+    test_db.bulk_upsert_line_items(
+        [{"name": "Current", "type": "Savings", "status": "Asset", "amount": 6_000}]
+    )
+    assert test_db.get_line_item(checking["id"])["amount"] == 6_000
+    assert test_db.get_balance_at(checking["id"], date(2999, 1, 1)) == 6_000
+    entries = test_db.get_statement(checking["id"], date(2999, 1, 1), date(2999, 1, 1))
+    assert [entry["kind"] for entry in entries["entries"]] == ["deposit", "valuation", "valuation"]
+
+    # Without a change of amount nothing is posted
+    test_db.update_line_item(
+        id=checking["id"], name="Current", type="Savings", status="Asset", amount=6_000
+    )
+    everything = test_db.get_statement(checking["id"], date(2000, 1, 1), date(2999, 12, 31))
+    assert len(everything["entries"]) == 6
+
+
+def test_statement_lists_entries_with_running_balances(test_db):
+    checking = test_db.create_line_item(name="Checking", type="Cash", status="Asset", amount=1_000)
+    test_db.add_transaction(checking["id"], date(2024, 1, 10), "deposit", 500, memo="Pay")
+    test_db.add_transaction(checking["id"], date(2024, 2, 1), "payment", 200)
+    test_db.add_transaction(checking["id"], date(2024, 3, 1), "deposit", 50)
+
+    statement = test_db.get_statement(checking["id"], date(2024, 2, 1), date(2024, 2, 29))
+    assert statement["opening_balance"] == 1_500
+    assert [(entry["kind"], entry["balance"]) for entry in statement["entries"]] == [
+        ("payment", 1_300)
+    ]
+    assert statement["closing_balance"] == 1_300
+
+    empty = test_db.get_statement(checking["id"], date(2024, 4, 1), date(2024, 4, 30))
+    assert empty["entries"] == []
+    assert empty["closing_balance"] == 1_350
+
+    loan = test_db.create_line_item(name="Loan", type="Debt", status="Liability", amount=50)
+    assert test_db.get_balance_at(loan["id"], date(2024, 1, 1)) is None
+
+
+def test_postings_are_validated_and_cannot_be_undone(test_db):
+    checking = test_db.create_line_item(name="Checking", type="Cash", status="Asset", amount=100)
+
+    with pytest.raises(ValueError):
+        test_db.add_transaction(checking["id"], date(2024, 1, 1), "transfer", 10)
+    with pytest.raises(KeyError):
+        test_db.add_transaction(checking["id"], date(2024, 1, 1), "deposit", 10, portfolio_id=2)
+    with pytest.raises(KeyError):
+        test_db.get_statement(checking["id"] + 1, date(2024, 1, 1), date(2024, 1, 31))
+
+    test_db.add_transaction(checking["id"], date(2024, 1, 1), "deposit", 10)
+    # The posting is a barrier: the creation before it can no longer be undone either
+    assert test_db.undo() is None
+    assert test_db.get_line_item(checking["id"])["amount"] == 110
+
+
+def test_deleted_line_items_do_not_pass_their_ledger_on(test_db):
+    test_db.create_line_item(name="Checking", type="Cash", status="Asset", amount=100)
+    savings = test_db.create_line_item(name="Savings", type="Cash", status="Asset", amount=0)
+    test_db.add_transaction(savings["id"], date(2024, 1, 10), "deposit", 5_000)
+    test_db.delete_line_items([savings["id"]])
+
+    loan = test_db.create_line_item(name="Loan", type="Debt", status="Liability", amount=100)
+    assert loan["id"] != savings["id"]
+    statement = test_db.get_statement(loan["id"], date(2024, 1, 1), date(2024, 12, 31))
+    assert statement == {"opening_balance": None, "entries": [], "closing_balance": None}
+    # The first posting opens the ledger at the loan's own amount
+    assert test_db.add_transaction(loan["id"], date(2024, 2, 1), "deposit", 50)["amount"] == 150
+
+    # Undoing a delete brings the line item back to its ledger
+    brokerage = test_db.create_line_item(name="Brokerage", type="Stock", status="Asset", amount=0)
+    test_db.add_transaction(brokerage["id"], date(2024, 3, 1), "deposit", 700)
+    test_db.delete_line_items([brokerage["id"]])
+    test_db.undo()
+    assert test_db.get_line_item(brokerage["id"])["amount"] == 700
+    assert test_db.get_balance_at(brokerage["id"], date(2024, 3, 31)) == 700
+
+
+def test_migration_keeps_ids_of_deleted_line_items_from_being_reused(test_db):
+    checking = test_db.create_line_item(name="Checking", type="Cash", status="Asset", amount=1)
+    savings = test_db.create_line_item(name="Savings", type="Cash", status="Asset", amount=0)
+    test_db.add_transaction(savings["id"], date(2024, 1, 10), "deposit", 5_000)
+    with test_db.engine.begin() as connection:
+        # Line item ids used to be plain INTEGER PRIMARY KEY, which SQLite reuses
+        connection.execute(text("ALTER TABLE lineitem RENAME TO lineitem_new"))
+        connection.execute(
+            text(
+                "CREATE TABLE lineitem (id INTEGER PRIMARY KEY, name VARCHAR, type VARCHAR, "
+                "status VARCHAR, amount INTEGER, currency VARCHAR, portfolio_id INTEGER)"
+            )
+        )
+        connection.execute(text("INSERT INTO lineitem SELECT * FROM lineitem_new"))
+        connection.execute(text("DROP TABLE lineitem_new"))
+        connection.execute(text(f"DELETE FROM lineitem WHERE id = {savings['id']}"))
+    # Databases of that age already had the portfolio indexes
+    test_db.create_indexes()
+
+    test_db.migrate_database()
+    test_db.migrate_database()
+
+    loan = test_db.create_line_item(name="Loan", type="Debt", status="Liability", amount=100)
+    assert loan["id"] > savings["id"]
+    assert test_db.get_line_item(checking["id"])["amount"] == 1
+    assert test_db.add_transaction(loan["id"], date(2024, 2, 1), "payment", 30)["amount"] == 70
+    assert [item["id"] for item in test_db.get_items_page(0, 10, search="loan")] == [loan["id"]]
@@ -0,0 +1,62 @@
+import asyncio
+from database import aio, metrics
+
+
+def test_disabled_decorators_return_the_function(monkeypatch):
+    monkeypatch.setattr(metrics, "ENABLED", False)
+
+    def get_totals():
+        pass
+
+    assert metrics.timed(get_totals) is get_totals
+    assert metrics.action(get_totals) is get_totals
+
+
+def test_timed_records_latency_histograms(monkeypatch):
+    monkeypatch.setattr(metrics, "ENABLED", True)
+    metrics.reset()
+
+    @metrics.timed
+    def get_totals():
+        return 42
+
+    assert [get_totals() for _ in range(10)] == [42] * 10
+
+    latency = metrics.snapshot()["latencies"]["test_metrics.get_totals"]
+    assert latency["count"] == 10
+    assert 0 <= latency["p50_ms"] <= latency["p99_ms"] <= latency["max_ms"]
+
+
+def test_actions_count_queries_on_the_thread_pool(monkeypatch):
+    monkeypatch.setattr(metrics, "ENABLED", True)
+    metrics.reset()
+
+    def query():
+        metrics.count_query()
+        metrics.count_query()
+
+    @metrics.action
+    async def add_new_data():
+        await aio.run(query)
+        await aio.run(query)
+
+    asyncio.run(add_new_data())
+    asyncio.run(add_new_data())
+    # Outside of an action, queries are not attributed to anything
+    query()
+
+    assert metrics.snapshot()["actions"] == {
+        "action.add_new_data": {"count": 2, "queries": 8, "queries_per_action": 4.0}
+    }
+
+
+def test_payload_sizes(monkeypatch):
+    monkeypatch.setattr(metrics, "ENABLED", True)
+    metrics.reset()
+
+    metrics.record_payload("update", {"1": None})
+    metrics.record_payload("update", [1, 2])
+
+    assert metrics.snapshot()["payloads"] == {
+        "update": {"count": 2, "bytes": 17, "max_bytes": 11}
+    }
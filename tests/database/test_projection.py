@@ -0,0 +1,63 @@
+import math
+import pytest
+from database import projection
+
+TYPE_TOTALS = [
+    {"status": "Asset", "type": "Stocks", "amount": 10_000_000},
+    {"status": "Asset", "type": "Funds", "amount": 5_000_000},
+    {"status": "Asset", "type": "Cash", "amount": 1_000_000},
+    {"status": "Liability", "type": "Loan", "amount": 2_000_000},
+]
+ASSUMPTIONS = {
+    "Stocks": {"growth": 0.07, "volatility": 0.15},
+    "Funds": {"growth": 0.07, "volatility": 0.15},
+    "Loan": {"growth": 0.05, "volatility": 0.0},
+}
+
+
+def test_types_with_the_same_assumptions_form_one_asset_class():
+    assert projection.asset_classes(TYPE_TOTALS, ASSUMPTIONS) == (
+        (0.0, 0.0, 10_000.0),
+        (0.05, 0.0, -20_000.0),
+        (0.07, 0.15, 150_000.0),
+    )
+
+
+def test_certain_growth_compounds_annually():
+    result = projection.project_net_worth(
+        TYPE_TOTALS[2:], {"Cash": {"growth": 0.02}}, months=24, paths=10
+    )
+
+    for band in result["percentiles"].values():
+        assert band[0] == pytest.approx(10_000 - 20_000)
+        assert band[12] == pytest.approx(10_000 * 1.02 - 20_000)
+        assert band[24] == pytest.approx(10_000 * 1.02**2 - 20_000)
+    assert result["years"][12] == 1.0
+
+
+def test_percentile_bands_are_ordered_and_cached():
+    result = projection.project_net_worth(TYPE_TOTALS, ASSUMPTIONS, months=120, paths=2000)
+    bands = [result["percentiles"][percentile] for percentile in projection.PERCENTILES]
+
+    assert all(len(band) == 121 for band in bands)
+    for lower, upper in zip(bands, bands[1:]):
+        assert all(low <= high for low, high in zip(lower[1:], upper[1:]))
+    assert result["percentiles"][50][0] == 150_000 + 10_000 - 20_000
+    # The median of a lognormal asset grows at its growth less half its variance
+    median = 150_000 * 1.07**10 * math.exp(-(0.15**2) / 2 * 10) + 10_000 - 20_000 * 1.05**10
+    assert result["percentiles"][50][120] == pytest.approx(median, rel=0.03)
+
+    assert projection.project_net_worth(TYPE_TOTALS, ASSUMPTIONS, months=120, paths=2000) is result
+
+
+def test_assumptions_that_lose_everything_are_rejected(test_db):
+    test_db.set_projection_assumption("Stocks", growth=0.07, volatility=0.15)
+
+    with pytest.raises(ValueError):
+        test_db.set_projection_assumption("Stocks", growth=-1.0, volatility=0.15)
+    with pytest.raises(ValueError):
+        test_db.set_projection_assumption("Stocks", growth=0.07, volatility=-0.01)
+
+    assert test_db.get_projection_assumptions() == {
+        "Stocks": {"growth": 0.07, "volatility": 0.15}
+    }
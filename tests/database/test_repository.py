@@ -0,0 +1,72 @@
+from database.repository import LineItemRepository
+
+
+def test_repository_writes_through_and_tracks_totals(test_db):
+    repository = LineItemRepository()
+
+    checking = repository.create_line_item(
+        name="Checking", type="Cash", status="Asset", amount=10_000
+    )
+    loan = repository.create_line_item(
+        name="Loan", type="Debt", status="Liability", amount=2_500
+    )
+    assert repository.get_totals() == {
+        "assets": 10_000,
+        "liabilities": 2_500,
+        "net_worth": 7_500,
+    }
+
+    repository.update_line_item(
+        id=loan["id"], name="Loan", status="Asset", type="Debt", amount=500
+    )
+    repository.delete_line_item(checking["id"])
+
+    assert repository.get_totals() == {"assets": 500, "liabilities": 0, "net_worth": 500}
+    assert repository.get_all_items() == test_db.get_all_items()
+    assert repository.get_totals() == test_db.get_totals()
+
+
+def test_snapshot_is_stable_until_mutation(test_db):
+    repository = LineItemRepository()
+    repository.create_line_item(name="Checking", type="Cash", status="Asset", amount=1)
+
+    first = repository.snapshot()
+    assert repository.snapshot() is first
+
+    repository.create_line_item(name="Savings", type="Cash", status="Asset", amount=2)
+    assert repository.snapshot() is not first
+    assert len(first) == 1
+
+
+def test_bulk_update_and_delete(test_db):
+    repository = LineItemRepository()
+    ids = [
+        repository.create_line_item(name=f"Item {index}", type="Cash", status="Asset", amount=100)["id"]
+        for index in range(5)
+    ]
+
+    updated = repository.update_line_items(ids[:3], {"status": "Liability", "type": "Debt"})
+    assert [item["id"] for item in updated] == ids[:3]
+    assert repository.get_totals() == {"assets": 200, "liabilities": 300, "net_worth": -100}
+
+    removed = repository.delete_line_items([ids[0], ids[4], 999])
+    assert [item["id"] for item in removed] == [ids[0], ids[4]]
+
+    assert repository.get_totals() == test_db.get_totals()
+    assert repository.get_all_items() == test_db.get_all_items()
+
+
+def test_undo_and_redo_patch_the_cache(test_db):
+    repository = LineItemRepository()
+    checking = repository.create_line_item(
+        name="Checking", type="Cash", status="Asset", amount=100
+    )
+    repository.delete_line_item(checking["id"])
+
+    repository.undo()
+    assert repository.get_all_items() == [checking]
+    assert repository.get_totals()["assets"] == 100
+
+    repository.redo()
+    assert repository.get_all_items() == []
+    assert repository.get_totals() == test_db.get_totals()
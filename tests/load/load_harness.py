@@ -0,0 +1,446 @@
+"""
+Load test of the app server. Starts main.py headless on a local port, with a fresh
+database, and drives it with many simulated browser windows at once. Each window does
+add, edit and delete cycles through the page's own buttons and dialogs, so the server
+runs `add_new_data`, `editdata`, `update_data` and `removedata` just as for a person.
+
+The windows speak NiceGUI's socket.io protocol: they fill in inputs and click buttons
+by sending the events the browser would, answer the grid's selected rows when asked,
+and fetch rows from the grid's datasource whenever the page tells the grid to reload.
+
+Usage, from the repository root:
+
+    python tests/load/load_harness.py --clients 1,10,50 --cycles 20
+
+Each client count gets its own server. The action latencies are reported as p50, p95
+and p99, together with the throughput and the server's resident memory.
+"""
+import argparse
+import asyncio
+import json
+import os
+import re
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from collections import defaultdict
+from typing import Any, Dict, List, Optional
+import aiohttp
+import socketio
+
+ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# The same block size as the grid in main.py asks for
+GRID_BLOCK_SIZE = 100
+# How long a single action may take before it counts as failed, in seconds
+ACTION_TIMEOUT = 30.0
+# How often the server's memory is sampled, in seconds
+MEMORY_INTERVAL = 0.25
+# The events inputs send their new value with, which differ between elements
+VALUE_EVENTS = ("update:model-value", "update:value")
+
+
+def serve(port: int, seed_rows: int, portfolios: int) -> None:
+    """
+    Runs the app like main.py does, but headless on `port` and after seeding every
+    portfolio with `seed_rows` line items. Run in the server subprocess.
+    """
+    sys.path.insert(0, ROOT)
+    from database import db
+
+    db.initialize_database()
+    for portfolio_id in range(1, portfolios + 1):
+        db.bulk_upsert_line_items(
+            (
+                {
+                    "name": f"Seed {index}",
+                    "type": "Seed",
+                    "status": "Liability" if index % 5 == 0 else "Asset",
+                    "amount": index * 7_919 % 100_000_000,
+                }
+                for index in range(seed_rows)
+            ),
+            portfolio_id=portfolio_id,
+        )
+
+    import main  # noqa: F401, registers the pages
+    from nicegui import ui
+
+    ui.run(native=False, show=False, reload=False, port=port, title="Net Worth Tracker")
+
+
+def resident_memory(pid: int) -> Optional[int]:
+    """
+    Returns the resident memory of a process in bytes, from psutil when it is installed
+    and from /proc otherwise, or None if neither is available.
+    """
+    try:
+        import psutil
+
+        return psutil.Process(pid).memory_info().rss
+    except ImportError:
+        pass
+
+    try:
+        with open(f"/proc/{pid}/status") as file:
+            for line in file:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    return None
+
+
+def percentile(values: List[float], fraction: float) -> float:
+    """
+    Returns the nearest-rank percentile of some values, e.g. `fraction=0.95` for p95.
+    """
+    ordered = sorted(values)
+    index = max(0, min(len(ordered) - 1, round(fraction * len(ordered)) - 1))
+    return ordered[index]
+
+
+class SimulatedClient:
+    """
+    One browser window showing a portfolio's page.
+    """
+
+    def __init__(
+        self, http: aiohttp.ClientSession, base_url: str, portfolio_id: int, name: str
+    ) -> None:
+        self.http = http
+        self.base_url = base_url
+        self.portfolio_id = portfolio_id
+        self.name = name
+        self.elements: Dict[str, dict] = {}
+        # The rows the grid has selected, sent whenever the page asks for them
+        self.selected: List[dict] = []
+        self.transaction: Optional[asyncio.Future] = None
+        self.waiting_updates: Dict[int, asyncio.Future] = {}
+        self.sio = socketio.AsyncClient(reconnection=False)
+        self.sio.on("run_javascript", self.run_javascript)
+        self.sio.on("update", self.update)
+
+    async def connect(self) -> None:
+        """
+        Loads the page like a browser does, then opens its websocket.
+        """
+        path = "/" if self.portfolio_id == 1 else f"/portfolio/{self.portfolio_id}"
+        async with self.http.get(self.base_url + path) as response:
+            html = await response.text()
+
+        client_id = re.search(r"client_id': '([^']+)'", html).group(1)
+        raw_elements = re.search(r"String\.raw`(.*?)`;", html, re.DOTALL).group(1)
+        for escaped, character in (("&#96;", "`"), ("&gt;", ">"), ("&lt;", "<"), ("&amp;", "&")):
+            raw_elements = raw_elements.replace(escaped, character)
+        self.elements = json.loads(raw_elements)
+
+        await self.sio.connect(
+            f"{self.base_url}?client_id={client_id}",
+            socketio_path="/_nicegui_ws/socket.io",
+            transports=["websocket"],
+        )
+        await self.sio.call("handshake")
+        await self.fetch_rows()
+
+    async def disconnect(self) -> None:
+        await self.sio.disconnect()
+
+    async def fetch_rows(self, name: Optional[str] = None) -> List[dict]:
+        """
+        Fetches the first block of rows from the grid's datasource, as the grid does
+        when it is (re)loaded, optionally filtered by name.
+        """
+        params = {
+            "start": 0,
+            "end": GRID_BLOCK_SIZE,
+            "portfolio_id": self.portfolio_id,
+        }
+        if name:
+            params["filter"] = json.dumps({"name": {"type": "contains", "filter": name}})
+        async with self.http.get(f"{self.base_url}/grid/line_items", params=params) as response:
+            response.raise_for_status()
+            return (await response.json())["rows"]
+
+    async def run_javascript(self, command: dict) -> None:
+        code = command["code"]
+        if "getSelectedRows" in code:
+            await self.sio.emit(
+                "javascript_response",
+                {"request_id": command["request_id"], "result": self.selected},
+            )
+        elif "const transaction" in code:
+            # A row transaction ends the page's add, edit and delete handlers
+            if '"refresh": true' in code:
+                await self.fetch_rows()
+            if self.transaction and not self.transaction.done():
+                self.transaction.set_result(None)
+        elif "InfiniteCache" in code:
+            # Another window changed the portfolio
+            await self.fetch_rows()
+
+    async def update(self, elements: Dict[str, Any]) -> None:
+        for id in elements:
+            waiting = self.waiting_updates.pop(int(id), None)
+            if waiting and not waiting.done():
+                waiting.set_result(None)
+
+    def find(self, label: str, event_types: tuple) -> tuple:
+        """
+        Returns the id of the element with a label, and its listener of one of the events.
+        """
+        for element in self.elements.values():
+            if element["props"].get("label") == label:
+                for listener in element["events"]:
+                    if listener["type"] in event_types:
+                        return element["id"], listener["listener_id"]
+        raise LookupError(f"No element {label!r} listens to {' or '.join(event_types)}")
+
+    async def set_value(self, label: str, value: Any) -> None:
+        id, listener_id = self.find(label, VALUE_EVENTS)
+        await self.sio.emit(
+            "event", {"id": id, "listener_id": listener_id, "args": [json.dumps(value)]}
+        )
+
+    async def click(self, label: str, until_updated: Optional[str] = None) -> None:
+        """
+        Clicks a button, and either returns right away, waits until the page changes the
+        element labeled `until_updated`, or, with "transaction", waits until the page
+        has sent its row transaction to the grid.
+        """
+        id, listener_id = self.find(label, ("click",))
+        loop = asyncio.get_running_loop()
+        if until_updated == "transaction":
+            done = self.transaction = loop.create_future()
+        elif until_updated:
+            done = loop.create_future()
+            self.waiting_updates[self.find(until_updated, VALUE_EVENTS)[0]] = done
+
+        await self.sio.emit("event", {"id": id, "listener_id": listener_id, "args": []})
+        if until_updated:
+            await asyncio.wait_for(done, ACTION_TIMEOUT)
+
+    async def cycle(self, index: int, latencies: Dict[str, List[float]]) -> None:
+        """
+        Adds a line item, edits it and deletes it again, timing each action from its
+        first click until the grid shows the change.
+        """
+        name = f"{self.name} cycle {index}"
+
+        started = time.perf_counter()
+        await self.click("Add")
+        await self.set_value("Add Name", name)
+        await self.set_value("Add Type", "Load Test")
+        await self.set_value("Add Status", {"value": 0, "label": "Asset"})
+        await self.set_value("Add Amount", "12.34")
+        await self.click("Save New Stream", until_updated="transaction")
+        latencies["add"].append(time.perf_counter() - started)
+
+        self.selected = (await self.fetch_rows(name))[:1]
+
+        started = time.perf_counter()
+        await self.click("Edit", until_updated="Edit Name")
+        await self.set_value("Edit Amount", "56.78")
+        await self.click("Edit Stream", until_updated="transaction")
+        latencies["edit"].append(time.perf_counter() - started)
+
+        started = time.perf_counter()
+        await self.click("Delete", until_updated="transaction")
+        latencies["delete"].append(time.perf_counter() - started)
+        self.selected = []
+
+
+async def run_level(args: argparse.Namespace, clients: int) -> dict:
+    """
+    Starts a server, connects `clients` windows spread over the portfolios and runs their
+    cycles concurrently, returning the latencies, throughput and memory.
+    """
+    with tempfile.TemporaryDirectory() as directory:
+        with socket.socket() as probe:
+            probe.bind(("127.0.0.1", 0))
+            port = probe.getsockname()[1]
+
+        env = {**os.environ, "NETWORTH_DB": os.path.join(directory, "networth.db")}
+        if args.metrics:
+            env["NETWORTH_METRICS"] = "1"
+        log = open(os.path.join(directory, "server.log"), "w")
+        server = subprocess.Popen(
+            [
+                sys.executable,
+                os.path.abspath(__file__),
+                "--serve",
+                str(port),
+                "--seed-rows",
+                str(args.seed_rows),
+                "--portfolios",
+                str(args.portfolios),
+            ],
+            cwd=ROOT,
+            env=env,
+            stdout=log,
+            stderr=subprocess.STDOUT,
+        )
+
+        base_url = f"http://127.0.0.1:{port}"
+        latencies: Dict[str, List[float]] = defaultdict(list)
+        memory: List[int] = []
+        errors = 0
+        try:
+            async with aiohttp.ClientSession() as http:
+                await wait_for_server(http, base_url, server)
+                windows = [
+                    SimulatedClient(http, base_url, index % args.portfolios + 1, f"Client {index}")
+                    for index in range(clients)
+                ]
+                for window in windows:
+                    started = time.perf_counter()
+                    await window.connect()
+                    latencies["connect"].append(time.perf_counter() - started)
+                connected_memory = resident_memory(server.pid)
+                sampler = asyncio.create_task(sample_memory(server.pid, memory))
+
+                async def run_cycles(window: SimulatedClient) -> int:
+                    failed = 0
+                    for index in range(args.cycles):
+                        try:
+                            await window.cycle(index, latencies)
+                        except (asyncio.TimeoutError, LookupError, aiohttp.ClientError) as e:
+                            print(f"{window.name} cycle {index} failed: {e!r}")
+                            failed += 1
+                    return failed
+
+                started = time.perf_counter()
+                errors = sum(await asyncio.gather(*(run_cycles(window) for window in windows)))
+                elapsed = time.perf_counter() - started
+
+                sampler.cancel()
+                server_metrics = None
+                if args.metrics:
+                    async with http.get(f"{base_url}/debug/metrics") as response:
+                        server_metrics = await response.json()
+                for window in windows:
+                    await window.disconnect()
+        finally:
+            server.terminate()
+            server.wait()
+            log.close()
+
+    actions = sum(len(latencies[action]) for action in ("add", "edit", "delete"))
+    return {
+        "clients": clients,
+        "cycles": args.cycles,
+        "seed_rows": args.seed_rows,
+        "portfolios": args.portfolios,
+        "latencies": {
+            action: {
+                "count": len(values),
+                "p50": percentile(values, 0.50),
+                "p95": percentile(values, 0.95),
+                "p99": percentile(values, 0.99),
+                "max": max(values),
+            }
+            for action, values in latencies.items()
+            if values
+        },
+        "elapsed": elapsed,
+        "actions_per_second": actions / elapsed,
+        "errors": errors,
+        "memory": {
+            "connected": connected_memory,
+            "peak": max(memory, default=None),
+            "end": memory[-1] if memory else None,
+        },
+        "server_metrics": server_metrics,
+    }
+
+
+async def wait_for_server(
+    http: aiohttp.ClientSession, base_url: str, server: subprocess.Popen, timeout: float = 60.0
+) -> None:
+    deadline = time.perf_counter() + timeout
+    while time.perf_counter() < deadline:
+        if server.poll() is not None:
+            raise RuntimeError("The server exited while starting, see its log")
+        try:
+            async with http.get(f"{base_url}/api/totals") as response:
+                if response.status == 200:
+                    return
+        except aiohttp.ClientError:
+            pass
+        await asyncio.sleep(0.2)
+    raise TimeoutError(f"The server did not start within {timeout} s")
+
+
+async def sample_memory(pid: int, memory: List[int]) -> None:
+    while True:
+        rss = resident_memory(pid)
+        if rss is not None:
+            memory.append(rss)
+        await asyncio.sleep(MEMORY_INTERVAL)
+
+
+def megabytes(size: Optional[int]) -> str:
+    return "n/a" if size is None else f"{size / 2**20:.1f} MB"
+
+
+def print_report(result: dict) -> None:
+    print(
+        f"\n{result['clients']} clients x {result['cycles']} cycles, "
+        f"{result['seed_rows']} seeded rows in each of {result['portfolios']} portfolios"
+    )
+    print(f"{'action':<10}{'count':>8}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'max ms':>10}")
+    for action, stats in result["latencies"].items():
+        print(
+            f"{action:<10}{stats['count']:>8}"
+            + "".join(f"{stats[key] * 1000:>10.1f}" for key in ("p50", "p95", "p99", "max"))
+        )
+    memory = result["memory"]
+    print(
+        f"{result['actions_per_second']:.1f} actions/s over {result['elapsed']:.1f} s, "
+        f"{result['errors']} failed cycles, server memory {megabytes(memory['connected'])} "
+        f"once connected, {megabytes(memory['peak'])} peak, {megabytes(memory['end'])} at the end"
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument(
+        "--clients",
+        default="1,10",
+        help="comma separated numbers of concurrent clients, each run against a new server",
+    )
+    parser.add_argument("--cycles", type=int, default=10, help="add/edit/delete cycles per client")
+    parser.add_argument(
+        "--seed-rows", type=int, default=1000, help="line items seeded into each portfolio"
+    )
+    parser.add_argument(
+        "--portfolios", type=int, default=1, help="portfolios the clients are spread over"
+    )
+    parser.add_argument(
+        "--metrics",
+        action="store_true",
+        help="run the server with NETWORTH_METRICS=1 and keep its /debug/metrics",
+    )
+    parser.add_argument("--json", help="also write the results to this JSON file")
+    parser.add_argument("--serve", type=int, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.serve:
+        serve(args.serve, args.seed_rows, args.portfolios)
+        return
+
+    results = []
+    for clients in (int(count) for count in args.clients.split(",")):
+        result = asyncio.run(run_level(args, clients))
+        print_report(result)
+        results.append(result)
+
+    if args.json:
+        with open(args.json, "w") as file:
+            json.dump(results, file, indent=2)
+
+
+if __name__ == "__main__":
+    main()